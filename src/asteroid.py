@@ -1,5 +1,4 @@
 from planet import Planet
-from utils import load_texture
 
 class Asteroid(Planet):
     """
@@ -19,14 +18,8 @@ class Asteroid(Planet):
     mean_anomaly (float): The mean anomaly of the asteroid in radians.
     texture (str): The path to the texture image for the asteroid.
     """
+    __slots__ = ()
+
     def __init__(self, name, mass, radius, semi_major_axis, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, mean_anomaly=0, texture_path="self.texture"):
         super().__init__(name, mass, radius, semi_major_axis, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, mean_anomaly)
         self.texture_path = texture_path
-        self.__post_init__()
-
-    def __post_init__(self):
-        """
-        Load the texture image during initialization if a texture path is provided.
-        """
-        if self.texture:
-            self.texture = load_texture ("self.texture")
\ No newline at end of file
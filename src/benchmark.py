@@ -0,0 +1,227 @@
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from planet import Planet
+from moon import Moon
+from asteroid import Asteroid
+from solar_system import SolarSystem
+from textures import TextureManager
+
+# (planets, moons per planet, asteroids) for each benchmark case
+DEFAULT_CASES = [(8, 2, 0), (8, 2, 100), (8, 2, 1000), (8, 2, 10000), (8, 2, 100000), (100, 0, 0), (1000, 0, 0)]
+DEFAULT_TEXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "textures", "earthnight.jpg")
+
+
+def synthetic_system(planets, moons_per_planet, asteroids, seed=0, **options):
+    """
+    Build a solar system with random but reproducible orbits.
+
+    Planets are spread between 0.4 and 40 AU, moons between 0.05 and 0.3 Hill
+    radii from their planet, with at most 1e-3 of its mass, and asteroids between
+    2.1 and 3.3 AU, all on low-eccentricity, low-inclination orbits.
+
+    Parameters:
+    planets (int): The number of planets.
+    moons_per_planet (int): The number of moons around each planet.
+    asteroids (int): The number of asteroids.
+    seed (int): The random seed.
+    options: Further keyword arguments for SolarSystem.
+
+    Returns:
+    SolarSystem: The solar system.
+    """
+    rng = np.random.default_rng(seed)
+    system = SolarSystem(**options)
+
+    def angles():
+        return rng.uniform(0, 0.1), rng.uniform(0, 2 * np.pi), rng.uniform(0, 2 * np.pi)
+
+    for p, a in enumerate(np.geomspace(0.4, 40, planets) * Planet.AU):
+        mass, eccentricity = rng.uniform(1e23, 1e27), rng.uniform(0, 0.1)
+        system.add_planet(Planet(f"Planet{p}", mass, rng.uniform(2e3, 7e4), a, eccentricity, *angles()))
+        # Hill radius at perihelion; moons well inside it stay bound to the planet
+        hill = a * (1 - eccentricity) * (mass / (3 * system.sun.mass)) ** (1 / 3)
+        for m in range(moons_per_planet):
+            system.add_moon(Moon(f"Moon{p}_{m}", rng.uniform(1e16, 1e-3 * mass), rng.uniform(10, 2e3),
+                                 rng.uniform(0.05, 0.3) * hill, rng.uniform(0, 0.05), *angles(), f"Planet{p}"))
+    for k in range(asteroids):
+        system.add_asteroid(Asteroid(f"Asteroid{k}", rng.uniform(1e10, 1e20), rng.uniform(0.1, 500),
+                                     rng.uniform(2.1, 3.3) * Planet.AU, rng.uniform(0, 0.3), *angles()))
+    return system
+
+
+def measure(function, repeats=5, min_time=0.2):
+    """
+    Time a function and record its peak traced memory.
+
+    The function is called once to warm up, then at least repeats times and
+    until min_time seconds have passed. The peak memory comes from one further
+    call under tracemalloc, so tracing does not distort the timings.
+
+    Parameters:
+    function (callable): The function to time, called without arguments.
+    repeats (int): The minimum number of timed calls.
+    min_time (float): The minimum total timed duration in seconds.
+
+    Returns:
+    dict: The call count, median and minimum seconds per call, calls per second and peak bytes.
+    """
+    function()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeats or time.perf_counter() - start < min_time:
+        t = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = statistics.median(times)
+    return {"calls": len(times), "median_seconds": median, "min_seconds": min(times),
+            "per_second": 1 / median if median > 0 else None, "peak_bytes": peak}
+
+
+def _render_function(system, frames=20):
+    # Return a callable that draws the next of a short run of frames on an offscreen canvas
+    from renderer import Renderer, body_groups, default_extent
+    import matplotlib.pyplot as plt
+    snapshots = np.array([positions for _, positions in system.snapshots(system.time + frames * system.dt)])
+    groups = body_groups(system)
+    renderer = Renderer(groups, default_extent(snapshots, groups))
+    counter = iter(range(sys.maxsize))
+
+    def render():
+        renderer.draw(snapshots, next(counter) % len(snapshots))
+        renderer.fig.canvas.draw()
+    return render, lambda: plt.close(renderer.fig)
+
+
+def benchmark_case(planets, moons_per_planet, asteroids, dt=86400.0, seed=0, repeats=5, min_time=0.2,
+                   texture_path=DEFAULT_TEXTURE, render=True, chunk_size=256):
+    """
+    Run every benchmark for one system size.
+
+    Parameters:
+    planets (int): The number of planets.
+    moons_per_planet (int): The number of moons around each planet.
+    asteroids (int): The number of asteroids.
+    dt (float): The time step in seconds.
+    seed (int): The random seed.
+    repeats (int): The minimum number of timed calls per benchmark.
+    min_time (float): The minimum timed duration per benchmark in seconds.
+    texture_path (str): The image used by the load_texture benchmarks, skipped if missing.
+    render (bool): Whether to benchmark frame rendering.
+    chunk_size (int): The force block size, bounding memory for many planets.
+
+    Returns:
+    dict: The case sizes and the results of each benchmark.
+    """
+    t = time.perf_counter()
+    system = synthetic_system(planets, moons_per_planet, asteroids, seed, dt=dt, chunk_size=chunk_size)
+    system.positions()
+    results = {"build_seconds": time.perf_counter() - t}
+
+    results["step"] = measure(system.step, repeats, min_time)
+
+    if render:
+        draw, close = _render_function(system)
+        results["render_frame"] = measure(draw, repeats, min_time)
+        close()
+
+    # The legacy planet-only methods overwrite the planet state, so they run after the dynamics
+    results["calculate_gravitational_interactions"] = measure(
+        lambda: system.calculate_gravitational_interactions(dt, chunk_size), repeats, min_time)
+    results["calculate_orbital_characteristics"] = measure(
+        lambda: system.calculate_orbital_characteristics(dt), repeats, min_time)
+    planet = system.planet[0]
+    results["planet_calculate_position"] = measure(lambda: planet.calculate_position(planet.mean_anomaly),
+                                                   repeats, min_time)
+
+    if texture_path and os.path.exists(texture_path):
+        # Cold decodes use a manager with no cache; warm lookups hit the LRU
+        cold = TextureManager(cache_size=0)
+        warm = TextureManager()
+        results["load_texture_cold"] = measure(lambda: cold.get(texture_path), repeats, min_time)
+        results["load_texture_warm"] = measure(lambda: warm.get(texture_path), repeats, min_time)
+
+    return {"planets": planets, "moons": planets * moons_per_planet, "asteroids": asteroids,
+            "bodies": len(system.body_names()), "results": results}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases=DEFAULT_CASES, output=None, **options):
+    """
+    Benchmark each case and optionally write the results as JSON.
+
+    Parameters:
+    cases (list): (planets, moons per planet, asteroids) tuples.
+    output (str): The JSON file to write, or None.
+    options: Further keyword arguments for benchmark_case.
+
+    Returns:
+    dict: The environment metadata and one entry per case.
+    """
+    # Render offscreen; the benchmarks never open a window
+    import matplotlib
+    matplotlib.use("Agg")
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": dict(options),
+        "cases": [],
+    }
+    for planets, moons_per_planet, asteroids in cases:
+        case = benchmark_case(planets, moons_per_planet, asteroids, **options)
+        # High-water resident set size of the process so far, in kilobytes on Linux
+        case["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["cases"].append(case)
+        step = case["results"]["step"]
+        print(f"{case['bodies']:>8} bodies: {step['per_second']:.1f} steps/s, "
+              f"peak {step['peak_bytes'] / 2**20:.1f} MiB", file=sys.stderr)
+    if output:
+        # Write atomically so an interrupted run does not leave a truncated file to compare against
+        directory = os.path.dirname(os.path.abspath(output))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+            json.dump(report, f, indent=2)
+        os.replace(f.name, output)
+    return report
+
+
+def parse_case(text):
+    """
+    Parse a case written as PLANETSxMOONSxASTEROIDS, e.g. "8x2x1000".
+
+    Parameters:
+    text (str): The case.
+
+    Returns:
+    tuple: The (planets, moons per planet, asteroids) counts.
+    """
+    planets, moons, asteroids = (int(part) for part in text.lower().split("x"))
+    return planets, moons, asteroids
+
+
+if __name__ == "__main__":
+    # The options are defined once, by the benchmark subcommand of the command line
+    from cli import main
+    sys.exit(main(["benchmark", *sys.argv[1:]]))
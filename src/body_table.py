@@ -0,0 +1,375 @@
+import numpy as np
+
+
+class BodyTable:
+    """
+    Struct-of-arrays storage for a set of bodies.
+
+    Numeric properties (mass, radius, orbital elements and state vectors) live in
+    typed column arrays that grow by doubling, so appends are amortized O(1).
+    Names map to rows through a dict, and moons are indexed by their parent planet.
+    Iterating or indexing the table returns lightweight views onto its rows.
+
+    Parameters:
+    body_class (type): The view class returned when reading rows (e.g. Planet).
+    capacity (int): The number of rows to allocate up front.
+    """
+    FLOAT_COLUMNS = (
+        "mass", "radius", "semi_major_axis", "eccentricity", "inclination",
+        "longitude_of_ascending_node", "argument_of_periapsis", "mean_anomaly",
+        "x", "y", "z", "vx", "vy", "vz",
+    )
+    OBJECT_COLUMNS = ("name", "texture", "texture_path", "parent_planet")
+    ELEMENT_COLUMNS = (
+        "semi_major_axis", "eccentricity", "inclination",
+        "longitude_of_ascending_node", "argument_of_periapsis", "mean_anomaly",
+    )
+
+    def __init__(self, body_class=None, capacity=16):
+        self.body_class = body_class
+        self._size = 0
+        self._capacity = max(int(capacity), 1)
+        self._columns = {name: np.zeros(self._capacity) for name in self.FLOAT_COLUMNS}
+        self._objects = {name: [] for name in self.OBJECT_COLUMNS}
+        self._index = {}
+        self._children = {}
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield self._view(row)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._view(row) for row in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("body table index out of range")
+        return self._view(i)
+
+    def __repr__(self):
+        return f"BodyTable({[name for name in self._objects['name']]!r})"
+
+    def _view(self, row):
+        body = self.body_class.__new__(self.body_class)
+        body._table = self
+        body._row = row
+        return body
+
+    def reserve(self, capacity):
+        """
+        Grow the column arrays so they can hold at least the given number of rows.
+
+        Parameters:
+        capacity (int): The minimum number of rows.
+        """
+        if capacity <= self._capacity:
+            return
+        new_capacity = max(capacity, 2 * self._capacity)
+        for name, column in self._columns.items():
+            grown = np.zeros(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        self._capacity = new_capacity
+
+    def _index_row(self, row):
+        name = self._objects["name"][row]
+        if name is not None:
+            self._index[name] = row
+        parent = self._objects["parent_planet"][row]
+        if parent is not None:
+            self._children.setdefault(parent, []).append(row)
+
+    def append(self, values):
+        """
+        Append one row to the table.
+
+        Parameters:
+        values (dict): Column values for the new row; missing columns default to 0/None.
+
+        Returns:
+        int: The index of the new row.
+        """
+        row = self._size
+        self.reserve(row + 1)
+        for name in self.FLOAT_COLUMNS:
+            if name in values:
+                self._columns[name][row] = values[name]
+        for name in self.OBJECT_COLUMNS:
+            self._objects[name].append(values.get(name))
+        self._size += 1
+        self._index_row(row)
+        return row
+
+    def extend(self, columns, count=None):
+        """
+        Append many rows at once from column arrays.
+
+        Parameters:
+        columns (dict): Column name to array (or list for object columns) of equal length.
+        count (int): The number of rows, if it cannot be inferred from the columns.
+
+        Returns:
+        range: The indices of the new rows.
+        """
+        if count is None:
+            count = len(next(iter(columns.values())))
+        start = self._size
+        self.reserve(start + count)
+        for name in self.FLOAT_COLUMNS:
+            if name in columns:
+                self._columns[name][start:start + count] = columns[name]
+        for name in self.OBJECT_COLUMNS:
+            values = columns.get(name)
+            self._objects[name].extend(list(values) if values is not None else [None] * count)
+        self._size += count
+        rows = range(start, self._size)
+        # Index the names in one dict update; only rows with a parent need the per-row path
+        self._index.update((name, row) for name, row in zip(self._objects["name"][start:], rows) if name is not None)
+        if columns.get("parent_planet") is not None:
+            for row, parent in zip(rows, self._objects["parent_planet"][start:]):
+                if parent is not None:
+                    self._children.setdefault(parent, []).append(row)
+        return rows
+
+    def add(self, body):
+        """
+        Copy a body into the table and rebind it as a view onto its new row.
+
+        Parameters:
+        body (Planet): The body to add.
+
+        Returns:
+        int: The index of the new row.
+        """
+        row = self.append(body._table.row_values(body._row))
+        body._table = self
+        body._row = row
+        return row
+
+    def row_values(self, row):
+        """
+        Read every column of one row.
+
+        Parameters:
+        row (int): The row index.
+
+        Returns:
+        dict: Column name to value.
+        """
+        values = {name: self._columns[name][row].item() for name in self.FLOAT_COLUMNS}
+        values.update({name: self._objects[name][row] for name in self.OBJECT_COLUMNS})
+        return values
+
+    def row_of(self, name):
+        """
+        Look up the row index of a body by name.
+
+        Parameters:
+        name (str): The body name.
+
+        Returns:
+        int: The row index, or None if the name is not in the table.
+        """
+        return self._index.get(name)
+
+    def get(self, name):
+        """
+        Look up a body by name.
+
+        Parameters:
+        name (str): The body name.
+
+        Returns:
+        Planet: A view onto the body's row, or None if the name is not in the table.
+        """
+        row = self._index.get(name)
+        return None if row is None else self._view(row)
+
+    def children(self, parent_name):
+        """
+        Return the bodies whose parent_planet is the given name.
+
+        Parameters:
+        parent_name (str): The parent body name.
+
+        Returns:
+        list: Views onto the child rows.
+        """
+        return [self._view(row) for row in self._children.get(parent_name, [])]
+
+    def child_rows(self, parent_name):
+        """
+        Return the row indices of the bodies whose parent_planet is the given name.
+
+        Parameters:
+        parent_name (str): The parent body name.
+
+        Returns:
+        numpy.ndarray: The child row indices.
+        """
+        return np.array(self._children.get(parent_name, []), dtype=np.int64)
+
+    def column(self, name):
+        """
+        Return a writable view of one numeric column, trimmed to the table size.
+
+        Parameters:
+        name (str): The column name.
+
+        Returns:
+        numpy.ndarray: The column values.
+        """
+        return self._columns[name][:self._size]
+
+    def object_column(self, name):
+        """
+        Return the values of one object column (name, texture, ...) in row order.
+
+        Parameters:
+        name (str): The column name.
+
+        Returns:
+        list: The column values.
+        """
+        return list(self._objects[name])
+
+    def names(self):
+        """
+        Return the body names in row order.
+
+        Returns:
+        list: The names.
+        """
+        return list(self._objects["name"])
+
+    def positions(self):
+        """
+        Return the positions as a new (N, 3) array.
+
+        Returns:
+        numpy.ndarray: The x, y, z columns stacked.
+        """
+        return np.column_stack([self.column("x"), self.column("y"), self.column("z")])
+
+    def velocities(self):
+        """
+        Return the velocities as a new (N, 3) array.
+
+        Returns:
+        numpy.ndarray: The vx, vy, vz columns stacked.
+        """
+        return np.column_stack([self.column("vx"), self.column("vy"), self.column("vz")])
+
+    def elements(self):
+        """
+        Return the orbital element columns in the order expected by kepler.orbital_positions.
+
+        Returns:
+        tuple: The semi-major axis, eccentricity, inclination, node, periapsis and mean anomaly columns.
+        """
+        return tuple(self.column(name) for name in self.ELEMENT_COLUMNS)
+
+    def set_state(self, positions, velocities):
+        """
+        Overwrite the position and velocity columns.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions.
+        velocities (numpy.ndarray): The (N, 3) velocities.
+        """
+        for k, name in enumerate(("x", "y", "z")):
+            self.column(name)[:] = positions[:, k]
+        for k, name in enumerate(("vx", "vy", "vz")):
+            self.column(name)[:] = velocities[:, k]
+
+
+class _DetachedRow:
+    """
+    Storage for a body that has not been added to a table yet.
+
+    Mirrors the BodyTable attributes the views use, with one-element lists in
+    place of column arrays, so building a body does not allocate any arrays.
+    """
+    __slots__ = ("body_class", "_columns", "_objects", "_index", "_children")
+
+    def __init__(self, body_class):
+        self.body_class = body_class
+        self._columns = {name: [0.0] for name in BodyTable.FLOAT_COLUMNS}
+        self._objects = {name: [None] for name in BodyTable.OBJECT_COLUMNS}
+        self._index = {}
+        self._children = {}
+
+    def row_values(self, row):
+        values = {name: column[row] for name, column in self._columns.items()}
+        values.update({name: column[row] for name, column in self._objects.items()})
+        return values
+
+
+def _float_property(name):
+    def getter(self):
+        return float(self._table._columns[name][self._row])
+
+    def setter(self, value):
+        self._table._columns[name][self._row] = value
+
+    return property(getter, setter)
+
+
+def _object_property(name):
+    def getter(self):
+        return self._table._objects[name][self._row]
+
+    def setter(self, value):
+        table = self._table
+        old = table._objects[name][self._row]
+        table._objects[name][self._row] = value
+        # Keep the name and parent indexes in sync with renames
+        if name == "name":
+            if table._index.get(old) == self._row:
+                del table._index[old]
+            table._index[value] = self._row
+        elif name == "parent_planet":
+            if old is not None:
+                table._children[old].remove(self._row)
+            if value is not None:
+                table._children.setdefault(value, []).append(self._row)
+
+    return property(getter, setter)
+
+
+class BodyView:
+    """
+    Base class for bodies stored as a row of a BodyTable.
+
+    A body created on its own keeps its values in a detached row; adding it to a
+    SolarSystem copies the row into the system's table and rebinds the view.
+    """
+    __slots__ = ("_table", "_row")
+
+    def _detach(self):
+        self._table = _DetachedRow(type(self))
+        self._row = 0
+
+    def __eq__(self, other):
+        if not isinstance(other, BodyView):
+            return NotImplemented
+        return self._table is other._table and self._row == other._row
+
+    def __hash__(self):
+        return hash((id(self._table), self._row))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(name={self.name!r})"
+
+
+for _name in BodyTable.FLOAT_COLUMNS:
+    setattr(BodyView, _name, _float_property(_name))
+for _name in BodyTable.OBJECT_COLUMNS:
+    setattr(BodyView, _name, _object_property(_name))
@@ -0,0 +1,249 @@
+import csv
+import json
+import math
+import os
+import numpy as np
+from planet import Planet
+from instrumentation import logger
+
+# Accepted spellings of each column, mapped to the BodyTable column name
+ALIASES = {
+    "name": "name", "designation": "name",
+    "mass": "mass", "radius": "radius",
+    "semi_major_axis": "semi_major_axis", "a": "semi_major_axis",
+    "eccentricity": "eccentricity", "e": "eccentricity",
+    "inclination": "inclination", "i": "inclination", "incl": "inclination",
+    "longitude_of_ascending_node": "longitude_of_ascending_node", "node": "longitude_of_ascending_node",
+    "om": "longitude_of_ascending_node", "raan": "longitude_of_ascending_node",
+    "argument_of_periapsis": "argument_of_periapsis", "peri": "argument_of_periapsis", "w": "argument_of_periapsis",
+    "mean_anomaly": "mean_anomaly", "ma": "mean_anomaly",
+    "parent_planet": "parent_planet", "parent": "parent_planet",
+    "texture_path": "texture_path", "texture": "texture_path",
+    "h": "absolute_magnitude", "absolute_magnitude": "absolute_magnitude",
+}
+ANGLE_COLUMNS = ("inclination", "longitude_of_ascending_node", "argument_of_periapsis", "mean_anomaly")
+TEXT_COLUMNS = ("name", "parent_planet", "texture_path")
+
+# 1-based inclusive column ranges of the MPC orbit (MPCORB) fixed-width format
+MPCORB_FIELDS = {
+    "absolute_magnitude": (9, 13),
+    "mean_anomaly": (27, 35),
+    "argument_of_periapsis": (38, 46),
+    "longitude_of_ascending_node": (49, 57),
+    "inclination": (60, 68),
+    "eccentricity": (71, 79),
+    "semi_major_axis": (93, 103),
+    "name": (167, 194),
+}
+
+
+def _normalize_names(columns):
+    # Rename columns to BodyTable names, dropping unknown ones
+    normalized = {}
+    for key, values in columns.items():
+        name = ALIASES.get(key.strip().lower())
+        if name is not None and name not in normalized:
+            normalized[name] = values
+    return normalized
+
+
+def read_csv(path):
+    """
+    Read a catalog from a CSV file with a header row.
+
+    Parameters:
+    path (str): The CSV file.
+
+    Returns:
+    dict: Column name (as in the header) to an array or list of values.
+    """
+    with open(path, newline="") as f:
+        header = next(csv.reader(f))
+    text = [k for k, key in enumerate(header) if ALIASES.get(key.strip().lower()) in TEXT_COLUMNS]
+    numeric = [k for k in range(len(header)) if k not in text]
+    options = {"delimiter": ",", "skiprows": 1, "ndmin": 2, "quotechar": '"', "encoding": "utf-8"}
+    try:
+        # numpy's C parser is several times faster than the csv module for large catalogs
+        values = np.loadtxt(path, usecols=numeric, **options) if numeric else None
+        strings = np.loadtxt(path, usecols=text, dtype=str, **options) if text else None
+    except ValueError:
+        # Empty or non-numeric fields in a numeric column: parse row by row instead
+        rows = []
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) != len(header):
+                    raise ValueError(f"{path}, line {reader.line_num}: expected {len(header)} fields, "
+                                     f"got {len(row)}")
+                rows.append(row)
+        return {key: [row[k] for row in rows] for k, key in enumerate(header)}
+    columns = {header[k]: values[:, j] for j, k in enumerate(numeric)}
+    columns.update({header[k]: strings[:, j].tolist() for j, k in enumerate(text)})
+    return columns
+
+
+def read_json(path):
+    """
+    Read a catalog from a JSON file.
+
+    The file holds either a list of records ({"name": ..., "a": ..., ...}) or a
+    mapping of column name to a list of values.
+
+    Parameters:
+    path (str): The JSON file.
+
+    Returns:
+    dict: Column name to a list of values.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data
+    keys = list(dict.fromkeys(key for record in data for key in record))
+    return {key: [record.get(key) for record in data] for key in keys}
+
+
+def read_mpcorb(path):
+    """
+    Read asteroids from a file in the MPC orbit (MPCORB) fixed-width format.
+
+    Any preamble up to a line of dashes is skipped, as are blank lines. Angles
+    are in degrees and semi-major axes in AU, as in the format.
+
+    Parameters:
+    path (str): The MPCORB file.
+
+    Returns:
+    dict: Column name to a list of string values.
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    for k, line in enumerate(lines):
+        if line.startswith("-----"):
+            lines = lines[k + 1:]
+            break
+    lines = [line for line in lines if line.strip()]
+    columns = {}
+    for name, (first, last) in MPCORB_FIELDS.items():
+        columns[name] = [line[first - 1:last].strip() for line in lines]
+    # Fall back to the packed designation for records without a readable one
+    columns["name"] = [name or line[:7].strip() for name, line in zip(columns["name"], lines)]
+    return columns
+
+
+def _to_float(values):
+    # Convert a column of numbers or numeric strings, with empty values as NaN
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([float(v) if v not in (None, "") else np.nan for v in values], dtype=np.float64)
+
+
+def normalize(columns, angle_unit="deg", distance_unit="au", albedo=0.14, density=2000.0):
+    """
+    Convert raw catalog columns to BodyTable columns in kilometers and radians.
+
+    Angles are converted with one unit for the whole catalog. With angle_unit
+    "auto", each angle column is taken as degrees if any of its values is
+    larger than 2 pi and as radians otherwise. Missing radii are estimated from
+    the absolute magnitude H and the albedo, and missing masses from the radius
+    and the density; any other missing value is 0.
+
+    Parameters:
+    columns (dict): Column name (any spelling in ALIASES) to values.
+    angle_unit (str): "deg", "rad" or "auto".
+    distance_unit (str): "au" or "km", the unit of the semi-major axis.
+    albedo (float): The geometric albedo used to estimate radii from H.
+    density (float): The bulk density in kg/m^3 used to estimate masses.
+
+    Returns:
+    dict: BodyTable column name to numpy arrays (lists for text columns).
+    """
+    if angle_unit not in ("deg", "rad", "auto"):
+        raise ValueError(f"Unknown angle unit {angle_unit!r}, expected 'deg', 'rad' or 'auto'")
+    if distance_unit not in ("au", "km"):
+        raise ValueError(f"Unknown distance unit {distance_unit!r}, expected 'au' or 'km'")
+    raw = _normalize_names(columns)
+    if "name" not in raw:
+        raise ValueError("The catalog has no name column")
+    if "semi_major_axis" not in raw:
+        raise ValueError("The catalog has no semi_major_axis column")
+    count = len(raw["name"])
+    result = {name: [None if v in (None, "") else str(v) for v in raw[name]] for name in TEXT_COLUMNS if name in raw}
+
+    def column(name, missing=0.0):
+        # Missing columns and empty fields both take the missing value
+        if name not in raw:
+            return np.full(count, missing)
+        values = _to_float(raw[name])
+        return np.where(np.isnan(values), missing, values)
+
+    a = column("semi_major_axis")
+    result["semi_major_axis"] = a * Planet.AU if distance_unit == "au" else a
+    result["eccentricity"] = column("eccentricity")
+    for name in ANGLE_COLUMNS:
+        values = column(name)
+        degrees = angle_unit == "deg" or (angle_unit == "auto" and np.nanmax(np.abs(values), initial=0) > 2 * math.pi)
+        result[name] = np.radians(values) if degrees else values
+
+    radius = column("radius", np.nan)
+    if "absolute_magnitude" in raw:
+        # Diameter in km from H: D = 1329 / sqrt(albedo) * 10^(-H / 5)
+        estimate = 1329 / math.sqrt(albedo) * 10 ** (-column("absolute_magnitude", np.nan) / 5) / 2
+        radius = np.where((radius > 0) & np.isfinite(radius), radius, np.nan_to_num(estimate))
+    radius = np.nan_to_num(radius)
+    result["radius"] = radius
+    mass = column("mass", np.nan)
+    estimate = density * 4 / 3 * math.pi * (radius * 1000) ** 3
+    result["mass"] = np.where((mass > 0) & np.isfinite(mass), mass, estimate)
+
+    keep = (result["semi_major_axis"] > 0) & (result["eccentricity"] >= 0) & (result["eccentricity"] < 1)
+    if not keep.all():
+        logger.warning("Skipped %d of %d catalog rows without a bound orbit (semi-major axis > 0, eccentricity "
+                       "below 1)", count - keep.sum(), count)
+        rows = np.flatnonzero(keep)
+        result = {name: [values[i] for i in rows] if isinstance(values, list) else values[rows]
+                  for name, values in result.items()}
+    return result
+
+
+def read_catalog(path, format=None, **units):
+    """
+    Read and normalize a catalog file.
+
+    Parameters:
+    path (str): The catalog file.
+    format (str): "csv", "json" or "mpcorb"; guessed from the extension if None
+        (.csv, .json, anything else is read as MPCORB).
+    units: Keyword arguments for normalize (angle_unit, distance_unit, albedo, density).
+
+    Returns:
+    dict: BodyTable column name to numpy arrays (lists for text columns).
+    """
+    if format is None:
+        extension = os.path.splitext(path)[1].lower()
+        format = {".csv": "csv", ".json": "json"}.get(extension, "mpcorb")
+    readers = {"csv": read_csv, "json": read_json, "mpcorb": read_mpcorb}
+    if format not in readers:
+        raise ValueError(f"Unknown catalog format {format!r}, expected one of {sorted(readers)}")
+    return normalize(readers[format](path), **units)
+
+
+def load_catalog(system, path, kind="asteroids", format=None, **units):
+    """
+    Read a catalog file and add its bodies to a solar system in bulk.
+
+    Parameters:
+    system (SolarSystem): The solar system to add to.
+    path (str): The catalog file.
+    kind (str): "planet", "moons" or "asteroids".
+    format (str): "csv", "json" or "mpcorb", or None to guess from the extension.
+    units: Keyword arguments for normalize (angle_unit, distance_unit, albedo, density).
+
+    Returns:
+    int: The number of bodies added.
+    """
+    return system.add_bodies(kind, read_catalog(path, format, **units))
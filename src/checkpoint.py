@@ -0,0 +1,284 @@
+import json
+import os
+import queue
+import signal
+import struct
+import threading
+import zlib
+import numpy as np
+from solar_system import SolarSystem
+
+MAGIC = b"SSCKPT\x00\x00"
+VERSION = 1
+# Magic, format version and header length
+PREAMBLE = struct.Struct("<8sII")
+COMPRESSIONS = (None, "zlib")
+
+
+def _encode(state):
+    # Split a SolarSystem state into a JSON-serializable header and a list of named arrays
+    arrays = {"sun": state["sun"]}
+    for name, array in (state.get("exact") or {}).items():
+        arrays["exact_" + name] = array
+    tables = {}
+    for attr, saved in state["tables"].items():
+        arrays[attr] = saved["floats"]
+        tables[attr] = saved["objects"]
+    header = {key: value for key, value in state.items() if key not in ("sun", "tables", "exact")}
+    # Object columns (names, parents, textures) travel as one JSON blob so the header stays small
+    arrays["objects"] = np.frombuffer(json.dumps(tables).encode("utf-8"), dtype=np.uint8)
+    return header, arrays
+
+
+def write_checkpoint(path, state, compression=None):
+    """
+    Write a SolarSystem state to a versioned binary checkpoint file.
+
+    The file is a fixed preamble (magic, version, header length), a JSON header
+    with the scalar state and a directory of the arrays, then the arrays as
+    contiguous little-endian blocks, each optionally zlib-compressed and
+    protected by a CRC32. The file is written under a temporary name and
+    renamed, so an interrupted write never replaces a good checkpoint.
+
+    Parameters:
+    path (str): The checkpoint file.
+    state (dict): The state returned by SolarSystem.get_state.
+    compression (str): None or "zlib".
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+    header, arrays = _encode(state)
+    blocks, directory, offset = [], [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        data = array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes()
+        if compression == "zlib":
+            data = zlib.compress(data, 1)
+        directory.append({"name": name, "dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape),
+                          "offset": offset, "size": len(data), "crc32": zlib.crc32(data)})
+        blocks.append(data)
+        offset += len(data)
+    header["compression"] = compression
+    header["arrays"] = directory
+    encoded = json.dumps(header).encode("utf-8")
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        for data in blocks:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_checkpoint(path):
+    """
+    Read a checkpoint written by write_checkpoint.
+
+    Parameters:
+    path (str): The checkpoint file.
+
+    Returns:
+    dict: The state, as accepted by SolarSystem.from_state.
+    """
+    with open(path, "rb") as f:
+        magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a solar system checkpoint")
+        if version > VERSION:
+            raise ValueError(f"{path} has checkpoint version {version}, this reader supports up to {VERSION}")
+        header = json.loads(f.read(length).decode("utf-8"))
+        start = f.tell()
+        arrays = {}
+        for entry in header.pop("arrays"):
+            f.seek(start + entry["offset"])
+            data = f.read(entry["size"])
+            if len(data) != entry["size"] or zlib.crc32(data) != entry["crc32"]:
+                raise ValueError(f"{path} is corrupt: array {entry['name']!r} fails its checksum")
+            if header["compression"] == "zlib":
+                data = zlib.decompress(data)
+            arrays[entry["name"]] = np.frombuffer(data, dtype=entry["dtype"]).reshape(entry["shape"]).copy()
+    header.pop("compression")
+    objects = json.loads(arrays.pop("objects").tobytes().decode("utf-8"))
+    header["sun"] = arrays.pop("sun")
+    if "exact_positions" in arrays:
+        header["exact"] = {name: arrays.pop("exact_" + name) for name in ("positions", "velocities")}
+    header["tables"] = {attr: {"floats": arrays[attr], "objects": objects[attr]} for attr in objects}
+    return header
+
+
+def restore(path, instrumentation=None):
+    """
+    Rebuild a SolarSystem from a checkpoint file.
+
+    Parameters:
+    path (str): The checkpoint file.
+    instrumentation (Instrumentation): Passed to SolarSystem.
+
+    Returns:
+    SolarSystem: The restored system, ready to continue from the checkpoint time.
+    """
+    return SolarSystem.from_state(read_checkpoint(path), instrumentation)
+
+
+class CheckpointWriter:
+    """
+    Write checkpoints from a background thread.
+
+    At most one captured state waits while another is being written, so the
+    caller only blocks if it produces checkpoints faster than they can be
+    written (double buffering).
+
+    Parameters:
+    compression (str): None or "zlib".
+    """
+    def __init__(self, compression=None):
+        self.compression = compression
+        self.written = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, state = item
+            try:
+                write_checkpoint(path, state, self.compression)
+                self.written += 1
+            except Exception as error:  # reported to the caller on the next submit or close
+                self.error = error
+
+    def _raise(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, path, state):
+        """
+        Queue a state to be written to path.
+
+        Parameters:
+        path (str): The checkpoint file.
+        state (dict): A state from SolarSystem.get_state; it must not be modified afterwards.
+        """
+        self._raise()
+        self._queue.put((path, state))
+
+    def close(self):
+        """
+        Wait for queued checkpoints to be written and stop the thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise()
+
+
+class Checkpointer:
+    """
+    Advance a SolarSystem while writing checkpoints periodically and on request.
+
+    Checkpoints are taken between steps, after every `every` steps and whenever
+    request() is called (e.g. from a signal handler). The state is copied in the
+    stepping thread and written by a CheckpointWriter. A system restored from
+    any of these checkpoints continues bit-identically to the original run,
+    since checkpoints carry the exact SI state alongside the km tables.
+
+    Parameters:
+    system (SolarSystem): The system to advance.
+    path (str): The checkpoint file, replaced atomically on every write.
+    every (int): The number of steps between periodic checkpoints, or None for none.
+    compression (str): None or "zlib".
+    """
+    def __init__(self, system, path, every=None, compression=None):
+        self.system = system
+        self.path = path
+        self.every = every
+        self.writer = CheckpointWriter(compression)
+        self._requested = False
+        self._stop = False
+        self._handlers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, stop=False):
+        """
+        Ask for a checkpoint after the current step; safe to call from a signal handler.
+
+        Parameters:
+        stop (bool): Whether advance_to should return after the checkpoint.
+        """
+        self._requested = True
+        self._stop = self._stop or stop
+
+    def install_signal_handlers(self, checkpoint_signals=(signal.SIGUSR1,), stop_signals=(signal.SIGTERM,)):
+        """
+        Checkpoint on the given signals, and checkpoint then stop on the stop signals.
+
+        Must be called from the main thread. The previous handlers are restored by close.
+
+        Parameters:
+        checkpoint_signals (tuple): Signals that request a checkpoint.
+        stop_signals (tuple): Signals that request a checkpoint and a stop, e.g. on preemption.
+        """
+        for signum in checkpoint_signals:
+            self._handlers.setdefault(signum, signal.getsignal(signum))
+            signal.signal(signum, lambda *_: self.request())
+        for signum in stop_signals:
+            self._handlers.setdefault(signum, signal.getsignal(signum))
+            signal.signal(signum, lambda *_: self.request(stop=True))
+
+    def checkpoint(self):
+        """
+        Capture the system state now and queue it for writing.
+        """
+        with self.system.instrumentation.phase("output"):
+            self.writer.submit(self.path, self.system.get_state())
+
+    def advance_to(self, t, dt=None):
+        """
+        Advance the system to time t, checkpointing along the way and at the end.
+
+        Parameters:
+        t (float): The target time in seconds since the start of the simulation.
+        dt (float): The time step in seconds, defaults to system.dt.
+
+        Returns:
+        bool: True if t was reached, False if a stop was requested first.
+        """
+        while self.system.time < t:
+            steps = 0
+            run = self.system.snapshots(t, dt)
+            try:
+                for _ in run:
+                    steps += 1
+                    if steps == self.every or self._requested:
+                        break
+            finally:
+                # Closing the generator writes the state back to the tables
+                run.close()
+            stop = self._stop
+            self._requested = self._stop = False
+            self.checkpoint()
+            if stop:
+                return self.system.time >= t
+        return True
+
+    def close(self):
+        """
+        Flush pending checkpoints and restore any replaced signal handlers.
+        """
+        for signum, handler in self._handlers.items():
+            signal.signal(signum, handler)
+        self._handlers = {}
+        self.writer.close()
@@ -0,0 +1,267 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+# Modules that must import without loading matplotlib or PIL, and the heavy modules checked for
+HEADLESS_MODULES = ("solar_system", "main", "cli", "catalog", "checkpoint", "trajectory", "ensemble", "encounters",
+                    "pipeline", "benchmark")
+HEAVY_MODULES = ("matplotlib", "PIL")
+DEFAULT_IMPORT_BUDGET = 0.5  # seconds
+
+# Run in a fresh interpreter by check_imports: time each import and list the heavy modules loaded
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+times = {}
+for name in sys.argv[1].split(","):
+    t0 = time.perf_counter()
+    __import__(name)
+    times[name] = time.perf_counter() - t0
+heavy = sorted(name for name in sys.argv[2].split(",") if name in sys.modules)
+print(json.dumps({"total": time.perf_counter() - start, "modules": times, "heavy": heavy}))
+"""
+
+
+def check_imports(modules=HEADLESS_MODULES, budget=DEFAULT_IMPORT_BUDGET, heavy=HEAVY_MODULES):
+    """
+    Import modules in a fresh interpreter and check the import time and the modules they pull in.
+
+    Parameters:
+    modules (tuple): The modules to import, in order.
+    budget (float): The allowed total import time in seconds.
+    heavy (tuple): Modules that must not be loaded by the imports.
+
+    Returns:
+    dict: The total and per-module import times, the heavy modules loaded, and whether the check passed.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE, ",".join(modules), ",".join(heavy)],
+                            cwd=here, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    result["budget"] = budget
+    result["passed"] = result["total"] <= budget and not result["heavy"]
+    return result
+
+
+def build_system(args):
+    """
+    Create the system for a run: restored from a checkpoint, or the default solar system plus an optional catalog.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line.
+
+    Returns:
+    SolarSystem: The system, ready to advance.
+    """
+    if args.restore:
+        from checkpoint import restore
+        system = restore(args.restore)
+    else:
+        from main import build_default_system
+        system = build_default_system(integrator=args.integrator)
+        if args.catalog:
+            from catalog import load_catalog
+            load_catalog(system, args.catalog, kind=args.kind)
+    if args.tolerance is not None:
+        if system.controller is not None:
+            # A restored run keeps its current step and drift reference; --dt was only its first step
+            system.controller.tolerance = args.tolerance
+        elif system.monitor is not None:
+            # Keep the restored reference so drifts stay measured from the start of the run
+            monitor = system.monitor
+            system.monitor_conservation(args.tolerance)
+            system.monitor = monitor
+        else:
+            system.monitor_conservation(args.tolerance)
+    return system
+
+
+def _end_time(system, args):
+    # --days and --years are added together, relative to the system's current time
+    return system.time + (args.days + 365 * args.years) * 86400
+
+
+def simulate(args):
+    """
+    Run a simulation without drawing, optionally writing a trajectory or checkpoints.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line.
+
+    Returns:
+    int: The exit status; 3 if a checkpoint stop was requested before the end time.
+    """
+    from instrumentation import default_instrumentation
+    system = build_system(args)
+    instrumentation = default_instrumentation()
+    instrumentation.enabled = bool(args.summary)
+    if args.profile:
+        instrumentation.profile(args.profile, args.profile_output)
+    t = _end_time(system, args)
+    status = 0
+    if args.trajectory:
+        from trajectory import write_trajectory
+        write_trajectory(system, args.trajectory, t, args.dt, args.every)
+    elif args.checkpoint:
+        from checkpoint import Checkpointer
+        with Checkpointer(system, args.checkpoint, args.checkpoint_every, args.compression) as checkpointer:
+            checkpointer.install_signal_handlers()
+            if not checkpointer.advance_to(t, args.dt):
+                status = 3
+    else:
+        system.advance_to(t, args.dt)
+    if args.summary:
+        instrumentation.write_summary(args.summary)
+    result = {"time": system.time, "bodies": len(system.body_names())}
+    if system.monitor is not None:
+        result["conservation"] = system.monitor.summary()
+    print(json.dumps(result))
+    return status
+
+
+def export(args):
+    """
+    Run a simulation and render it offscreen to a video file.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line.
+
+    Returns:
+    int: The exit status.
+    """
+    # Select the offscreen backend before anything imports pyplot, so no display is needed
+    import matplotlib
+    matplotlib.use("Agg")
+    from renderer import body_groups, export_video
+    from trajectory import write_trajectory
+
+    system = build_system(args)
+    t = _end_time(system, args)
+    with tempfile.TemporaryDirectory() as directory:
+        reader = write_trajectory(system, os.path.join(directory, "frames"), t, args.dt, args.every)
+        export_video(args.output, reader.positions, body_groups(system), fps=args.fps, workers=args.workers,
+                     trail_length=args.trail_length)
+    print(json.dumps({"output": args.output, "frames": len(reader)}))
+    return 0
+
+
+def benchmark(args):
+    """
+    Run the benchmark suite and write its JSON results.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line.
+
+    Returns:
+    int: The exit status.
+    """
+    from benchmark import DEFAULT_CASES, run_benchmarks
+    run_benchmarks(args.cases or DEFAULT_CASES, args.output, dt=args.dt, seed=args.seed, repeats=args.repeats,
+                   min_time=args.min_time, render=args.render)
+    return 0
+
+
+def import_check(args):
+    """
+    Check that the headless modules import within the time budget without matplotlib or PIL.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line.
+
+    Returns:
+    int: 0 if the check passed, 1 otherwise.
+    """
+    result = check_imports(args.modules.split(",") if args.modules else HEADLESS_MODULES, args.budget)
+    print(json.dumps(result, indent=2))
+    return 0 if result["passed"] else 1
+
+
+def _add_run_arguments(parser):
+    # Options shared by simulate and export
+    parser.add_argument("--days", type=float, default=0.0, help="simulated days (added to --years)")
+    parser.add_argument("--years", type=float, default=0.0, help="simulated years of 365 days")
+    parser.add_argument("--dt", type=float, default=None, help="time step in seconds (default: the system's)")
+    parser.add_argument("--every", type=int, default=1, help="keep every this many steps")
+    parser.add_argument("--integrator", default="leapfrog", help="leapfrog, yoshida4 or rk45")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="adapt the step to this relative energy change per step (--dt is the first step)")
+    parser.add_argument("--catalog", help="CSV, JSON or MPCORB file of extra bodies")
+    parser.add_argument("--kind", default="asteroids", help="planet, moons or asteroids, for --catalog")
+    parser.add_argument("--restore", help="continue from a checkpoint instead of the default system")
+
+
+def build_parser():
+    """
+    Build the command-line parser.
+
+    Returns:
+    argparse.ArgumentParser: The parser, with one subcommand per action.
+    """
+    from benchmark import parse_case
+
+    parser = argparse.ArgumentParser(description="Run the solar system simulation without a display.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="log INFO (-v) or DEBUG (-vv) records")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("simulate", help="advance the system and optionally write its output")
+    _add_run_arguments(command)
+    output = command.add_mutually_exclusive_group()
+    output.add_argument("--trajectory", help="write positions to this path (without extension)")
+    output.add_argument("--checkpoint", help="write checkpoints to this file")
+    command.add_argument("--checkpoint-every", type=int, default=None, help="steps between checkpoints")
+    command.add_argument("--compression", choices=("zlib",), default=None, help="checkpoint compression")
+    command.add_argument("--summary", help="write the instrumentation summary to this JSON file")
+    command.add_argument("--profile", type=int, default=0, help="profile this many steps (report with -v)")
+    command.add_argument("--profile-output", help="write the raw profile to this file")
+    command.set_defaults(run=simulate)
+
+    command = commands.add_parser("export", help="render a simulation offscreen to a .gif or (with ffmpeg) .mp4")
+    _add_run_arguments(command)
+    command.add_argument("output", help="the video file")
+    command.add_argument("--fps", type=int, default=30)
+    command.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    command.add_argument("--trail-length", type=int, default=100)
+    command.set_defaults(run=export)
+
+    command = commands.add_parser("benchmark", help="run the benchmark suite")
+    command.add_argument("--case", dest="cases", action="append", type=parse_case,
+                         help="PLANETSxMOONSxASTEROIDS, may be repeated (default: 8x2x0 up to 8x2x100000, 100x0x0, "
+                              "1000x0x0)")
+    command.add_argument("--output", default="benchmark.json", help="JSON results file")
+    command.add_argument("--dt", type=float, default=86400.0, help="time step in seconds")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--repeats", type=int, default=5)
+    command.add_argument("--min-time", type=float, default=0.2)
+    command.add_argument("--no-render", dest="render", action="store_false")
+    command.set_defaults(run=benchmark)
+
+    command = commands.add_parser("import-check", help="check import time and that no plotting modules load")
+    command.add_argument("--budget", type=float, default=DEFAULT_IMPORT_BUDGET, help="seconds")
+    command.add_argument("--modules", help="comma-separated modules (default: the headless modules)")
+    command.set_defaults(run=import_check)
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line.
+
+    Parameters:
+    argv (list): The arguments, defaults to sys.argv[1:].
+
+    Returns:
+    int: The exit status.
+    """
+    args = build_parser().parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG if args.verbose > 1 else logging.INFO, format="%(message)s")
+        logging.getLogger("solar_system").setLevel(logging.DEBUG if args.verbose > 1 else logging.INFO)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+from collections import namedtuple
+import numpy as np
+
+# Per-step conserved quantities of the massive bodies. energy is in joules and
+# angular_momentum is the (3,) vector in kg m^2/s. energy_drift is the signed
+# change of the energy since the reference state, relative to the reference
+# energy, and angular_momentum_drift the norm of the change of the angular
+# momentum relative to its reference norm. energy_step and
+# angular_momentum_step are the same changes over the last step alone.
+Drift = namedtuple("Drift", "time dt energy angular_momentum energy_drift angular_momentum_drift energy_step "
+                            "angular_momentum_step")
+
+
+class ConservationMonitor:
+    """
+    Track the total energy and angular momentum of the massive bodies step by step.
+
+    The potential energy is passed in from the force pass (see
+    pairwise_accelerations(potential=True)). The kinetic energy and the angular
+    momentum are O(N) sums, so a monitored step costs little more than an
+    unmonitored one. Test particles carry no mass in the dynamics and are left
+    out.
+
+    The reference is the first state measured, and it is taken again if the
+    number of bodies changes.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the reference state and the statistics.
+        """
+        self.reference = None
+        self.last = None
+        self.steps = 0
+        self.max_energy_drift = 0.0
+        self.max_angular_momentum_drift = 0.0
+        self._previous = None
+
+    def get_state(self):
+        """
+        Return the reference and statistics needed to continue measuring bit-identically, e.g. in a checkpoint.
+
+        Returns:
+        dict: JSON-serializable values.
+        """
+        def vector(value):
+            return None if value is None else [float(x) for x in value]
+
+        last = self.last
+        return {
+            "reference": None if self.reference is None else
+            [self.reference[0], float(self.reference[1]), vector(self.reference[2])],
+            "previous": None if self._previous is None else [float(self._previous[0]), vector(self._previous[1])],
+            "last": None if last is None else {**last._asdict(), "angular_momentum": vector(last.angular_momentum)},
+            "steps": self.steps,
+            "max_energy_drift": self.max_energy_drift,
+            "max_angular_momentum_drift": self.max_angular_momentum_drift,
+        }
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state.
+
+        Parameters:
+        state (dict): The saved values.
+        """
+        self.reset()
+        if state["reference"] is not None:
+            count, energy, angular_momentum = state["reference"]
+            self.reference = (count, energy, np.array(angular_momentum))
+        if state["previous"] is not None:
+            energy, angular_momentum = state["previous"]
+            self._previous = (energy, np.array(angular_momentum))
+        if state["last"] is not None:
+            self.last = Drift(**{**state["last"], "angular_momentum": np.array(state["last"]["angular_momentum"])})
+        self.steps = state["steps"]
+        self.max_energy_drift = state["max_energy_drift"]
+        self.max_angular_momentum_drift = state["max_angular_momentum_drift"]
+
+    @staticmethod
+    def totals(positions, velocities, masses, potential):
+        """
+        Return the total energy and angular momentum of a set of bodies.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions in meters.
+        velocities (numpy.ndarray): The (N, 3) velocities in meters per second.
+        masses (numpy.ndarray): The (N,) masses in kilograms.
+        potential (float): The potential energy of the bodies in joules.
+
+        Returns:
+        tuple: The energy in joules and the (3,) angular momentum about the origin.
+        """
+        kinetic = 0.5 * np.einsum("i,ij,ij->", masses, velocities, velocities)
+        angular_momentum = np.einsum("i,ij->j", masses, np.cross(positions, velocities))
+        return kinetic + potential, angular_momentum
+
+    def start(self, positions, velocities, masses, potential):
+        """
+        Take the reference state that drifts are measured from.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions in meters.
+        velocities (numpy.ndarray): The (N, 3) velocities in meters per second.
+        masses (numpy.ndarray): The (N,) masses in kilograms.
+        potential (float): The potential energy of the bodies in joules.
+        """
+        self.reset()
+        energy, angular_momentum = self.totals(positions, velocities, masses, potential)
+        self.reference = (len(masses), energy, angular_momentum)
+        self._previous = (energy, angular_momentum)
+
+    def measure(self, time, dt, positions, velocities, masses, potential):
+        """
+        Compare a state with the reference without recording it.
+
+        Parameters:
+        time (float): The simulation time of the state in seconds.
+        dt (float): The step that led to the state in seconds.
+        positions (numpy.ndarray): The (N, 3) positions in meters.
+        velocities (numpy.ndarray): The (N, 3) velocities in meters per second.
+        masses (numpy.ndarray): The (N,) masses in kilograms.
+        potential (float): The potential energy of the bodies in joules.
+
+        Returns:
+        Drift: The conserved quantities and their drifts.
+        """
+        _, energy0, angular_momentum0 = self.reference
+        previous_energy, previous_angular_momentum = self._previous
+        energy, angular_momentum = self.totals(positions, velocities, masses, potential)
+        # Guard against a zero reference, e.g. a single body at rest
+        scale = float(abs(energy0)) or 1.0
+        norm = float(np.linalg.norm(angular_momentum0)) or 1.0
+        return Drift(float(time), float(dt), float(energy), angular_momentum, float(energy - energy0) / scale,
+                     float(np.linalg.norm(angular_momentum - angular_momentum0)) / norm,
+                     float(energy - previous_energy) / scale,
+                     float(np.linalg.norm(angular_momentum - previous_angular_momentum)) / norm)
+
+    def record(self, drift):
+        """
+        Accept a measured step as the new current state.
+
+        Parameters:
+        drift (Drift): A value returned by measure.
+        """
+        self.last = drift
+        self.steps += 1
+        self.max_energy_drift = max(self.max_energy_drift, abs(drift.energy_drift))
+        self.max_angular_momentum_drift = max(self.max_angular_momentum_drift, drift.angular_momentum_drift)
+        self._previous = (drift.energy, drift.angular_momentum)
+
+    def summary(self):
+        """
+        Return the drift statistics of the steps recorded so far.
+
+        Returns:
+        dict: Steps, the last and largest energy and angular momentum drifts, and the last step size.
+        """
+        last = self.last
+        return {
+            "steps": self.steps,
+            "energy_drift": last.energy_drift if last else 0.0,
+            "angular_momentum_drift": last.angular_momentum_drift if last else 0.0,
+            "max_energy_drift": self.max_energy_drift,
+            "max_angular_momentum_drift": self.max_angular_momentum_drift,
+            "dt": last.dt if last else None,
+        }
+
+
+class TimestepController:
+    """
+    Adapt the time step to hold the energy and angular momentum drift of each step under a tolerance.
+
+    The error of a step is the larger of |energy_step| and
+    angular_momentum_step: the exact dynamics conserve both, so any change over
+    a step is integration error, and it scales as dt ** (order + 1). A step
+    whose error exceeds the tolerance is rejected and retried with a smaller
+    one. Every step's successor is scaled by
+    safety * (tolerance / error) ** (1 / (order + 1)), within min_shrink and
+    max_growth, so the step settles near the largest one the tolerance allows.
+    Steps at dt_min are always accepted.
+
+    The drift since the start of the run is not controlled directly: error
+    that has built up is not undone by later, smaller steps, so a limit on it
+    would leave the step at dt_min once reached. For the symplectic integrators
+    (leapfrog, yoshida4 and the moon stepper) the per-step errors largely cancel
+    and the total drift stays of the order of the tolerance times the steps per
+    orbit of the fastest body; with rk45 it grows with the number of steps.
+
+    Parameters:
+    tolerance (float): The largest relative change of energy or angular momentum per step.
+    dt_min (float): The smallest step in seconds.
+    dt_max (float): The largest step in seconds, or None for no limit.
+    order (int): The order of the integrator.
+    safety (float): The factor applied to every new step.
+    max_growth (float): The largest factor by which one step may grow.
+    min_shrink (float): The smallest factor by which one step may shrink.
+    """
+    def __init__(self, tolerance, dt_min=1.0, dt_max=None, order=2, safety=0.9, max_growth=2.0, min_shrink=0.2):
+        if tolerance <= 0:
+            raise ValueError(f"The tolerance must be positive, got {tolerance}")
+        self.tolerance = tolerance
+        self.dt_min = dt_min
+        self.dt_max = dt_max
+        self.order = order
+        self.safety = safety
+        self.max_growth = max_growth
+        self.min_shrink = min_shrink
+        # The step to continue with, carried between runs
+        self.dt = None
+        self.accepted = 0
+        self.rejected = 0
+
+    def get_state(self):
+        """
+        Return the settings and the current step needed to continue bit-identically, e.g. in a checkpoint.
+
+        Returns:
+        dict: JSON-serializable values.
+        """
+        return {"tolerance": self.tolerance, "dt_min": self.dt_min, "dt_max": self.dt_max, "order": self.order,
+                "safety": self.safety, "max_growth": self.max_growth, "min_shrink": self.min_shrink, "dt": self.dt,
+                "accepted": self.accepted, "rejected": self.rejected}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuild a controller from a state returned by get_state.
+
+        Parameters:
+        state (dict): The saved values.
+
+        Returns:
+        TimestepController: The restored controller.
+        """
+        controller = cls(state["tolerance"], state["dt_min"], state["dt_max"], state["order"], state["safety"],
+                         state["max_growth"], state["min_shrink"])
+        controller.dt = state["dt"]
+        controller.accepted = state["accepted"]
+        controller.rejected = state["rejected"]
+        return controller
+
+    def error(self, drift):
+        """
+        Return the error of a step, to compare with the tolerance.
+
+        Parameters:
+        drift (Drift): The measured step.
+
+        Returns:
+        float: The larger of the relative energy and angular momentum changes over the step.
+        """
+        return max(abs(drift.energy_step), drift.angular_momentum_step)
+
+    def update(self, drift, dt, full=True):
+        """
+        Decide whether to accept a step and choose the next step size.
+
+        Parameters:
+        drift (Drift): The measured step.
+        dt (float): The step that was taken in seconds.
+        full (bool): False if the step was shortened to land on an end time; such a
+            step is still judged, but only a rejection changes the step size.
+
+        Returns:
+        bool: Whether the step is accepted.
+        """
+        error = self.error(drift)
+        factor = self.max_growth if error == 0 else self.safety * (self.tolerance / error) ** (1 / (self.order + 1))
+        accepted = error <= self.tolerance or dt <= self.dt_min
+        if accepted:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+        if full or not accepted:
+            dt = max(self.dt_min, dt * min(max(factor, self.min_shrink), self.max_growth))
+            self.dt = dt if self.dt_max is None else min(dt, self.dt_max)
+        return accepted
@@ -0,0 +1,349 @@
+import logging
+import math
+from collections import namedtuple
+import numpy as np
+from instrumentation import logger
+
+# The cell itself and the 13 neighbors with a larger index, so each cell pair is visited once
+_HALF_OFFSETS = np.array([(0, 0, 0)] + [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)
+                                        if (x, y, z) > (0, 0, 0)], dtype=np.int64)
+
+Encounter = namedtuple("Encounter", "time body other distance threshold collision")
+
+
+def _cell_keys(cells):
+    # Number the cells with exact integer keys: return the keys of the points' cells and
+    # a function giving the keys of neighboring cells, where a key no point has (or -1)
+    # means an empty cell. Distinct cells never share a key.
+    low = cells.min(axis=0) - 1
+    # The bounding box of the cells with a one-cell margin for the neighbors
+    extent = cells.max(axis=0) - low + 2
+    if math.prod(extent.tolist()) < 2 ** 62:
+        strides = np.array([extent[1] * extent[2], extent[2], 1], dtype=np.int64)
+        keys = (cells - low) @ strides
+
+        def key_of(coords):
+            return (coords - low) @ strides
+        return keys, key_of
+
+    # A sparse, wide grid: flatten the per-axis ranks among the occupied coordinates instead
+    axes = [np.unique(cells[:, k]) for k in range(3)]
+    shape = tuple(len(axis) for axis in axes)
+    if math.prod(shape) < 2 ** 62:
+        keys = np.ravel_multi_index(tuple(np.searchsorted(axes[k], cells[:, k]) for k in range(3)), shape)
+
+        def key_of(coords):
+            ranks = tuple(np.minimum(np.searchsorted(axes[k], coords[:, k]), shape[k] - 1) for k in range(3))
+            occupied = np.all([axes[k][ranks[k]] == coords[:, k] for k in range(3)], axis=0)
+            return np.where(occupied, np.ravel_multi_index(ranks, shape), -1)
+        return keys, key_of
+
+    # Too many distinct coordinates to flatten into an int64: number the cells through a dict
+    unique, keys = np.unique(cells, axis=0, return_inverse=True)
+    numbers = {cell: k for k, cell in enumerate(map(tuple, unique.tolist()))}
+
+    def key_of(coords):
+        return np.array([numbers.get(cell, -1) for cell in map(tuple, coords.tolist())], dtype=np.int64)
+    return keys.reshape(-1), key_of
+
+
+def spatial_pairs(positions, radius):
+    """
+    Find every pair of points closer than radius with a uniform grid.
+
+    Points are binned into cubic cells of side radius, so only points in the
+    same or adjacent cells are compared. The cost grows with the number of
+    points plus the number of close candidates, not with the number of pairs.
+
+    Parameters:
+    positions (numpy.ndarray): The (N, 3) positions.
+    radius (float): The search radius, in the units of the positions.
+
+    Returns:
+    tuple: The (K,) arrays of first and second indices (first < second) and their distances.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    empty = np.empty(0, dtype=np.int64)
+    if len(positions) < 2 or radius <= 0:
+        return empty, empty, np.empty(0)
+    cells = np.floor(positions / radius).astype(np.int64)
+    keys, key_of = _cell_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    unique, start, counts = np.unique(keys, return_index=True, return_counts=True)
+    coords = cells[order[start]]
+
+    first, second = [], []
+    for offset in _HALF_OFFSETS:
+        neighbor = key_of(coords + offset)
+        index = np.minimum(np.searchsorted(unique, neighbor), len(unique) - 1)
+        found = (neighbor >= 0) & (unique[index] == neighbor)
+        a, b = np.flatnonzero(found), index[found]
+        if not offset.any():
+            # Same cell: only cells with two or more points have pairs
+            a = a[counts[a] > 1]
+            b = a
+        sizes = counts[a] * counts[b]
+        total = int(sizes.sum())
+        if total == 0:
+            continue
+        # Expand every cell pair into its point pairs without a Python loop
+        pair = np.repeat(np.arange(len(a)), sizes)
+        within = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        i = within // counts[b][pair]
+        j = within % counts[b][pair]
+        if not offset.any():
+            keep = i < j
+            pair, i, j = pair[keep], i[keep], j[keep]
+        first.append(order[start[a][pair] + i])
+        second.append(order[start[b][pair] + j])
+    if not first:
+        return empty, empty, np.empty(0)
+    first, second = np.concatenate(first), np.concatenate(second)
+    distance = np.linalg.norm(positions[first] - positions[second], axis=1)
+    close = distance < radius
+    first, second, distance = first[close], second[close], distance[close]
+    swap = first > second
+    first[swap], second[swap] = second[swap], first[swap]
+    return first, second, distance
+
+
+class EncounterDetector:
+    """
+    Detect close approaches between bodies at one instant.
+
+    A pair (i, j) is an encounter when its distance is below the largest of
+    radius_factor times the sum of the radii, hill_factor times the larger Hill
+    radius (computed about each body's central body) and, for pairs involving a
+    target, the fixed distance. A body and its own central body (a planet and
+    the sun, a moon and its planet) are only compared on their radii. Pairs
+    closer than the sum of the radii are collisions.
+
+    Bodies whose reach is larger than the grid cell (the sun, planets with big
+    Hill spheres, the targets) are compared with every body directly; all other
+    pairs go through spatial_pairs, so the cost is near-linear in the number of
+    bodies.
+
+    Parameters:
+    masses (numpy.ndarray): The (N,) masses in kilograms.
+    radii (numpy.ndarray): The (N,) physical radii, in the units of the positions.
+    central (numpy.ndarray): The (N,) index of each body's central body, -1 for none.
+    radius_factor (float): The multiple of the sum of the radii that counts as an encounter.
+    hill_factor (float): The multiple of the Hill radius that counts as an encounter, or None.
+    targets (list): Body indices to restrict the search to pairs involving them, or None for all pairs.
+    distance (float): A fixed encounter distance for pairs involving a target (all pairs if targets is None).
+    max_direct (int): The most bodies compared directly; the grid cell size is the next largest reach.
+    """
+    def __init__(self, masses, radii, central=None, radius_factor=1.0, hill_factor=None, targets=None,
+                 distance=None, max_direct=16):
+        self.masses = np.asarray(masses, dtype=np.float64)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        n = len(self.masses)
+        self.central = np.full(n, -1) if central is None else np.asarray(central)
+        self.radius_factor = radius_factor
+        self.hill_factor = hill_factor
+        self.targets = None if targets is None else np.asarray(targets, dtype=np.int64)
+        self.distance = distance
+        self.max_direct = max_direct
+        has_central = self.central >= 0
+        # Hill radius r * cbrt(m / 3M) is proportional to the distance from the central body
+        self._hill_scale = np.zeros(n)
+        self._hill_scale[has_central] = np.cbrt(self.masses[has_central] / (3 * self.masses[self.central[has_central]]))
+
+    def hill_radii(self, positions):
+        """
+        Return the Hill radius of every body about its central body.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions.
+
+        Returns:
+        numpy.ndarray: The (N,) Hill radii, 0 for bodies without a central body.
+        """
+        has_central = self.central >= 0
+        r = np.zeros(len(positions))
+        r[has_central] = np.linalg.norm(positions[has_central] - positions[self.central[has_central]], axis=1)
+        return r * self._hill_scale
+
+    def _thresholds(self, i, j, hill):
+        # Encounter distance of each candidate pair
+        threshold = self.radius_factor * (self.radii[i] + self.radii[j])
+        if self.hill_factor:
+            related = (self.central[i] == j) | (self.central[j] == i)
+            threshold = np.maximum(threshold, np.where(related, 0.0, self.hill_factor * np.maximum(hill[i], hill[j])))
+        if self.distance is not None:
+            if self.targets is None:
+                threshold = np.maximum(threshold, self.distance)
+            else:
+                involved = np.isin(i, self.targets) | np.isin(j, self.targets)
+                threshold = np.maximum(threshold, np.where(involved, self.distance, 0.0))
+        return threshold
+
+    def _direct(self, positions, rows, reach):
+        # Candidate pairs between the given rows and every other body within the row's reach
+        first, second = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+        for row, limit in zip(rows.tolist(), reach.tolist()):
+            offset = positions - positions[row]
+            d2 = np.einsum("ij,ij->i", offset, offset)
+            other = np.flatnonzero(d2 < limit * limit)
+            other = other[other != row]
+            first.append(np.full(len(other), row))
+            second.append(other)
+        first, second = np.concatenate(first), np.concatenate(second)
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def detect(self, positions):
+        """
+        Find the encounters at the given positions.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions.
+
+        Returns:
+        tuple: The (K,) arrays of first and second body indices, distances and thresholds.
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        n = len(positions)
+        hill = self.hill_radii(positions) if self.hill_factor else np.zeros(n)
+        # Upper bound on the threshold of any pair involving each body
+        reach = 2 * self.radius_factor * self.radii + (self.hill_factor or 0) * hill
+        if self.distance is not None and self.targets is None:
+            reach = reach + self.distance
+
+        if self.targets is not None:
+            reach_targets = reach[self.targets] + reach.max() + (self.distance or 0)
+            i, j = self._direct(positions, self.targets, reach_targets)
+        else:
+            direct = np.argsort(reach)[::-1][:min(self.max_direct, n)]
+            cell = reach[direct[-1]] if len(direct) < n else 0.0
+            direct = direct[reach[direct] > cell]
+            i, j = self._direct(positions, direct, reach[direct] + cell) if len(direct) else (np.empty(0, int),) * 2
+            small = np.ones(n, dtype=bool)
+            small[direct] = False
+            rows = np.flatnonzero(small)
+            a, b, _ = spatial_pairs(positions[rows], cell)
+            i, j = np.concatenate([i, rows[a]]), np.concatenate([j, rows[b]])
+
+        # A pair can be found from both of its bodies; keep it once
+        if len(i):
+            pairs = np.unique(np.stack([i, j], axis=1), axis=0)
+            i, j = pairs[:, 0], pairs[:, 1]
+        distance = np.linalg.norm(positions[i] - positions[j], axis=1)
+        threshold = self._thresholds(i, j, hill)
+        close = distance < threshold
+        return i[close], j[close], distance[close], threshold[close]
+
+
+def log_encounter(encounter):
+    """
+    Hook that logs each encounter at INFO level (collisions at WARNING).
+
+    Parameters:
+    encounter (Encounter): The encounter.
+    """
+    level = logging.WARNING if encounter.collision else logging.INFO
+    logger.log(level, "encounter time=%s body=%s other=%s distance=%s threshold=%s collision=%s", *encounter)
+
+
+class EncounterMonitor:
+    """
+    Run a SolarSystem and check for encounters after every step.
+
+    Each encounter found is passed to every hook. A hook that returns True stops
+    the run after the current step, with the state written back to the system,
+    e.g. so a collision can be resolved by merging the bodies or the step
+    refined before continuing. The closest approach of every pair seen is kept
+    in closest.
+
+    Parameters:
+    system (SolarSystem): The system to run.
+    hooks (list): Callables taking an Encounter.
+    options: Keyword arguments for EncounterDetector (radius_factor, hill_factor, distance, max_direct),
+        with targets given as body names.
+    """
+    def __init__(self, system, hooks=(), targets=None, **options):
+        self.system = system
+        self.hooks = list(hooks)
+        self.closest = {}
+        self._targets = targets
+        self._options = options
+        self.detector = None
+        self.names = []
+
+    def _build(self):
+        # Rebuild the detector for the current bodies, in the order of SolarSystem.snapshots
+        system = self.system
+        self.names = system.body_names()
+        index = {name: i for i, name in enumerate(self.names)}
+        tables = (system.planet, system.moons, system.asteroids)
+        masses = np.concatenate([[system.sun.mass]] + [table.column("mass") for table in tables])
+        radii = np.concatenate([[system.sun.radius]] + [table.column("radius") for table in tables])
+        # Planets and asteroids orbit the sun, moons their parent planet
+        central = np.zeros(len(masses), dtype=np.int64)
+        central[0] = -1
+        moon_start = 1 + len(system.planet)
+        for k, parent in enumerate(system.moons.object_column("parent_planet")):
+            central[moon_start + k] = index[parent]
+        targets = None if self._targets is None else [index[name] for name in self._targets]
+        self.detector = EncounterDetector(masses, radii, central, targets=targets, **self._options)
+
+    def check(self, time, positions):
+        """
+        Detect the encounters at one instant and pass them to the hooks.
+
+        Parameters:
+        time (float): The time in seconds.
+        positions (numpy.ndarray): The (N, 3) positions in kilometers, ordered as system.body_names().
+
+        Returns:
+        bool: True if a hook asked to stop.
+        """
+        if self.detector is None or len(self.names) != len(positions):
+            self._build()
+        stop = False
+        for i, j, distance, threshold in zip(*(values.tolist() for values in self.detector.detect(positions))):
+            body, other = self.names[i], self.names[j]
+            collision = bool(distance < self.detector.radii[i] + self.detector.radii[j])
+            encounter = Encounter(time, body, other, distance, threshold, collision)
+            best = self.closest.get((body, other))
+            if best is None or distance < best.distance:
+                self.closest[(body, other)] = encounter
+            for hook in self.hooks:
+                stop = bool(hook(encounter)) or stop
+        return stop
+
+    def advance_to(self, t, dt=None):
+        """
+        Advance the system to time t, checking for encounters after every step.
+
+        Parameters:
+        t (float): The target time in seconds since the start of the simulation.
+        dt (float): The time step in seconds, defaults to system.dt.
+
+        Returns:
+        bool: True if t was reached, False if a hook stopped the run.
+        """
+        self._build()
+        run = self.system.snapshots(t, dt)
+        try:
+            for time, positions in run:
+                if self.check(time, positions):
+                    return self.system.time >= t
+        finally:
+            run.close()
+        return True
+
+    def within(self, target, distance):
+        """
+        Return the bodies that came within a distance of a target, closest first.
+
+        Parameters:
+        target (str): The target body, e.g. "Earth".
+        distance (float): The distance in kilometers.
+
+        Returns:
+        list: The closest-approach Encounter of each such body.
+        """
+        found = [encounter for (body, other), encounter in self.closest.items()
+                 if target in (body, other) and encounter.distance < distance]
+        return sorted(found, key=lambda encounter: encounter.distance)
@@ -0,0 +1,244 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from body_table import BodyTable
+from solar_system import SolarSystem
+from sun import Sun
+
+TABLES = ("planet", "moons", "asteroids")
+
+# Set in each worker process by _init_worker
+_base = None
+
+
+def _share(array):
+    # Copy an array into a new shared memory block, returning the block and its description
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach(description):
+    # Map a block created by _share as a read-only array; the block must stay referenced while the array is used
+    name, shape, dtype = description
+    block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return block, array
+
+
+def _init_worker(blocks, base):
+    # Pool initializer: attach the shared float columns once per worker process
+    global _base
+    base = dict(base)
+    base["blocks"] = []
+    base["columns"] = {}
+    for attr, description in blocks.items():
+        block, array = _attach(description)
+        base["blocks"].append(block)
+        base["columns"][attr] = array
+    _base = base
+
+
+def _build_member(base, member):
+    # Build the SolarSystem of one member from the base columns and apply its perturbation
+    system = SolarSystem(Sun(*base["sun"]), **base["options"])
+    for attr in TABLES:
+        count = len(base["objects"][attr]["name"])
+        if count:
+            columns = dict(zip(BodyTable.FLOAT_COLUMNS, base["columns"][attr]))
+            columns.update(base["objects"][attr])
+            getattr(system, attr).extend(columns, count)
+
+    # One independent stream per member, so results do not depend on scheduling
+    rng = np.random.default_rng([base["seed"], member])
+    applied = {}
+    for body, sigmas in base["perturbations"]:
+        table = getattr(system, base["tables"][body])
+        row = table.row_of(body)
+        applied[body] = {}
+        for element, sigma in sigmas:
+            column = table.column(element)
+            value = column[row] + rng.normal(0.0, sigma)
+            if element == "eccentricity":
+                value = min(max(value, 0.0), 1 - 1e-9)
+            column[row] = value
+            applied[body][element] = float(value)
+    return system, applied
+
+
+def _run_member(base, member, t, dt):
+    # Integrate one member, keeping only the closest approach of each observer to each target
+    system, applied = _build_member(base, member)
+    index = {name: i for i, name in enumerate(system.body_names())}
+    observers = [index[name] for name in base["observers"]]
+    targets = [index[name] for name in base["targets"]]
+    min_distance = np.full((len(observers), len(targets)), np.inf)
+    min_time = np.zeros_like(min_distance)
+    for time, positions in system.snapshots(t, dt):
+        distance = np.linalg.norm(positions[observers][:, None] - positions[targets][None], axis=-1)
+        closer = distance < min_distance
+        min_distance[closer] = distance[closer]
+        min_time[closer] = time
+    return {
+        "member": member,
+        "elements": applied,
+        "min_distance": {o: dict(zip(base["targets"], row)) for o, row in zip(base["observers"], min_distance.tolist())},
+        "time_of_min": {o: dict(zip(base["targets"], row)) for o, row in zip(base["observers"], min_time.tolist())},
+    }
+
+
+def _worker_run(member, t, dt):
+    return _run_member(_base, member, t, dt)
+
+
+class Ensemble:
+    """
+    Monte Carlo ensemble of perturbed copies of a solar system.
+
+    Every member starts from the orbital elements of the base system, with the
+    elements named in the perturbation spec drawn from a normal distribution
+    around their base values. Members run in a process pool; the float columns
+    of the base tables (masses, radii, elements) are placed in shared memory
+    once and every worker maps them read-only. Each member returns only its
+    closest approaches, sampled at every step, not its trajectory. Member i
+    always uses the random stream seeded with (seed, i), so results do not
+    depend on the number of workers or the order members finish in.
+
+    Parameters:
+    system (SolarSystem): The base system; it must not have been advanced yet.
+    perturbations (dict): Body name to {element column: standard deviation}, in the column's units.
+    targets (list): The bodies to measure close approaches to, e.g. ["Earth", "Mars"].
+    observers (list): The bodies whose approaches are measured, defaults to the perturbed bodies.
+    seed (int): The base random seed.
+    """
+    def __init__(self, system, perturbations, targets, observers=None, seed=0):
+        if system.time != 0:
+            raise ValueError("The base system must not have been advanced; members start from its orbital elements")
+        tables = {}
+        for attr in TABLES:
+            for name in getattr(system, attr).names():
+                tables[name] = attr
+        for body, sigmas in perturbations.items():
+            if body not in tables:
+                raise ValueError(f"Unknown body {body!r}")
+            for element in sigmas:
+                if element not in BodyTable.ELEMENT_COLUMNS:
+                    raise ValueError(f"Cannot perturb {element!r}, expected one of {BodyTable.ELEMENT_COLUMNS}")
+        names = set(system.body_names())
+        observers = list(perturbations) if observers is None else list(observers)
+        for name in list(targets) + observers:
+            if name not in names:
+                raise ValueError(f"Unknown body {name!r}")
+
+        self.system = system
+        self.targets = list(targets)
+        self.observers = observers
+        self.seed = seed
+        self._base = {
+            "sun": (system.sun.mass, system.sun.radius),
+            "options": {
+                "integrator": system.integrator.name,
+                "dt": system.dt,
+                "chunk_size": system.chunk_size,
+                "test_particles": system.test_particles,
+                "hierarchical": system.hierarchical,
+                "steps_per_orbit": system.steps_per_orbit,
+            },
+            "objects": {attr: {name: getattr(system, attr).object_column(name) for name in BodyTable.OBJECT_COLUMNS}
+                        for attr in TABLES},
+            "tables": {body: tables[body] for body in perturbations},
+            # Sorted so the draws happen in the same order in every process
+            "perturbations": sorted((body, sorted(sigmas.items())) for body, sigmas in perturbations.items()),
+            "targets": self.targets,
+            "observers": self.observers,
+            "seed": seed,
+        }
+
+    def _columns(self):
+        # The (columns, rows) float array of each table
+        return {attr: np.array([getattr(self.system, attr).column(name) for name in BodyTable.FLOAT_COLUMNS])
+                for attr in TABLES}
+
+    def member(self, i):
+        """
+        Build the system of one member in this process, e.g. to inspect or rerun it.
+
+        Parameters:
+        i (int): The member index.
+
+        Returns:
+        SolarSystem: The perturbed system.
+        """
+        return _build_member(dict(self._base, columns=self._columns()), i)[0]
+
+    def results(self, t, members, dt=None, workers=None):
+        """
+        Run the members to time t, yielding each result as soon as it is done.
+
+        Parameters:
+        t (float): The end time in seconds.
+        members (int or iterable): The number of members, or the member indices to run.
+        dt (float): The time step in seconds, defaults to the base system's.
+        workers (int): The number of worker processes, defaults to the CPU count.
+
+        Yields:
+        dict: The member index, its perturbed elements, and the minimum distance (km)
+        and its time (s) for every observer and target.
+        """
+        members = range(members) if isinstance(members, int) else list(members)
+        blocks, descriptions = [], {}
+        try:
+            for attr, array in self._columns().items():
+                block, descriptions[attr] = _share(array)
+                blocks.append(block)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(descriptions, self._base)) as pool:
+                tasks = [pool.submit(_worker_run, i, t, dt) for i in members]
+                for task in as_completed(tasks):
+                    yield task.result()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def run(self, t, members, dt=None, workers=None):
+        """
+        Run the members to time t and return their results in member order.
+
+        Parameters:
+        t (float): The end time in seconds.
+        members (int or iterable): The number of members, or the member indices to run.
+        dt (float): The time step in seconds, defaults to the base system's.
+        workers (int): The number of worker processes, defaults to the CPU count.
+
+        Returns:
+        list: One result per member, as yielded by results.
+        """
+        return sorted(self.results(t, members, dt, workers), key=lambda result: result["member"])
+
+
+def summarize(results, observer, target, threshold=None):
+    """
+    Summarize the closest approaches of one observer to one target over an ensemble.
+
+    Parameters:
+    results (list): The ensemble results.
+    observer (str): The observer body.
+    target (str): The target body.
+    threshold (float): A distance in km; if given, the fraction of members that came closer is included.
+
+    Returns:
+    dict: The minimum, mean, standard deviation and percentiles of the minimum distance.
+    """
+    distances = np.array([result["min_distance"][observer][target] for result in results])
+    summary = {
+        "members": len(distances),
+        "min": float(distances.min()),
+        "mean": float(distances.mean()),
+        "std": float(distances.std()),
+        "percentiles": dict(zip(("5", "50", "95"), np.percentile(distances, [5, 50, 95]).tolist())),
+    }
+    if threshold is not None:
+        summary["fraction_within"] = float(np.mean(distances < threshold))
+    return summary
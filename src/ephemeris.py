@@ -0,0 +1,212 @@
+import json
+from functools import lru_cache
+import numpy as np
+from numpy.polynomial import chebyshev
+
+
+def _rescale(fit, start, end, stop):
+    # Re-express Chebyshev series fitted on [start, end] (one per column of fit) on [start, stop]
+    order = len(fit) - 1
+    convert = np.zeros((order + 1, order + 1))
+    for k in range(order + 1):
+        basis = chebyshev.Chebyshev(np.eye(order + 1)[k], domain=[start, end]).convert(domain=[start, stop])
+        convert[:len(basis.coef), k] = basis.coef
+    return convert @ fit
+
+
+class Ephemeris:
+    """
+    Piecewise Chebyshev fit of body positions for fast queries at arbitrary times.
+
+    Time is split into fixed intervals starting at t0. For every interval and body
+    the x, y and z coordinates are each fitted with a Chebyshev series of the given
+    degree, stored as a (segments, bodies, 3, degree + 1) coefficient array. The
+    interval should be well under the orbital period of the fastest body (a few
+    hours for Phobos, a few days for the planets) for the fit to be accurate.
+    The last interval may extend past t_end, the end of the fitted data;
+    queries after t_end are rejected.
+
+    Parameters:
+    names (list): The body names.
+    t0 (float): The start time of the first interval in seconds.
+    interval (float): The length of each interval in seconds.
+    coefficients (numpy.ndarray): The (segments, bodies, 3, degree + 1) Chebyshev coefficients.
+    cache_size (int): The number of decoded segments kept by position_at.
+    t_end (float): The end of the fitted range in seconds, defaults to the end of the last interval.
+    """
+    def __init__(self, names, t0, interval, coefficients, cache_size=128, t_end=None):
+        self.names = list(names)
+        self.t0 = float(t0)
+        self.interval = float(interval)
+        self.coefficients = coefficients
+        self.t_end = self.t0 + self.interval * len(coefficients) if t_end is None else float(t_end)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._segment = lru_cache(maxsize=cache_size)(self._decode_segment)
+
+    @classmethod
+    def fit(cls, times, positions, names, interval, degree=10):
+        """
+        Fit an ephemeris to sampled positions.
+
+        Every interval must contain at least degree + 1 samples; samples on the
+        boundary between two intervals are used by both. If the samples end
+        partway through the last interval, that interval is fitted over the
+        samples it has, at degree len(samples) - 1 if that is lower, and the
+        series is re-expressed over the whole interval; the ephemeris then ends
+        at the last sample time.
+
+        Parameters:
+        times (numpy.ndarray): The (steps,) sample times in seconds, increasing.
+        positions (numpy.ndarray): The (steps, bodies, 3) sampled positions.
+        names (list): The body names.
+        interval (float): The length of each interval in seconds.
+        degree (int): The degree of the Chebyshev series.
+
+        Returns:
+        Ephemeris: The fitted ephemeris.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        t0 = times[0]
+        segments = max(1, int(np.ceil((times[-1] - t0) / interval - 1e-9)))
+        n_bodies = positions.shape[1]
+        coefficients = np.empty((segments, n_bodies, 3, degree + 1))
+        for s in range(segments):
+            start, stop = t0 + s * interval, t0 + (s + 1) * interval
+            rows = slice(np.searchsorted(times, start, side="left"), np.searchsorted(times, stop, side="right"))
+            count = rows.stop - rows.start
+            # Only the last interval can be partial
+            end = min(stop, times[-1])
+            partial = end < stop
+            if count <= degree and not (partial and count > 0):
+                raise ValueError(f"Interval {s} has {count} samples, need at least {degree + 1}")
+            order = min(degree, count - 1)
+            tau = 2 * (times[rows] - start) / (end - start) - 1 if end > start else np.zeros(count)
+            samples = np.asarray(positions[rows], dtype=np.float64).reshape(count, -1)
+            # One least-squares solve fits every body and coordinate in the interval
+            fit, *_ = np.linalg.lstsq(chebyshev.chebvander(tau, order), samples, rcond=None)
+            if partial:
+                fit = _rescale(fit, start, end, stop)
+            coefficients[s] = 0.0
+            coefficients[s, ..., :order + 1] = fit.T.reshape(n_bodies, 3, order + 1)
+        return cls(names, t0, interval, coefficients, t_end=times[-1])
+
+    @classmethod
+    def from_simulation(cls, system, t, interval, degree=10, samples_per_interval=32):
+        """
+        Run a simulation to time t and fit an ephemeris to it.
+
+        Parameters:
+        system (SolarSystem): The solar system to advance.
+        t (float): The target time in seconds since the start of the simulation.
+        interval (float): The length of each interval in seconds.
+        degree (int): The degree of the Chebyshev series.
+        samples_per_interval (int): The number of integration steps per interval.
+
+        Returns:
+        Ephemeris: The fitted ephemeris.
+        """
+        times = [system.time]
+        positions = [system.positions()]
+        for time, snapshot in system.snapshots(t, interval / samples_per_interval):
+            times.append(time)
+            positions.append(snapshot)
+        return cls.fit(np.array(times), np.array(positions), system.body_names(), interval, degree)
+
+    @classmethod
+    def from_trajectory(cls, reader, interval, degree=10):
+        """
+        Fit an ephemeris to a trajectory written by trajectory.TrajectoryWriter.
+
+        Parameters:
+        reader (TrajectoryReader): The trajectory to fit.
+        interval (float): The length of each interval in seconds.
+        degree (int): The degree of the Chebyshev series.
+
+        Returns:
+        Ephemeris: The fitted ephemeris.
+        """
+        return cls.fit(reader.times, reader.positions, reader.names, interval, degree)
+
+    def save(self, path):
+        """
+        Save the ephemeris as <path>.npy (coefficients) and <path>.json (metadata).
+
+        Parameters:
+        path (str): The output path, without extension.
+        """
+        np.save(path + ".npy", self.coefficients)
+        with open(path + ".json", "w") as f:
+            json.dump({"names": self.names, "t0": self.t0, "interval": self.interval, "t_end": self.t_end}, f)
+
+    @classmethod
+    def load(cls, path, cache_size=128):
+        """
+        Load an ephemeris saved with save, memory-mapping the coefficients.
+
+        Parameters:
+        path (str): The path given to save, without extension.
+        cache_size (int): The number of decoded segments kept by position_at.
+
+        Returns:
+        Ephemeris: The loaded ephemeris.
+        """
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        coefficients = np.load(path + ".npy", mmap_mode="r")
+        return cls(meta["names"], meta["t0"], meta["interval"], coefficients, cache_size, meta.get("t_end"))
+
+    def _decode_segment(self, s):
+        return np.array(self.coefficients[s])
+
+    def _locate(self, t):
+        # Map times to (segment index, normalized time in [-1, 1])
+        t = np.asarray(t, dtype=np.float64)
+        if np.any((t < self.t0) | (t > self.t_end)):
+            raise ValueError(f"Time outside the ephemeris range [{self.t0}, {self.t_end}]")
+        s = np.minimum(((t - self.t0) // self.interval).astype(np.int64), len(self.coefficients) - 1)
+        tau = 2 * (t - self.t0 - s * self.interval) / self.interval - 1
+        return s, tau
+
+    def position_at(self, body, t):
+        """
+        Return the position of one body at one time.
+
+        Parameters:
+        body (str): The body name.
+        t (float): The time in seconds.
+
+        Returns:
+        numpy.ndarray: The (3,) position.
+        """
+        if not self.t0 <= t <= self.t_end:
+            raise ValueError(f"Time outside the ephemeris range [{self.t0}, {self.t_end}]")
+        s = min(int((t - self.t0) // self.interval), len(self.coefficients) - 1)
+        tau = 2 * (t - self.t0 - s * self.interval) / self.interval - 1
+        coefficients = self._segment(s)[self._index[body]]
+        # Chebyshev basis by recurrence; cheaper than numpy's helpers for a single time
+        basis = [1.0, tau]
+        for _ in range(coefficients.shape[-1] - 2):
+            basis.append(2 * tau * basis[-1] - basis[-2])
+        return coefficients @ basis[:coefficients.shape[-1]]
+
+    def positions_at(self, t, names=None):
+        """
+        Return the positions of some or all bodies at many times.
+
+        Parameters:
+        t (numpy.ndarray): The (T,) times in seconds.
+        names (list): The bodies to select, or None for all of them.
+
+        Returns:
+        numpy.ndarray: The (T, bodies, 3) positions.
+        """
+        s, tau = self._locate(np.atleast_1d(t))
+        bodies = slice(None) if names is None else [self._index[name] for name in names]
+        basis = chebyshev.chebvander(tau, self.coefficients.shape[-1] - 1)
+        # Decode each distinct segment once, then evaluate all the times that fall in it
+        result = np.empty((len(tau), len(self.names) if names is None else len(bodies), 3))
+        for segment in np.unique(s):
+            rows = s == segment
+            coefficients = self._segment(int(segment))[bodies]
+            result[rows] = np.einsum("tk,bck->tbc", basis[rows], coefficients)
+        return result
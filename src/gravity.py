@@ -0,0 +1,140 @@
+import numpy as np
+from GC import GravitationalConstants
+
+# Number of (target, source) pairs evaluated per block by test_particle_accelerations
+TEST_PARTICLE_BLOCK = 1 << 18
+
+
+def pairwise_accelerations(positions, masses, chunk_size=None, G=GravitationalConstants.G, groups=None,
+                           potential=False):
+    """
+    Calculate the gravitational acceleration on every body from every other body.
+
+    All pairs are evaluated in one broadcasted pass. If a chunk size is given the
+    target bodies are processed in blocks of that many rows, so the temporary
+    (chunk, N, 3) arrays stay bounded for large N. With potential=True the
+    potential energy of the interacting pairs is summed from the same inverse
+    distances, which costs one extra multiply per pair.
+
+    Parameters:
+    positions (numpy.ndarray): The (N, 3) array of body positions.
+    masses (numpy.ndarray): The (N,) array of body masses in kilograms.
+    chunk_size (int): The number of target bodies per block, or None for a single block.
+    G (float): The gravitational constant.
+    groups (numpy.ndarray): Optional (N,) group labels; bodies with the same label do not interact.
+    potential (bool): Whether to also return the potential energy in joules.
+
+    Returns:
+    numpy.ndarray: The (N, 3) array of accelerations, or a tuple of it and the potential energy.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    n = len(positions)
+    accelerations = np.zeros((n, 3))
+    energy = 0.0
+    if n < 2:
+        return (accelerations, energy) if potential else accelerations
+    if chunk_size is None or chunk_size <= 0:
+        chunk_size = n
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        # Separation vectors from each target body to every source body
+        d = positions[None, :, :] - positions[start:stop, None, :]
+        r2 = np.einsum("ijk,ijk->ij", d, d)
+        # Skip self-interaction (and coincident bodies) to avoid dividing by zero
+        interacting = r2 > 0
+        if groups is not None:
+            interacting &= groups[start:stop, None] != groups[None, :]
+        with np.errstate(divide="ignore"):
+            inv_r3 = np.where(interacting, r2 ** -1.5, 0.0)
+        accelerations[start:stop] = G * np.einsum("ij,j,ijk->ik", inv_r3, masses, d)
+        if potential:
+            # r^-3 * r^2 = 1/r; every pair is visited twice, once from each side
+            energy -= 0.5 * G * np.einsum("ij,ij,i,j->", inv_r3, r2, masses[start:stop], masses)
+    return (accelerations, energy) if potential else accelerations
+
+
+def test_particle_accelerations(targets, sources, source_masses, chunk_size=None, G=GravitationalConstants.G):
+    """
+    Calculate the acceleration on massless test particles from a set of massive bodies.
+
+    The cost is O(N*M) for N test particles and M sources instead of O((N+M)^2),
+    and the particles never act on the sources or on each other. Particles are
+    processed in blocks so the temporary (chunk, M, 3) arrays stay bounded.
+
+    Parameters:
+    targets (numpy.ndarray): The (N, 3) array of test particle positions.
+    sources (numpy.ndarray): The (M, 3) array of massive body positions.
+    source_masses (numpy.ndarray): The (M,) array of massive body masses in kilograms.
+    chunk_size (int): The number of test particles per block, or None to size blocks automatically.
+    G (float): The gravitational constant.
+
+    Returns:
+    numpy.ndarray: The (N, 3) array of accelerations.
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    sources = np.asarray(sources, dtype=np.float64)
+    source_masses = np.asarray(source_masses, dtype=np.float64)
+    n = len(targets)
+    accelerations = np.zeros((n, 3))
+    if n == 0 or len(sources) == 0:
+        return accelerations
+    if chunk_size is None or chunk_size <= 0:
+        # Keep each block's (chunk, M, 3) separation array around 8 MB
+        chunk_size = max(1, TEST_PARTICLE_BLOCK // len(sources))
+
+    Gm = G * source_masses
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        d = sources[None, :, :] - targets[start:stop, None, :]
+        r2 = np.einsum("ijk,ijk->ij", d, d)
+        with np.errstate(divide="ignore"):
+            inv_r3 = np.where(r2 > 0, r2 ** -1.5, 0.0)
+        accelerations[start:stop] = np.einsum("ij,j,ijk->ik", inv_r3, Gm, d)
+    return accelerations
+
+
+class GravityEngine:
+    """
+    Batched N-body engine holding the state of a set of bodies in contiguous arrays.
+
+    Parameters:
+    positions (numpy.ndarray): The (N, 3) array of body positions.
+    velocities (numpy.ndarray): The (N, 3) array of body velocities.
+    masses (numpy.ndarray): The (N,) array of body masses in kilograms.
+    chunk_size (int): The number of target bodies per force block, or None for a single block.
+    """
+    def __init__(self, positions, velocities, masses, chunk_size=None):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.velocities = np.ascontiguousarray(velocities, dtype=np.float64).reshape(-1, 3)
+        self.masses = np.ascontiguousarray(masses, dtype=np.float64)
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_table(cls, table, chunk_size=None):
+        """
+        Build an engine from the columns of a BodyTable.
+
+        Parameters:
+        table (BodyTable): The table to copy into the engine.
+        chunk_size (int): The number of target bodies per force block.
+
+        Returns:
+        GravityEngine: The engine holding a copy of the table's state.
+        """
+        return cls(table.positions(), table.velocities(), table.column("mass").copy(), chunk_size)
+
+    def accelerations(self, positions=None):
+        """
+        Calculate the acceleration on every body.
+
+        Parameters:
+        positions (numpy.ndarray): Positions to evaluate at, defaults to the engine's own.
+
+        Returns:
+        numpy.ndarray: The (N, 3) array of accelerations.
+        """
+        if positions is None:
+            positions = self.positions
+        return pairwise_accelerations(positions, self.masses, self.chunk_size)
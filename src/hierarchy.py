@@ -0,0 +1,197 @@
+import math
+import numpy as np
+from GC import GravitationalConstants
+from gravity import pairwise_accelerations, test_particle_accelerations
+from kepler import kepler_drift
+from instrumentation import default_instrumentation
+
+
+class HierarchicalStepper:
+    """
+    Multi-rate kick-drift-kick integrator for planets with moons.
+
+    Each planet and its moons form a subsystem. On the outer level the subsystem
+    moves as its barycenter with the large step dt, kicked by the forces from
+    bodies outside it (the sun, other planets and their moons). Inside it the
+    moons are integrated relative to the parent planet with their own substeps,
+    each an exact Kepler drift about the parent between half kicks from the other
+    moons, so a fast moon like Phobos does not set the global step. The two
+    levels are coupled by a half kick of the external (tidal) forces before and
+    after the drift.
+
+    The outer step is a composition of such kick-drift-kick steps with the
+    given weights: (1,) is the second-order leapfrog, and Yoshida's weights
+    give a fourth-order step. Adjacent half kicks are merged, so a step of k
+    weights costs k + 1 external force passes.
+
+    With track_potential set, each kick also records the potential energy of
+    the massive bodies at the positions it was evaluated at, so after step()
+    the potential attribute holds the value at the returned positions.
+
+    Bodies are laid out as in SolarSystem._gather_state: massive bodies first,
+    then n_test massless test particles.
+
+    Parameters:
+    masses (numpy.ndarray): The (N,) array of body masses in kilograms.
+    parents (numpy.ndarray): The (N,) array of parent body indices, -1 for bodies without a parent.
+    n_test (int): The number of trailing test particles.
+    steps_per_orbit (int): The number of substeps per orbit of the fastest moon in a subsystem.
+    chunk_size (int): The number of target bodies per force block.
+    instrumentation (Instrumentation): Timers for the force and Kepler phases, defaults to the shared one.
+    composition (tuple): The weights of the kick-drift-kick steps making up one outer step.
+    """
+    def __init__(self, masses, parents, n_test=0, steps_per_orbit=20, chunk_size=None, instrumentation=None,
+                 composition=(1.0,)):
+        self.masses = np.asarray(masses, dtype=np.float64)
+        self.composition = tuple(composition)
+        self.n_massive = len(self.masses) - n_test
+        self.steps_per_orbit = steps_per_orbit
+        self.chunk_size = chunk_size
+        self.instrumentation = default_instrumentation() if instrumentation is None else instrumentation
+        self.track_potential = False
+        self.potential = None
+
+        parents = np.asarray(parents)
+        # Bodies in the same subsystem share the parent's label and skip each other in the slow force pass
+        self.groups = np.arange(self.n_massive)
+        self.systems = []
+        for parent in np.unique(parents[parents >= 0]):
+            moons = np.flatnonzero(parents == parent)
+            self.groups[moons] = parent
+            total_mass = self.masses[parent] + self.masses[moons].sum()
+            self.systems.append((parent, moons, total_mass))
+
+    def _to_relative(self, x, v):
+        # Replace each parent's state by its subsystem barycenter and each moon's by its planetocentric state
+        x, v = x.copy(), v.copy()
+        for parent, moons, total_mass in self.systems:
+            m = self.masses[moons, None]
+            x[moons] -= x[parent]
+            v[moons] -= v[parent]
+            x[parent] += (m * x[moons]).sum(axis=0) / total_mass
+            v[parent] += (m * v[moons]).sum(axis=0) / total_mass
+        return x, v
+
+    def _to_absolute(self, x, v):
+        # Inverse of _to_relative
+        x, v = x.copy(), v.copy()
+        for parent, moons, total_mass in self.systems:
+            m = self.masses[moons, None]
+            x[parent] -= (m * x[moons]).sum(axis=0) / total_mass
+            v[parent] -= (m * v[moons]).sum(axis=0) / total_mass
+            x[moons] += x[parent]
+            v[moons] += v[parent]
+        return x, v
+
+    def _kick(self, x, v, h):
+        # Apply the slow external forces for time h to relative-coordinate velocities v
+        absolute, _ = self._to_absolute(x, v)
+        massive = absolute[:self.n_massive]
+        a = np.empty_like(x)
+        with self.instrumentation.phase("force"):
+            if self.track_potential:
+                a[:self.n_massive], self.potential = pairwise_accelerations(
+                    massive, self.masses[:self.n_massive], self.chunk_size, groups=self.groups, potential=True)
+                # The pass above skips pairs inside a subsystem; add them from the few planet and moon rows
+                for parent, moons, _ in self.systems:
+                    rows = np.concatenate([[parent], moons])
+                    self.potential += pairwise_accelerations(massive[rows], self.masses[rows], potential=True)[1]
+            else:
+                a[:self.n_massive] = pairwise_accelerations(massive, self.masses[:self.n_massive], self.chunk_size,
+                                                            groups=self.groups)
+            a[self.n_massive:] = test_particle_accelerations(absolute[self.n_massive:], massive,
+                                                             self.masses[:self.n_massive])
+        dv = h * a
+        for parent, moons, total_mass in self.systems:
+            m = self.masses[moons, None]
+            # The barycenter feels the mass-weighted mean, the moons only the tidal difference
+            barycentric = (self.masses[parent] * a[parent] + (m * a[moons]).sum(axis=0)) / total_mass
+            dv[moons] = h * (a[moons] - a[parent])
+            dv[parent] = h * barycentric
+        v += dv
+
+    def _interaction_acceleration(self, r, moon_masses):
+        # Planetocentric acceleration of moons from each other: the direct pull of the
+        # other moons minus their pull on the (accelerating) parent planet
+        G = GravitationalConstants.G
+        indirect = G * moon_masses[:, None] * r / (np.sum(r * r, axis=1) ** 1.5)[:, None]
+        return pairwise_accelerations(r, moon_masses, G=G) - (indirect.sum(axis=0) - indirect)
+
+    def substeps(self, x, v, dt):
+        """
+        Return the number of inner substeps each subsystem needs for an outer step.
+
+        The parent's pull is integrated exactly, so a subsystem with a single moon
+        needs one substep; otherwise the moon-moon kicks are resolved with
+        steps_per_orbit substeps per orbit of the fastest moon.
+
+        Parameters:
+        x (numpy.ndarray): Positions in relative coordinates.
+        v (numpy.ndarray): Velocities in relative coordinates.
+        dt (float): The outer time step in seconds.
+
+        Returns:
+        list: One substep count per subsystem.
+        """
+        counts = []
+        for parent, moons, _ in self.systems:
+            if len(moons) == 1:
+                counts.append(1)
+                continue
+            mu = GravitationalConstants.G * (self.masses[parent] + self.masses[moons])
+            r = np.linalg.norm(x[moons], axis=1)
+            speed2 = np.sum(v[moons] ** 2, axis=1)
+            inv_a = 2 / r - speed2 / mu
+            # Orbital period for bound moons, crossing time r/|v| otherwise
+            period = np.where(inv_a > 0, 2 * np.pi * np.sqrt(np.abs(inv_a) ** -3 / mu), r / np.sqrt(speed2))
+            counts.append(max(1, math.ceil(abs(dt) * self.steps_per_orbit / period.min())))
+        return counts
+
+    def step(self, positions, velocities, dt):
+        """
+        Advance the state by one outer time step.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) absolute positions in meters.
+        velocities (numpy.ndarray): The (N, 3) absolute velocities in meters per second.
+        dt (float): The outer time step in seconds.
+
+        Returns:
+        tuple: The new absolute positions and velocities.
+        """
+        x, v = self._to_relative(np.asarray(positions, dtype=np.float64), np.asarray(velocities, dtype=np.float64))
+        weights = self.composition
+        self._kick(x, v, weights[0] * dt / 2)
+        for k, weight in enumerate(weights):
+            self._drift(x, v, weight * dt)
+            # The closing half kick of this stage and the opening one of the next share their positions
+            following = weights[k + 1] if k + 1 < len(weights) else 0.0
+            self._kick(x, v, (weight + following) * dt / 2)
+        return self._to_absolute(x, v)
+
+    def _drift(self, x, v, dt):
+        # Move the relative-coordinate state x, v for time dt (possibly negative) in place:
+        # outer bodies and barycenters move freely, moons take their own substeps
+        moon_rows = np.concatenate([moons for _, moons, _ in self.systems]) if self.systems else np.empty(0, int)
+        outer = np.ones(len(x), dtype=bool)
+        outer[moon_rows] = False
+        x[outer] += dt * v[outer]
+        for (parent, moons, _), n in zip(self.systems, self.substeps(x, v, dt)):
+            h = dt / n
+            moon_masses = self.masses[moons]
+            mu = GravitationalConstants.G * (self.masses[parent] + moon_masses)
+            r, u = x[moons], v[moons]
+            phase = self.instrumentation.phase
+            if len(moons) == 1:
+                with phase("kepler"):
+                    r, u = kepler_drift(r, u, mu, dt)
+            else:
+                # Wisdom-Holman style substeps: exact Kepler drift about the parent, moon-moon kicks
+                a = self._interaction_acceleration(r, moon_masses)
+                for _ in range(n):
+                    u = u + 0.5 * h * a
+                    with phase("kepler"):
+                        r, u = kepler_drift(r, u, mu, h)
+                    a = self._interaction_acceleration(r, moon_masses)
+                    u = u + 0.5 * h * a
+            x[moons], v[moons] = r, u
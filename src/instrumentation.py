@@ -0,0 +1,193 @@
+import cProfile
+import json
+import logging
+import pstats
+import time
+from contextlib import nullcontext
+
+# Library logger; silent unless the application configures logging
+logger = logging.getLogger("solar_system")
+logger.addHandler(logging.NullHandler())
+
+# Phases timed by the simulation and renderer
+PHASES = ("force", "integration", "kepler", "output", "render")
+
+_DISABLED = nullcontext()
+
+
+class _Timer:
+    # Context manager that adds its elapsed time to one phase
+    __slots__ = ("_totals", "_name", "_start")
+
+    def __init__(self, totals, name):
+        self._totals = totals
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        entry = self._totals[self._name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - self._start
+
+
+class Instrumentation:
+    """
+    Per-phase timers, counters and an optional profiler for a simulation run.
+
+    When disabled, phase() returns a shared no-op context manager and the other
+    hooks return immediately, so instrumented hot paths cost a method call. Phase
+    times are inclusive: force evaluations made by the integrator are counted in
+    both "force" and "integration".
+
+    Parameters:
+    enabled (bool): Whether timers and counters are recorded.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._profile = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clear every timer, counter and gauge.
+        """
+        self.phases = {name: [0, 0.0] for name in PHASES}
+        self.counters = {}
+        self.gauges = {}
+        self.steps = 0
+        self._first = None
+        self._last = None
+
+    def phase(self, name):
+        """
+        Return a context manager that times a block as part of a phase.
+
+        Parameters:
+        name (str): The phase name, e.g. "force" or "render".
+
+        Returns:
+        context manager: The timer, or a no-op when disabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        if name not in self.phases:
+            self.phases[name] = [0, 0.0]
+        return _Timer(self.phases, name)
+
+    def count(self, name, n=1):
+        """
+        Add n to a counter.
+
+        Parameters:
+        name (str): The counter name.
+        n (int): The amount to add.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """
+        Record the latest value of a quantity, e.g. the number of bodies.
+
+        Parameters:
+        name (str): The gauge name.
+        value (float): The value.
+        """
+        if self.enabled:
+            self.gauges[name] = value
+
+    def profile(self, steps, path=None, sort="cumulative"):
+        """
+        Run cProfile around the next given number of steps.
+
+        The statistics are written to path (readable with pstats) if given, and
+        the top entries are logged at INFO level.
+
+        Parameters:
+        steps (int): The number of steps to profile.
+        path (str): The file for the raw profile, or None.
+        sort (str): The pstats sort key for the logged report.
+        """
+        self._profile = {"remaining": steps, "path": path, "sort": sort, "profiler": cProfile.Profile(),
+                         "running": False}
+
+    def begin_step(self):
+        """
+        Mark the start of a simulation step.
+        """
+        if self._profile is not None and not self._profile["running"]:
+            self._profile["running"] = True
+            self._profile["profiler"].enable()
+        if self.enabled and self._first is None:
+            self._first = time.perf_counter()
+
+    def end_step(self):
+        """
+        Mark the end of a simulation step.
+        """
+        if self.enabled:
+            self.steps += 1
+            self._last = time.perf_counter()
+        if self._profile is not None:
+            self._profile["remaining"] -= 1
+            if self._profile["remaining"] <= 0:
+                self._finish_profile()
+
+    def _finish_profile(self):
+        profile, self._profile = self._profile, None
+        profile["profiler"].disable()
+        if profile["path"]:
+            profile["profiler"].dump_stats(profile["path"])
+        if logger.isEnabledFor(logging.INFO):
+            stats = pstats.Stats(profile["profiler"]).sort_stats(profile["sort"])
+            logger.info("profile: %d calls, %.6f s", stats.total_calls, stats.total_tt)
+            for key in stats.fcn_list[:20]:
+                _, calls, tottime, cumtime, _ = stats.stats[key]
+                logger.info("profile: %s:%d(%s) calls=%d tottime=%.6f cumtime=%.6f",
+                            *key, calls, tottime, cumtime)
+
+    def summary(self):
+        """
+        Return the metrics of the run so far.
+
+        Returns:
+        dict: Steps, steps per second, gauges (e.g. bodies), per-phase calls and seconds, and counters.
+        """
+        elapsed = (self._last - self._first) if self._first is not None and self._last is not None else 0.0
+        return {
+            "steps": self.steps,
+            "wall_seconds": elapsed,
+            "steps_per_second": self.steps / elapsed if elapsed > 0 else None,
+            **self.gauges,
+            "phases": {name: {"calls": calls, "seconds": seconds}
+                       for name, (calls, seconds) in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_summary(self, path):
+        """
+        Write summary() to a JSON file.
+
+        Parameters:
+        path (str): The output file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+_default_instrumentation = None
+
+
+def default_instrumentation():
+    """
+    Return the process-wide Instrumentation, creating it (disabled) on first use.
+
+    Returns:
+    Instrumentation: The shared instrumentation.
+    """
+    global _default_instrumentation
+    if _default_instrumentation is None:
+        _default_instrumentation = Instrumentation()
+    return _default_instrumentation
@@ -0,0 +1,213 @@
+import numpy as np
+
+
+class Integrator:
+    """
+    Base class for integrators of the equations of motion x'' = a(x).
+
+    Every integrator advances positions and velocities by exactly dt per call to
+    step; adaptive schemes take as many internal substeps as they need to do so.
+    """
+    name = None
+    # Order of accuracy, used by TimestepController to scale the step
+    order = None
+    # Weights of the kick-drift-kick steps the scheme is composed of, used to build the
+    # outer step of HierarchicalStepper; None if the scheme is not such a composition
+    composition = None
+
+    def step(self, positions, velocities, dt, acceleration):
+        """
+        Advance the state by one time step.
+
+        Parameters:
+        positions (numpy.ndarray): The (N, 3) positions in meters.
+        velocities (numpy.ndarray): The (N, 3) velocities in meters per second.
+        dt (float): The time step in seconds.
+        acceleration (callable): Maps (N, 3) positions to (N, 3) accelerations.
+
+        Returns:
+        tuple: The new positions and velocities.
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Forget any state cached between steps (e.g. after the bodies change).
+        """
+
+    def get_state(self):
+        """
+        Return the settings and carried-over state needed to continue bit-identically, e.g. in a checkpoint.
+
+        Caches that are rebuilt from the positions (like Leapfrog's) are not included.
+
+        Returns:
+        dict: JSON-serializable values.
+        """
+        return {}
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state.
+
+        Parameters:
+        state (dict): The saved values.
+        """
+
+
+class Leapfrog(Integrator):
+    """
+    Second-order symplectic velocity-Verlet (kick-drift-kick) integrator.
+
+    The acceleration at the end of a step is reused at the start of the next,
+    so each step costs a single force evaluation.
+    """
+    name = "leapfrog"
+    order = 2
+    composition = (1.0,)
+
+    def __init__(self):
+        self._cached = None
+
+    def reset(self):
+        self._cached = None
+
+    def step(self, positions, velocities, dt, acceleration):
+        if self._cached is not None and self._cached[0] is positions:
+            a = self._cached[1]
+        else:
+            a = acceleration(positions)
+        velocities = velocities + 0.5 * dt * a
+        positions = positions + dt * velocities
+        a = acceleration(positions)
+        velocities = velocities + 0.5 * dt * a
+        self._cached = (positions, a)
+        return positions, velocities
+
+
+class Yoshida4(Integrator):
+    """
+    Fourth-order symplectic integrator of Yoshida (1990), built from three leapfrog stages.
+    """
+    name = "yoshida4"
+    order = 4
+
+    _w1 = 1 / (2 - 2 ** (1 / 3))
+    _w0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+    DRIFT = (_w1 / 2, (_w0 + _w1) / 2, (_w0 + _w1) / 2, _w1 / 2)
+    KICK = (_w1, _w0, _w1)
+    composition = KICK
+
+    def step(self, positions, velocities, dt, acceleration):
+        positions = positions + self.DRIFT[0] * dt * velocities
+        for c, d in zip(self.DRIFT[1:], self.KICK):
+            velocities = velocities + d * dt * acceleration(positions)
+            positions = positions + c * dt * velocities
+        return positions, velocities
+
+
+class DormandPrince45(Integrator):
+    """
+    Embedded Runge-Kutta 5(4) integrator of Dormand and Prince with step-size control.
+
+    Each call to step covers dt with as many accepted substeps as the error
+    tolerance requires. The last accepted substep size is remembered and used as
+    the first trial size on the next call.
+
+    Parameters:
+    rtol (float): The relative error tolerance per substep.
+    atol (float): The absolute error tolerance per substep.
+    max_substeps (int): The maximum number of substeps per call to step.
+    """
+    name = "rk45"
+    order = 5
+
+    A = (
+        (),
+        (1 / 5,),
+        (3 / 40, 9 / 40),
+        (44 / 45, -56 / 15, 32 / 9),
+        (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+        (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+        (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+    )
+    # Difference between the 5th and embedded 4th order weights
+    E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+    def __init__(self, rtol=1e-9, atol=1e-3, max_substeps=100000):
+        self.rtol = rtol
+        self.atol = atol
+        self.max_substeps = max_substeps
+        self.dt_trial = None
+
+    def reset(self):
+        self.dt_trial = None
+
+    def get_state(self):
+        return {"rtol": self.rtol, "atol": self.atol, "max_substeps": self.max_substeps, "dt_trial": self.dt_trial}
+
+    def set_state(self, state):
+        self.rtol = state["rtol"]
+        self.atol = state["atol"]
+        self.max_substeps = state["max_substeps"]
+        self.dt_trial = state["dt_trial"]
+
+    def step(self, positions, velocities, dt, acceleration):
+        n = len(positions)
+        y = np.concatenate([positions, velocities])
+
+        def derivative(y):
+            return np.concatenate([y[n:], acceleration(y[:n])])
+
+        t, h = 0.0, dt if self.dt_trial is None else min(self.dt_trial, dt)
+        k1 = derivative(y)
+        substeps = 0
+        while t < dt:
+            if substeps == self.max_substeps:
+                raise RuntimeError(f"DormandPrince45 exceeded {self.max_substeps} substeps")
+            substeps += 1
+            # The last substep is shortened to land exactly on dt
+            last = h >= dt - t
+            h_step = dt - t if last else h
+            k = [k1]
+            for a_row in self.A[1:]:
+                k.append(derivative(y + h_step * sum(a * ki for a, ki in zip(a_row, k) if a)))
+            y_new = y + h_step * sum(a * ki for a, ki in zip(self.A[-1], k) if a)
+            error = h_step * sum(e * ki for e, ki in zip(self.E, k) if e)
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+            err = np.sqrt(np.mean((error / scale) ** 2))
+            factor = 5.0 if err == 0 else min(5.0, max(0.2, 0.9 * err ** -0.2))
+
+            if err <= 1:
+                t = dt if last else t + h_step
+                y = y_new
+                # First-same-as-last: the final stage is the next substep's first
+                k1 = k[-1]
+                # A shortened final substep says nothing about the natural step size
+                h = max(h, h_step * factor) if last else h_step * factor
+            else:
+                h = h_step * factor
+        self.dt_trial = h
+        return y[:n], y[n:]
+
+
+INTEGRATORS = {cls.name: cls for cls in (Leapfrog, Yoshida4, DormandPrince45)}
+
+
+def get_integrator(integrator="leapfrog", **options):
+    """
+    Look up an integrator by name, or pass an integrator instance through.
+
+    Parameters:
+    integrator (str or Integrator): One of "leapfrog", "yoshida4" or "rk45", or an instance.
+    options: Keyword arguments for the integrator's constructor.
+
+    Returns:
+    Integrator: The integrator instance.
+    """
+    if isinstance(integrator, Integrator):
+        return integrator
+    try:
+        return INTEGRATORS[integrator](**options)
+    except KeyError:
+        raise ValueError(f"Unknown integrator {integrator!r}, expected one of {sorted(INTEGRATORS)}") from None
@@ -0,0 +1,290 @@
+import math
+import numpy as np
+
+
+def solve_kepler(mean_anomaly, eccentricity, tol=1e-12, max_iter=50):
+    """
+    Solve Kepler's equation M = E - e*sin(E) for many bodies at once.
+
+    Uses Newton-Raphson from Danby's starting guess. Elements that have converged
+    are masked out so later iterations only touch the slow (high-eccentricity) ones.
+
+    Parameters:
+    mean_anomaly (numpy.ndarray): The mean anomalies in radians.
+    eccentricity (numpy.ndarray): The orbital eccentricities (0 <= e < 1).
+    tol (float): The convergence tolerance on E in radians.
+    max_iter (int): The maximum number of Newton iterations.
+
+    Returns:
+    numpy.ndarray: The eccentric anomalies in radians.
+    """
+    shape = np.broadcast(np.asarray(mean_anomaly), np.asarray(eccentricity)).shape
+    M = np.remainder(np.broadcast_to(np.asarray(mean_anomaly, dtype=np.float64), shape), 2 * np.pi).reshape(-1)
+    e = np.broadcast_to(np.asarray(eccentricity, dtype=np.float64), shape).reshape(-1)
+    # Danby's starting guess converges in a few steps even for e close to 1
+    E = M + 0.85 * e * np.where(np.sin(M) >= 0, 1.0, -1.0)
+
+    active = np.ones(M.shape, dtype=bool)
+    for _ in range(max_iter):
+        Ea, ea = E[active], e[active]
+        delta = (Ea - ea * np.sin(Ea) - M[active]) / (1 - ea * np.cos(Ea))
+        E[active] = Ea - delta
+        active[active] = np.abs(delta) > tol
+        if not active.any():
+            break
+    return E.reshape(shape)
+
+
+def true_anomaly(eccentric_anomaly, eccentricity):
+    """
+    Calculate the true anomaly from the eccentric anomaly.
+
+    Parameters:
+    eccentric_anomaly (numpy.ndarray): The eccentric anomalies in radians.
+    eccentricity (numpy.ndarray): The orbital eccentricities.
+
+    Returns:
+    numpy.ndarray: The true anomalies in radians.
+    """
+    E = np.asarray(eccentric_anomaly, dtype=np.float64)
+    e = np.asarray(eccentricity, dtype=np.float64)
+    return 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2))
+
+
+def perifocal_to_inertial(xp, yp, inclination, longitude_of_ascending_node, argument_of_periapsis):
+    """
+    Rotate in-plane (perifocal) coordinates into the reference frame.
+
+    Parameters:
+    xp (numpy.ndarray): The coordinates along the periapsis direction.
+    yp (numpy.ndarray): The in-plane coordinates perpendicular to xp.
+    inclination (numpy.ndarray): The orbital inclinations in radians.
+    longitude_of_ascending_node (numpy.ndarray): The longitudes of the ascending node in radians.
+    argument_of_periapsis (numpy.ndarray): The arguments of periapsis in radians.
+
+    Returns:
+    numpy.ndarray: The (N, 3) array of rotated coordinates.
+    """
+    cos_O, sin_O = np.cos(longitude_of_ascending_node), np.sin(longitude_of_ascending_node)
+    cos_w, sin_w = np.cos(argument_of_periapsis), np.sin(argument_of_periapsis)
+    cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+
+    x = (cos_O * cos_w - sin_O * sin_w * cos_i) * xp + (-cos_O * sin_w - sin_O * cos_w * cos_i) * yp
+    y = (sin_O * cos_w + cos_O * sin_w * cos_i) * xp + (-sin_O * sin_w + cos_O * cos_w * cos_i) * yp
+    z = (sin_w * sin_i) * xp + (cos_w * sin_i) * yp
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+
+def orbital_positions(semi_major_axis, eccentricity, inclination, longitude_of_ascending_node,
+                      argument_of_periapsis, mean_anomaly, tol=1e-12):
+    """
+    Calculate the 3D positions of many bodies from their orbital elements.
+
+    Parameters:
+    semi_major_axis (numpy.ndarray): The semi-major axes.
+    eccentricity (numpy.ndarray): The orbital eccentricities.
+    inclination (numpy.ndarray): The orbital inclinations in radians.
+    longitude_of_ascending_node (numpy.ndarray): The longitudes of the ascending node in radians.
+    argument_of_periapsis (numpy.ndarray): The arguments of periapsis in radians.
+    mean_anomaly (numpy.ndarray): The mean anomalies in radians.
+    tol (float): The Kepler solver tolerance in radians.
+
+    Returns:
+    numpy.ndarray: The (N, 3) array of positions in the units of semi_major_axis.
+    """
+    a = np.asarray(semi_major_axis, dtype=np.float64)
+    e = np.asarray(eccentricity, dtype=np.float64)
+    E = solve_kepler(mean_anomaly, e, tol)
+    xp = a * (np.cos(E) - e)
+    yp = a * np.sqrt(1 - e ** 2) * np.sin(E)
+    return perifocal_to_inertial(xp, yp, inclination, longitude_of_ascending_node, argument_of_periapsis)
+
+
+def orbital_state(semi_major_axis, eccentricity, inclination, longitude_of_ascending_node,
+                  argument_of_periapsis, mean_anomaly, mu, tol=1e-12):
+    """
+    Calculate the position and velocity vectors of many bodies from their orbital elements.
+
+    Parameters:
+    semi_major_axis (numpy.ndarray): The semi-major axes in meters.
+    eccentricity (numpy.ndarray): The orbital eccentricities.
+    inclination (numpy.ndarray): The orbital inclinations in radians.
+    longitude_of_ascending_node (numpy.ndarray): The longitudes of the ascending node in radians.
+    argument_of_periapsis (numpy.ndarray): The arguments of periapsis in radians.
+    mean_anomaly (numpy.ndarray): The mean anomalies in radians.
+    mu (numpy.ndarray): The gravitational parameters G*(M + m) of the orbits in m^3 s^-2.
+    tol (float): The Kepler solver tolerance in radians.
+
+    Returns:
+    tuple: The (N, 3) positions in meters and (N, 3) velocities in meters per second.
+    """
+    a = np.asarray(semi_major_axis, dtype=np.float64)
+    e = np.asarray(eccentricity, dtype=np.float64)
+    E = solve_kepler(mean_anomaly, e, tol)
+    cos_E, sin_E = np.cos(E), np.sin(E)
+    b = np.sqrt(1 - e ** 2)
+    xp = a * (cos_E - e)
+    yp = a * b * sin_E
+    # dE/dt = n / (1 - e cos E), with mean motion n = sqrt(mu / a^3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(a > 0, np.sqrt(mu / a ** 3) / (1 - e * cos_E), 0.0)
+    vxp = -a * sin_E * rate
+    vyp = a * b * cos_E * rate
+    angles = (inclination, longitude_of_ascending_node, argument_of_periapsis)
+    return perifocal_to_inertial(xp, yp, *angles), perifocal_to_inertial(vxp, vyp, *angles)
+
+
+def kepler_drift(positions, velocities, mu, dt, tol=1e-12, max_iter=50):
+    """
+    Propagate many two-body orbits exactly by dt using Gauss' f and g functions.
+
+    Bound orbits are solved for the change in eccentric anomaly. Near-parabolic
+    and hyperbolic ones, e.g. a moon escaping its planet, are solved for the
+    universal anomaly with Stumpff functions.
+
+    Parameters:
+    positions (numpy.ndarray): The (N, 3) positions relative to the central body in meters.
+    velocities (numpy.ndarray): The (N, 3) velocities relative to the central body in meters per second.
+    mu (numpy.ndarray): The (N,) gravitational parameters G*(M + m) in m^3 s^-2.
+    dt (float): The time step in seconds.
+    tol (float): The convergence tolerance on the change in eccentric anomaly, and relative
+        tolerance on the universal anomaly.
+    max_iter (int): The maximum number of Newton iterations.
+
+    Returns:
+    tuple: The propagated (N, 3) positions and velocities.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    velocities = np.asarray(velocities, dtype=np.float64)
+    mu = np.broadcast_to(np.asarray(mu, dtype=np.float64), (len(positions),))
+    r0 = np.sqrt(np.sum(positions * positions, axis=1))
+    inv_a = 2 / r0 - np.sum(velocities * velocities, axis=1) / mu
+    # Near-parabolic orbits (a > 1000 r0) lose precision in the eccentric anomaly
+    bound = inv_a * r0 > 1e-3
+    if bound.all():
+        return _elliptic_drift(positions, velocities, mu, dt, r0, inv_a, tol, max_iter)
+    new_positions, new_velocities = np.empty_like(positions), np.empty_like(velocities)
+    for rows, drift in ((bound, _elliptic_drift), (~bound, _universal_drift)):
+        if rows.any():
+            new_positions[rows], new_velocities[rows] = drift(positions[rows], velocities[rows], mu[rows], dt,
+                                                              r0[rows], inv_a[rows], tol, max_iter)
+    return new_positions, new_velocities
+
+
+def _elliptic_drift(positions, velocities, mu, dt, r0, inv_a, tol, max_iter):
+    # kepler_drift for bound orbits, iterating on the change in eccentric anomaly
+    a = 1 / inv_a
+    n = np.sqrt(mu * inv_a ** 3)
+    ec = 1 - r0 * inv_a  # e*cos(E0)
+    es = np.sum(positions * velocities, axis=1) / (n * a ** 2)  # e*sin(E0)
+
+    # Drop whole orbits so the change in eccentric anomaly x stays in [0, 2*pi)
+    orbits = np.floor(n * dt / (2 * np.pi))
+    dt_reduced = dt - orbits * 2 * np.pi / n
+    M = n * dt_reduced
+    x = M + 0.85 * np.sqrt(ec ** 2 + es ** 2) * np.sign(np.sin(M) * ec + es)
+
+    # The residual rises from -M at x = 0 to 2*pi - M at 2*pi (its slope is r/a > 0), so Newton
+    # steps that leave the bracket, e.g. from near periapsis on an eccentric orbit, bisect instead
+    lo, hi = np.zeros_like(x), np.full_like(x, 2 * np.pi)
+    x = np.clip(x, lo, hi)
+    active = np.ones(len(x), dtype=bool)
+    for _ in range(max_iter):
+        xa, eca, esa = x[active], ec[active], es[active]
+        f = xa - eca * np.sin(xa) + esa * (1 - np.cos(xa)) - M[active]
+        lo[active] = np.where(f < 0, xa, lo[active])
+        hi[active] = np.where(f < 0, hi[active], xa)
+        new = xa - f / (1 - eca * np.cos(xa) + esa * np.sin(xa))
+        new = np.where((new >= lo[active]) & (new <= hi[active]), new, 0.5 * (lo[active] + hi[active]))
+        x[active] = new
+        active[active] = np.abs(new - xa) > tol
+        if not active.any():
+            break
+
+    sin_x = np.sin(x)
+    cos_x_1 = -2 * np.sin(x / 2) ** 2  # cos(x) - 1 without cancellation
+    r = a * (1 - ec * (cos_x_1 + 1) + es * sin_x)
+    f = 1 + a / r0 * cos_x_1
+    g = dt_reduced + (sin_x - x) / n
+    f_dot = -a * a * n * sin_x / (r * r0)
+    g_dot = 1 + a / r * cos_x_1
+    new_positions = f[:, None] * positions + g[:, None] * velocities
+    new_velocities = f_dot[:, None] * positions + g_dot[:, None] * velocities
+    return new_positions, new_velocities
+
+
+def _stumpff(z):
+    # The Stumpff functions C(z) and S(z), from their series near z = 0 where the closed forms cancel
+    c, s = np.empty_like(z), np.empty_like(z)
+    small = np.abs(z) < 0.1
+    term, zs = np.ones_like(z[small]), z[small]
+    c[small], s[small] = 0.5, 1 / 6
+    for k in range(1, 8):
+        term = -term * zs
+        c[small] += term / math.factorial(2 * k + 2)
+        s[small] += term / math.factorial(2 * k + 3)
+    q = np.sqrt(z[z >= 0.1])
+    c[z >= 0.1] = 2 * np.sin(q / 2) ** 2 / q ** 2  # 1 - cos(q) = 2 sin(q/2)^2
+    s[z >= 0.1] = (q - np.sin(q)) / q ** 3
+    q = np.sqrt(-z[z <= -0.1])
+    c[z <= -0.1] = 2 * np.sinh(q / 2) ** 2 / q ** 2  # cosh(q) - 1 = 2 sinh(q/2)^2
+    s[z <= -0.1] = (np.sinh(q) - q) / q ** 3
+    return c, s
+
+
+def _universal_drift(positions, velocities, mu, dt, r0, inv_a, tol, max_iter):
+    # kepler_drift for near-parabolic and unbound orbits, iterating on the universal anomaly chi
+    sqrt_mu = np.sqrt(mu)
+    sigma0 = np.sum(positions * velocities, axis=1) / sqrt_mu
+    bound = inv_a > 0
+    # Drop whole orbits of bound bodies so the step is at most half an orbit, and the change in
+    # eccentric anomaly chi/sqrt(a) at most 2*pi; shorter steps are left exactly as they are
+    dt = np.full(len(mu), dt, dtype=np.float64)
+    period = 2 * np.pi / (sqrt_mu[bound] * inv_a[bound] ** 1.5)
+    dt[bound] -= np.round(dt[bound] / period) * period
+    # The residual F(chi) grows at the rate r, which is never below the periapsis distance, and
+    # on an unbound orbit d^2r/dchi^2 = 1 - r/a >= 1, so F grows at least as fast as
+    # r0*chi + sigma0*chi^2/2 + chi^3/6; each gives a bound on the root
+    h2 = np.sum(np.cross(positions, velocities) ** 2, axis=1)
+    periapsis = h2 / (mu * (1 + np.sqrt(np.maximum(1 - h2 * inv_a / mu, 0.0))))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        limit = np.where(bound, 2 * np.pi / np.sqrt(np.abs(inv_a)),
+                         3 * np.abs(sigma0) + np.cbrt(6 * sqrt_mu * np.abs(dt)))
+        limit = np.sign(dt) * np.minimum(limit, sqrt_mu * np.abs(dt) / periapsis)
+    lo, hi = np.minimum(limit, 0.0), np.maximum(limit, 0.0)
+    chi = np.clip(sqrt_mu * dt / r0, lo, hi)
+
+    # Newton's method, falling back to bisection where a step would leave the bracket or
+    # shrink it too slowly (far out on the exponential branch of a hyperbola)
+    older = previous = hi - lo
+    active = np.ones(len(chi), dtype=bool)
+    for _ in range(max_iter):
+        x, alpha, sigma, ra = chi[active], inv_a[active], sigma0[active], r0[active]
+        with np.errstate(over="ignore", invalid="ignore"):
+            z = alpha * x * x
+            c, s = _stumpff(z)
+            f = sigma * x * x * c + (1 - alpha * ra) * x ** 3 * s + ra * x - sqrt_mu[active] * dt[active]
+            r = sigma * x * (1 - z * s) + (1 - alpha * ra) * x * x * c + ra
+            newton = x - f / r
+        # A residual that overflowed is far from the root, on the side of the sign of chi
+        below = np.where(np.isnan(f), x < 0, f < 0)
+        lo[active] = np.where(below, x, lo[active])
+        hi[active] = np.where(below, hi[active], x)
+        fast = (newton >= lo[active]) & (newton <= hi[active]) & (np.abs(newton - x) < 0.5 * older[active])
+        new = np.where(fast, newton, 0.5 * (lo[active] + hi[active]))
+        older[active], previous[active] = previous[active], np.abs(new - x)
+        chi[active] = new
+        active[active] = np.abs(new - x) > tol * np.abs(new)
+        if not active.any():
+            break
+
+    z = inv_a * chi * chi
+    c, s = _stumpff(z)
+    f = 1 - chi * chi * c / r0
+    g = dt - chi ** 3 * s / sqrt_mu
+    new_positions = f[:, None] * positions + g[:, None] * velocities
+    r = np.sqrt(np.sum(new_positions * new_positions, axis=1))
+    f_dot = sqrt_mu / (r * r0) * chi * (z * s - 1)
+    g_dot = 1 - chi * chi * c / r
+    new_velocities = f_dot[:, None] * positions + g_dot[:, None] * velocities
+    return new_positions, new_velocities
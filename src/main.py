@@ -1,48 +1,28 @@
 import math
-from dataclasses import dataclass
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from planet import Planet
 from moon import Moon
 from asteroid import Asteroid
 from solar_system import SolarSystem
+from pipeline import animate_live
 
-def calculate_position(system, dt, positions ):
-    system = SolarSystem()
-
-    positions = {planet.name: [] for planet in system.planet if hasattr(planet, 'name')}
-    for i, planet1 in enumerate(system.planet):
-        if not all(hasattr(planet1, attr) for attr in ['x', 'y', 'z']):
-            continue  # Skip if planet1 lacks position attributes
-        for j, planet2 in enumerate(system.planet):
-            if i != j and all(hasattr(planet2, attr) for attr in ['x', 'y', 'z']):
-                r12 = math.sqrt((planet2.x - planet1.x)**2 + (planet2.y - planet1.y)**2 + (planet2.z - planet1.z)**2)
-                if r12 == 0:
-                    continue  # Skip calculation if distance is zero
-        # Example gravitational interaction calculation
-        for i, planet1 in enumerate(system.planet):
-            for j, planet2 in enumerate(system.planet):
-                if i != j:
-                    dx = planet2.x - planet1.x
-                    dy = planet2.y - planet1.y
-                    dz = planet2.z - planet1.z
-                    distance = math.sqrt(dx**2 + dy**2 + dz**2)
-                    force = (6.67430e-11 * planet1.mass * planet2.mass) / (distance**2)
-                    ax = force * dx / distance / planet1.mass
-                    ay = force * dy / distance / planet1.mass
-                    az = force * dz / distance / planet1.mass
-                    planet1.vx += ax * dt
-                    planet1.vy += ay * dt
-                    planet1.vz += az * dt
-                    planet1.x += planet1.vx * dt
-                    planet1.y += planet1.vy * dt
-                    planet1.z += planet1.vz * dt
-
-                     # Print the gravitational interaction
-                    print(f"Planet {i+1} updated position: ({planet1.x}, {planet1.y}, {planet1.z})")
-                    positions=[planet1.name].append((planet1.x, planet1.y, planet1.z))
-                    print (f"{positions}")
-    return positions            
+def calculate_position(system, dt, positions=None):
+    """
+    Advance the solar system by one time step and record the planet positions.
+
+    Parameters:
+    system (SolarSystem): The solar system to advance.
+    dt (float): The time step in seconds.
+    positions (dict): Trajectories to append to, keyed by planet name.
+
+    Returns:
+    dict: The positions dictionary with the new (x, y, z) of every planet in kilometers appended.
+    """
+    if positions is None:
+        positions = {}
+    system.step(dt)
+    for name, (x, y, z) in zip(system.planet.names(), system.planet.positions().tolist()):
+        positions.setdefault(name, []).append((x, y, z))
+    return positions
 
 """positions[planet1.name].append((planet1.x, planet1.y, planet1.z))
 print(f"Planet {i+1}:")
@@ -71,7 +51,21 @@ def main(simulation_years=15):
     To save it, use the `save` method of the `FuncAnimation` object.
     """
     print(f"Running simulation for {simulation_years} years.")
-    system = SolarSystem()
+    return build_default_system()
+
+def build_default_system(**options):
+    """
+    Create the solar system used by main: the planets, dwarf planets, major moons and a few asteroids.
+
+    Unlike main, this prints nothing, so it can be used by batch runs that write to stdout.
+
+    Parameters:
+    options: Keyword arguments for SolarSystem (integrator, dt, hierarchical, ...).
+
+    Returns:
+    SolarSystem: The populated solar system.
+    """
+    system = SolarSystem(**options)
     
     # Planets with textures
     system.add_planet(Planet("Mercury", 3.3022e23, 2439.7, 0.387098 * Planet.AU, 0.2056, 0, math.pi/4, math.pi/4, texture_path="textures/mercury.jpg"))
@@ -131,62 +125,51 @@ def main(simulation_years=15):
     system.add_asteroid(Asteroid("Eros", 6.687e15, 16.84, 1.458 * Planet.AU, 0.223, 10.83, 304.3, 178.7))
     system.add_asteroid(Asteroid("Bennu", 7.329e10, 0.245, 1.126 * Planet.AU, 0.203, 6.034, 2.060, 101.703))
     system.add_asteroid(Asteroid("Ryugu", 4.5e11, 0.435, 1.189 * Planet.AU, 0.190, 5.883, 251.47, 211.44))
+    return system
 
-def simulate_and_plot(system, simulation_years=15):
-    system = SolarSystem
+def simulate_and_plot(system, simulation_years=15, dt=86400, tolerance=1e-7):
     """
-    Simulate the solar system and plot the results.
+    Simulate the solar system and plot the results while it runs.
 
     Parameters:
     system (SolarSystem): The solar system to simulate.
-    time_steps (int): The number of time steps to simulate.
-    dt (float): The time step duration in years.
+    simulation_years (int): The number of years to simulate.
+    dt (float): The time step duration in seconds (1 day), the first step when a tolerance is given.
+    tolerance (float): The largest relative change of energy or angular momentum per step, or None
+        to keep dt fixed.
 
     Returns:
     FuncAnimation: The animation object.
 
     Notes:
-    The `positions` variable is expected to be a dictionary where the keys are the names of celestial objects (e.g., planets, moons),
-    and the values are lists of tuples representing the (x, y, z) coordinates of the objects at each time step.
-    For example:
-    {
-        "Earth": [(x1, y1, z1), (x2, y2, z2), ...],
-    # Updates the positions of celestial bodies for each frame in the animation.
-    def update(frame):
-        ...
-    }"""
-
-    dt = 1 / 365  # time step duration in years (1 day)
+    The simulation runs in a background thread and pushes one (bodies, 3) frame
+    per time step into a bounded ring buffer; the animation draws the newest
+    frame at display rate and skips the rest, so neither side waits for the
+    other. Each class of body (sun, planets, moons, asteroids) is drawn as a
+    single artist updated from a slice of the frame, with blitting. With a
+    tolerance the step size is chosen by SolarSystem.monitor_conservation, so
+    successive frames may be unevenly spaced in time.
+    """
+    # Imported here so batch runs that only call main() never load matplotlib
+    import matplotlib.pyplot as plt
+
+    t_end = system.time + simulation_years * 365 * 86400
+    if tolerance is not None:
+        system.monitor_conservation(tolerance)
     fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
-    time_steps = int(simulation_years * 365)  # Total number of days in the simulation
-    
+    ax = fig.add_subplot(111, projection="3d")
 
-    def update(frame, positions, lines):
-        print(f"Updating frame {frame}")  # Debugging output
-        for planet_name, line in lines.items():
-            if planet_name in positions and frame < len(positions[planet_name]):
-                x, y, z = positions[planet_name][frame]
-                print(f"Planet {planet_name}: Position ({x}, {y}, {z})")  # Debugging output
-                line.set_data([x], [y])
-                line.set_3d_properties([z])
-            else:
-                print(f"Warning: No data for {planet_name} at frame {frame}")
-        return lines.values()
-    
     # Add a background image
     background_image = plt.imread("textures/astar.jpg")  # test texture
     ax.imshow(background_image, extent=(-1, 1, -1, 1), aspect='auto', zorder=-1)
-    
-    # Simulate and plot the solar system
-    ani = simulate_and_plot(system, simulation_years)
-    ani = FuncAnimation(fig, update, frames=time_steps, blit=False)
+
+    ani, producer = animate_live(system, t_end, dt, ax=ax)
     plt.show()  # Ensure the animation is displayed
+    producer.stop()
     return ani
-    # Run the simulation and plot the results
 
 if __name__ == "__main__":
-    calculate_position(system = SolarSystem, dt=1/365, positions=None )
-    main(simulation_years=15)
-    simulate_and_plot(system=SolarSystem)
+    system = main(simulation_years=15)
+    calculate_position(system, dt=86400)
+    simulate_and_plot(system)
     print ("hello world")
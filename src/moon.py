@@ -1,4 +1,3 @@
-from utils import load_texture
 from planet import Planet
 
 class Moon(Planet):
@@ -20,15 +19,10 @@ class Moon(Planet):
     mean_anomaly (float): The mean anomaly of the moon in radians.
     texture_path (str): The path to the texture image for the moon.
     """
+    __slots__ = ()
+
     def __init__(self, name, mass, radius, semi_major_axis, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, parent_planet, mean_anomaly=0, texture_path=None):
         # Initialize the parent class (Planet) with the appropriate arguments
         super().__init__(name, mass, radius, semi_major_axis, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, mean_anomaly)
         # Add the parent_planet attribute specific to the Moon class
         self.parent_planet = parent_planet
-
-    def __post_init__(self):
-        """
-        Load the texture image during initialization if a texture path is provided.
-        """
-        if self.texture:
-            self.texture = load_texture(self.texture)
@@ -0,0 +1,340 @@
+import itertools
+import threading
+import time
+import numpy as np
+
+
+class FrameRing:
+    """
+    Fixed-size ring buffer of position frames shared by a producer and a consumer thread.
+
+    All frames live in one preallocated (capacity, bodies, 3) array. With
+    overwrite=True the producer never waits: when the ring is full the oldest
+    frame is replaced, and frames replaced before the consumer saw them are
+    counted as dropped. With overwrite=False the producer blocks until the
+    consumer has read the oldest frame, so no frame is lost and the simulation
+    is throttled to the consumer.
+
+    Parameters:
+    capacity (int): The number of frames held.
+    n_bodies (int): The number of bodies per frame.
+    dtype (numpy.dtype): The element type of the stored positions.
+    overwrite (bool): Whether a full ring replaces its oldest frame instead of blocking the producer.
+    """
+    def __init__(self, capacity, n_bodies, dtype=np.float64, overwrite=True):
+        self.capacity = capacity
+        self.overwrite = overwrite
+        self.frames = np.empty((capacity, n_bodies, 3), dtype=dtype)
+        self.times = np.empty(capacity)
+        # Frames are numbered from 0; frame k lives in slot k % capacity
+        self.written = 0
+        self.dropped = 0
+        self.closed = False
+        self._read = 0
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        with self._condition:
+            return min(self.written, self.capacity)
+
+    def put(self, time, positions):
+        """
+        Append a frame.
+
+        Parameters:
+        time (float): The simulation time of the frame.
+        positions (numpy.ndarray): The (bodies, 3) positions.
+
+        Returns:
+        bool: False if the ring was closed and the frame discarded.
+        """
+        with self._condition:
+            if not self.overwrite:
+                self._condition.wait_for(lambda: self.closed or self.written - self._read < self.capacity)
+            if self.closed:
+                return False
+            oldest = self.written - self.capacity
+            if oldest >= self._read:
+                self.dropped += 1
+                self._read = oldest + 1
+            slot = self.written % self.capacity
+            self.frames[slot] = positions
+            self.times[slot] = time
+            self.written += 1
+            self._condition.notify_all()
+            return True
+
+    def close(self):
+        """
+        Mark the end of the stream; blocked producers and waiting consumers return.
+        """
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Wait until there is an unread frame or the ring is closed.
+
+        Parameters:
+        timeout (float): The longest wait in seconds, or None to wait indefinitely.
+
+        Returns:
+        bool: True if there is an unread frame.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.closed or self.written > self._read, timeout) and \
+                self.written > self._read
+
+    def next(self):
+        """
+        Return the oldest unread frame, or None if every frame has been read.
+
+        Returns:
+        tuple: The time and a copy of the (bodies, 3) positions.
+        """
+        with self._condition:
+            if self._read >= self.written:
+                return None
+            slot = self._read % self.capacity
+            self._read += 1
+            self._condition.notify_all()
+            return float(self.times[slot]), self.frames[slot].copy()
+
+    def latest(self):
+        """
+        Return the newest frame, marking every older frame as read.
+
+        Returns:
+        tuple: The time and a copy of the (bodies, 3) positions, or None if nothing was written.
+        """
+        with self._condition:
+            if self.written == 0:
+                return None
+            slot = (self.written - 1) % self.capacity
+            self.dropped += max(0, self.written - 1 - self._read)
+            self._read = self.written
+            self._condition.notify_all()
+            return float(self.times[slot]), self.frames[slot].copy()
+
+    def time_range(self):
+        """
+        Return the times of the oldest and newest frames held, or None if empty.
+
+        Returns:
+        tuple: The (oldest, newest) times.
+        """
+        with self._condition:
+            if self.written == 0:
+                return None
+            oldest = max(0, self.written - self.capacity)
+            return float(self.times[oldest % self.capacity]), float(self.times[(self.written - 1) % self.capacity])
+
+    def sample(self, t):
+        """
+        Return the positions at time t, interpolated linearly between the two frames around it.
+
+        Times outside the frames held are clamped to the oldest or newest frame.
+        Frames older than the pair used are marked as read.
+
+        Parameters:
+        t (float): The simulation time.
+
+        Returns:
+        tuple: The time actually sampled and the (bodies, 3) positions, or None if nothing was written.
+        """
+        with self._condition:
+            if self.written == 0:
+                return None
+            oldest = max(0, self.written - self.capacity)
+            numbers = np.arange(oldest, self.written)
+            times = self.times[numbers % self.capacity]
+            # Frame times increase with their number, so the bracketing pair can be found by bisection
+            k = int(np.searchsorted(times, t, side="right"))
+            if k == 0:
+                t, k = times[0], 1
+            if k == len(times):
+                slot = numbers[-1] % self.capacity
+                positions, t = self.frames[slot].copy(), times[-1]
+            else:
+                a, b = numbers[k - 1] % self.capacity, numbers[k] % self.capacity
+                w = (t - times[k - 1]) / (times[k] - times[k - 1])
+                positions = (1 - w) * self.frames[a] + w * self.frames[b]
+            read = numbers[k - 1]
+            if read > self._read:
+                self.dropped += read - self._read
+                self._read = read
+            self._condition.notify_all()
+            return float(t), positions
+
+
+class SimulationProducer:
+    """
+    Run a SolarSystem in a background thread, pushing its positions into a FrameRing.
+
+    NumPy releases the GIL inside its kernels, so the physics overlaps with
+    drawing on the main thread. The system must not be used by other threads
+    until the producer has finished or been stopped.
+
+    Parameters:
+    system (SolarSystem): The system to advance.
+    ring (FrameRing): The ring to fill; it is closed when the run ends.
+    t (float): The end time in seconds.
+    dt (float): The time step in seconds, defaults to system.dt.
+    every (int): Push every this many steps.
+    """
+    def __init__(self, system, ring, t, dt=None, every=1):
+        self.system = system
+        self.ring = ring
+        self.t = t
+        self.dt = dt
+        self.every = every
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="simulation-producer", daemon=True)
+
+    def _run(self):
+        run = self.system.snapshots(self.t, self.dt, self.every)
+        try:
+            for time, positions in run:
+                if self._stop.is_set() or not self.ring.put(time, positions):
+                    break
+        except Exception as error:  # re-raised by join
+            self.error = error
+        finally:
+            run.close()
+            self.ring.close()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Ask the producer to stop after the current step and wait for it.
+        """
+        self._stop.set()
+        self.ring.close()
+        self.join()
+
+    def join(self, timeout=None):
+        """
+        Wait for the producer to finish, re-raising any error from the simulation.
+
+        Parameters:
+        timeout (float): The longest wait in seconds, or None.
+        """
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+
+class LivePlayer:
+    """
+    Feed frames from a FrameRing to a Renderer at display rate.
+
+    Without a speed every update shows the newest frame and skips (drops) the
+    ones in between. With a speed the shown simulation time advances with the
+    wall clock at that many simulated seconds per second, interpolating between
+    frames; if the simulation falls behind, the newest frame is held.
+
+    Parameters:
+    renderer (Renderer): The renderer to draw with.
+    ring (FrameRing): The frames to show.
+    speed (float): Simulated seconds per wall-clock second, or None to show the newest frame.
+    """
+    def __init__(self, renderer, ring, speed=None):
+        self.renderer = renderer
+        self.ring = ring
+        self.speed = speed
+        self.shown = 0
+        self._clock = None
+        length = renderer.trail_length if renderer.trails else 0
+        self._history = np.empty((length,) + ring.frames.shape[1:], dtype=ring.frames.dtype)
+        self._history_size = 0
+        self._updates = 0
+
+    def _frame(self):
+        if self.speed is None:
+            return self.ring.latest()
+        now = time.perf_counter()
+        if self._clock is None:
+            span = self.ring.time_range()
+            if span is None:
+                return None
+            self._clock = (now, span[0])
+        start, t0 = self._clock
+        frame = self.ring.sample(t0 + (now - start) * self.speed)
+        if frame is not None and frame[0] < t0 + (now - start) * self.speed:
+            # Held at the newest frame: restart the clock there so playback does not jump ahead later
+            self._clock = (now, frame[0])
+        return frame
+
+    def update(self, _=None):
+        """
+        Draw the current frame; suitable as a FuncAnimation callback.
+
+        Returns:
+        list: The updated artists.
+        """
+        frame = self._frame()
+        if frame is None:
+            return self.renderer.artists()
+        _, positions = frame
+        self.shown += 1
+        history = None
+        if len(self._history):
+            # Trail points are kept every trail_every updates, newest first
+            if self._updates % self.renderer.trail_every == 0:
+                self._history[1:] = self._history[:-1]
+                self._history[0] = positions
+                self._history_size = min(self._history_size + 1, len(self._history))
+            history = np.concatenate([positions[None], self._history[:self._history_size]])
+        self._updates += 1
+        return self.renderer.draw_positions(positions, history)
+
+
+def animate_live(system, t, dt=None, every=1, capacity=256, speed=None, interval=20, extent=None,
+                 overwrite=True, **options):
+    """
+    Animate a simulation while it runs, with the physics in a background thread.
+
+    Parameters:
+    system (SolarSystem): The system to simulate.
+    t (float): The end time in seconds.
+    dt (float): The time step in seconds, defaults to system.dt.
+    every (int): Push a frame every this many steps.
+    capacity (int): The number of frames buffered between the simulation and the display.
+    speed (float): Simulated seconds per wall-clock second, or None to show the newest frame.
+    interval (int): The delay between display updates in milliseconds.
+    extent (float): The half-width of the plotted cube in km, or None to fit the planets' orbits.
+    overwrite (bool): Whether the simulation may run ahead and overwrite unseen frames.
+    options: Further keyword arguments for Renderer (trail_length, trail_every, trail_groups, ax).
+
+    Returns:
+    tuple: The FuncAnimation (keep a reference while it plays) and the running SimulationProducer.
+    """
+    from matplotlib.animation import FuncAnimation
+    from renderer import Renderer, body_groups, default_extent
+
+    positions = system.positions()
+    groups = body_groups(system)
+    if extent is None and len(system.planet):
+        # Fit the largest aphelion rather than the current positions, so eccentric orbits stay in view
+        extent = 1.1 * float(np.max(system.planet.column("semi_major_axis") * (1 + system.planet.column("eccentricity"))))
+    elif extent is None:
+        extent = default_extent(positions[None], groups)
+    renderer = Renderer(groups, extent, **options)
+    ring = FrameRing(capacity, len(positions), overwrite=overwrite)
+    ring.put(system.time, positions)
+    producer = SimulationProducer(system, ring, t, dt, every).start()
+    player = LivePlayer(renderer, ring, speed)
+    animation = FuncAnimation(renderer.fig, player.update, frames=itertools.count(), init_func=renderer.artists,
+                              interval=interval, blit=True, cache_frame_data=False)
+    # Stop the simulation when the window is closed
+    renderer.fig.canvas.mpl_connect("close_event", lambda _: producer.stop())
+    return animation, producer
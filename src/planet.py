@@ -1,30 +1,20 @@
 from utils import load_texture
-from dataclasses import dataclass
-from PIL import Image
 import math
+from kepler import orbital_positions
+from body_table import BodyView
 
-@dataclass
-class Planet:
-    name: str
-    mass: float
-    radius: float
-    semi_major_axis: float
-    eccentricity: float
-    inclination: float
-    longitude_of_ascending_node: float
-    argument_of_periapsis: float
-    mean_anomaly: float = 0
-    texture_path: str = "self.texture"  # Path to texture image
-    x: float = 0  # x position in kilometers
-    y: float = 0  # y position in kilometers
-    z: float = 0  # z position in kilometers
-    vx: float = 0.0  # Velocity in x direction
-    vy: float = 0.0  # Velocity in y direction
-    vz: float = 0.0  # Velocity in z direction
+class Planet(BodyView):
+    # Bodies are views onto a row of a BodyTable, which holds the columns:
+    # name, mass, radius, semi_major_axis, eccentricity, inclination,
+    # longitude_of_ascending_node, argument_of_periapsis, mean_anomaly,
+    # texture, texture_path ("self.texture" by default),
+    # x, y, z (position in kilometers) and vx, vy, vz (velocity).
+    __slots__ = ()
 
     AU = 1.496e8  # 1 AU in kilometers
 
     def __init__(self, name, mass, radius, semi_major_axis, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, texture_path=None):
+        self._detach()
         self.name = name
         self.mass = mass
         self.radius = radius
@@ -33,6 +23,7 @@ class Planet:
         self.inclination = inclination
         self.longitude_of_ascending_node = longitude_of_ascending_node
         self.argument_of_periapsis = argument_of_periapsis
+        self.texture_path = "self.texture"
         self.texture = texture_path  # Assign the texture_path to the texture attribute
 
     def calculate_orbital_period(self, sun_mass):
@@ -58,21 +49,18 @@ class Planet:
         Returns:
         tuple: The (x, y, z) coordinates of the planet in kilometers.
         """
-        E = mean_anomaly + self.eccentricity * math.sin(mean_anomaly)
-        for _ in range(10):
-            E_new = mean_anomaly + self.eccentricity * math.sin(E)
-            if abs(E - E_new) < 1e-6:
-                E = E_new
-                break
-        x = self.semi_major_axis * (math.cos(E) - self.eccentricity)
-        y = self.semi_major_axis * math.sqrt(1 - self.eccentricity**2) * math.sin(E)
-        z = self.semi_major_axis * math.sin(self.inclination) * math.sin(E)
+        x, y, z = orbital_positions(self.semi_major_axis, self.eccentricity, self.inclination,
+                                    self.longitude_of_ascending_node, self.argument_of_periapsis,
+                                    mean_anomaly).tolist()
         return x, y, z
 
-    def __post_init__(self):
+    def texture_image(self):
         """
-        Load the texture image during initialization if a texture path is provided.
+        Return the decoded texture image, loading it on first use.
+
+        Returns:
+        numpy.ndarray: The normalized image array, or None if the body has no texture file.
         """
-        
-        if self.texture:
-            self.texture = load_texture("self.texture");
\ No newline at end of file
+        if isinstance(self.texture, str):
+            return load_texture(self.texture)
+        return None
@@ -0,0 +1,216 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from instrumentation import default_instrumentation
+
+# Marker style and trail color for each class of body
+BODY_STYLES = {
+    "sun": {"color": "gold", "marker": "o", "markersize": 10},
+    "planets": {"color": "tab:blue", "marker": "o", "markersize": 5},
+    "moons": {"color": "lightgray", "marker": ".", "markersize": 2},
+    "asteroids": {"color": "tab:brown", "marker": ".", "markersize": 1},
+}
+
+
+def body_groups(system):
+    """
+    Return the rows of each class of body in the order used by SolarSystem.snapshots.
+
+    Parameters:
+    system (SolarSystem): The solar system.
+
+    Returns:
+    dict: Class name ("sun", "planets", "moons", "asteroids") to an array of row indices.
+    """
+    sizes = {"sun": 1, "planets": len(system.planet), "moons": len(system.moons), "asteroids": len(system.asteroids)}
+    groups, start = {}, 0
+    for name, size in sizes.items():
+        groups[name] = np.arange(start, start + size)
+        start += size
+    return groups
+
+
+class Renderer:
+    """
+    Draw frames of body positions with one artist per class of body.
+
+    Each class (sun, planets, moons, asteroids) is a single marker-only line
+    updated from an array slice, and trails are one line collection per class
+    built from every trail_every-th frame, so the cost of a frame does not
+    depend on how many bodies are named.
+
+    Parameters:
+    groups (dict): Class name to the row indices of its bodies in each frame.
+    extent (float): The half-width of the plotted cube, in the units of the positions.
+    trail_length (int): The number of decimated points per trail, 0 for no trails.
+    trail_every (int): The frame stride between trail points.
+    trail_groups (tuple): The classes that get trails.
+    ax (Axes3D): The axes to draw on, or None to create a figure.
+    instrumentation (Instrumentation): Timer for the render phase, defaults to the shared one.
+    """
+    def __init__(self, groups, extent, trail_length=100, trail_every=5, trail_groups=("planets",), ax=None,
+                 instrumentation=None):
+        if ax is None:
+            fig = plt.figure()
+            ax = fig.add_subplot(111, projection="3d")
+        self.ax = ax
+        self.fig = ax.figure
+        self.groups = {name: rows for name, rows in groups.items() if len(rows)}
+        self.trail_length = trail_length
+        self.trail_every = max(1, trail_every)
+        self.instrumentation = default_instrumentation() if instrumentation is None else instrumentation
+        ax.set_xlim(-extent, extent)
+        ax.set_ylim(-extent, extent)
+        ax.set_zlim(-extent, extent)
+
+        self.markers = {}
+        self.trails = {}
+        for name in self.groups:
+            style = BODY_STYLES.get(name, BODY_STYLES["planets"])
+            (self.markers[name],) = ax.plot([], [], [], linestyle="none", animated=True, **style)
+            if trail_length and name in trail_groups:
+                trail = Line3DCollection([], colors=style["color"], linewidths=0.5, alpha=0.6, animated=True)
+                self.trails[name] = ax.add_collection(trail)
+
+    def artists(self):
+        return list(self.markers.values()) + list(self.trails.values())
+
+    def draw(self, frames, i):
+        """
+        Update the artists to frame i.
+
+        Parameters:
+        frames (numpy.ndarray): The (frames, bodies, 3) positions.
+        i (int): The frame to draw.
+
+        Returns:
+        list: The updated artists.
+        """
+        history = None
+        if self.trails:
+            # Trails end at the current frame and step back trail_every frames at a time
+            first = max(0, i - self.trail_length * self.trail_every)
+            history = frames[i:first - 1 if first else None:-self.trail_every]
+        return self.draw_positions(frames[i], history)
+
+    def draw_positions(self, positions, history=None):
+        """
+        Update the artists to one set of positions.
+
+        Parameters:
+        positions (numpy.ndarray): The (bodies, 3) positions.
+        history (numpy.ndarray): The (points, bodies, 3) trail points, newest first, or None for no trails.
+
+        Returns:
+        list: The updated artists.
+        """
+        with self.instrumentation.phase("render"):
+            positions = np.asarray(positions)
+            for name, marker in self.markers.items():
+                xyz = positions[self.groups[name]]
+                marker.set_data(xyz[:, 0], xyz[:, 1])
+                marker.set_3d_properties(xyz[:, 2])
+            if self.trails and history is not None:
+                history = np.asarray(history)
+                for name, trail in self.trails.items():
+                    trail.set_segments(np.swapaxes(history[:, self.groups[name]], 0, 1))
+        return self.artists()
+
+    def animate(self, frames, interval=20):
+        """
+        Build a blitted animation of the frames.
+
+        Parameters:
+        frames (numpy.ndarray): The (frames, bodies, 3) positions, e.g. a TrajectoryReader's positions.
+        interval (int): The delay between frames in milliseconds.
+
+        Returns:
+        FuncAnimation: The animation object.
+        """
+        return FuncAnimation(self.fig, lambda i: self.draw(frames, i), frames=len(frames),
+                             init_func=self.artists, interval=interval, blit=True)
+
+
+def default_extent(frames, groups, margin=1.1):
+    """
+    Return a plot half-width that contains the sun and planets over the frames.
+
+    Parameters:
+    frames (numpy.ndarray): The (frames, bodies, 3) positions.
+    groups (dict): Class name to row indices, as returned by body_groups.
+    margin (float): The factor applied to the largest coordinate.
+
+    Returns:
+    float: The half-width.
+    """
+    rows = np.concatenate([groups.get("sun", []), groups.get("planets", [])]).astype(int)
+    sample = np.asarray(frames[::max(1, len(frames) // 100)])[:, rows]
+    return margin * float(np.abs(sample).max()) or 1.0
+
+
+def _render_range(frames_path, groups, extent, options, start, stop, directory):
+    # Worker for export_video: draw frames [start, stop) to PNG files with the Agg backend
+    matplotlib.use("Agg")
+    frames = np.load(frames_path, mmap_mode="r")
+    renderer = Renderer(groups, extent, **options)
+    for artist in renderer.artists():
+        artist.set_animated(False)
+    for i in range(start, stop):
+        renderer.draw(frames, i)
+        renderer.fig.savefig(os.path.join(directory, f"frame_{i:06d}.png"))
+    plt.close(renderer.fig)
+    return stop - start
+
+
+def export_video(path, frames, groups, extent=None, fps=30, workers=None, frames_per_task=64, **options):
+    """
+    Render frames offscreen in a process pool and stitch them into a video file.
+
+    GIF files are assembled with Pillow; other formats (e.g. .mp4) need ffmpeg on the PATH.
+
+    Parameters:
+    path (str): The output video file.
+    frames (numpy.ndarray): The (frames, bodies, 3) positions.
+    groups (dict): Class name to row indices, as returned by body_groups.
+    extent (float): The half-width of the plotted cube, or None to fit the planets.
+    fps (int): The frames per second of the video.
+    workers (int): The number of worker processes, defaults to the CPU count.
+    frames_per_task (int): The number of frames each task renders.
+    options: Further keyword arguments for Renderer (trail_length, trail_every, trail_groups).
+
+    Returns:
+    str: The path of the written video.
+    """
+    if extent is None:
+        extent = default_extent(frames, groups)
+    if not path.lower().endswith(".gif") and shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"ffmpeg is required to write {path}; use a .gif path to export with Pillow")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Workers memory-map the frames instead of receiving a pickled copy
+        frames_path = os.path.join(directory, "frames.npy")
+        np.save(frames_path, np.asarray(frames))
+        n = len(frames)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [pool.submit(_render_range, frames_path, groups, extent, options, start,
+                                 min(start + frames_per_task, n), directory)
+                     for start in range(0, n, frames_per_task)]
+            for task in tasks:
+                task.result()
+
+        pattern = os.path.join(directory, "frame_%06d.png")
+        if path.lower().endswith(".gif"):
+            from PIL import Image
+            images = [Image.open(pattern % i) for i in range(n)]
+            images[0].save(path, save_all=True, append_images=images[1:], duration=1000 / fps, loop=0)
+        else:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), "-i", pattern,
+                            "-pix_fmt", "yuv420p", path], check=True)
+    return path
@@ -1,95 +1,538 @@
+import logging
 import math
+import numpy as np
 from planet import Planet
 from asteroid import Asteroid
 from moon import Moon
 from sun import Sun
 from GC import GravitationalConstants
+from kepler import orbital_positions, orbital_state
+from body_table import BodyTable
+from gravity import GravityEngine, pairwise_accelerations, test_particle_accelerations
+from integrators import get_integrator
+from hierarchy import HierarchicalStepper
+from conservation import ConservationMonitor, TimestepController
+from instrumentation import default_instrumentation, logger
+
+KM = 1000.0  # meters per kilometer
 
 class SolarSystem:
-    def __init__(self, sun=None):
-        self.planet = []
-        self.moons = []
-        self.asteroids = []
+    def __init__(self, sun=None, integrator="leapfrog", dt=86400.0, chunk_size=None, test_particles=True,
+                 hierarchical=True, steps_per_orbit=20, instrumentation=None):
+        self.planet = BodyTable(Planet)
+        self.moons = BodyTable(Moon)
+        self.asteroids = BodyTable(Asteroid)
         if sun is None:
             self.sun = Sun()
         else:
             self.sun = sun
+        # Dynamics state used by step/advance_to (time in seconds)
+        self.integrator = get_integrator(integrator)
+        self.dt = dt
+        self.time = 0.0
+        self.chunk_size = chunk_size
+        # Treat asteroids as massless test particles accelerated only by the sun, planets and moons
+        self.test_particles = test_particles
+        # Integrate moons relative to their parent planet with their own substeps, with the
+        # integrator's composition as the outer step (integrators without one step moons directly)
+        self.hierarchical = hierarchical
+        self.steps_per_orbit = steps_per_orbit
+        # Phase timers and counters, shared and disabled unless one is passed in or enabled
+        self.instrumentation = default_instrumentation() if instrumentation is None else instrumentation
+        # Energy and angular momentum tracking and step-size control, off unless monitor_conservation is called
+        self.monitor = None
+        self.controller = None
+        self._potential = None
+        self._hierarchy_warned = False
+        # The SI state last written to the sun and tables, with the km values it was written as
+        self._exact = {}
+        # Number of rows per table whose x/y/z/vx/vy/vz have been set from their orbital elements
+        self._initialized = {"planet": 0, "moons": 0, "asteroids": 0}
            
     def add_planet(self, Planet):
         # Add a planet to the solar system if it doesn't already exist
-        if Planet.name not in [p.name for p in self.planet]:
-            self.planet.append(Planet)
+        if Planet.name not in self.planet:
+            self.planet.add(Planet)
         else:
             print(f"Planet {Planet.name} already exists in the solar system.")
     def add_moon(self, moon):
     # Add a moon to the solar system if it doesn't already exist
-        if any(planet.name == moon.parent_planet for planet in self.planet):
-                self.moons.append(moon)
-        else:
+        if moon.parent_planet not in self.planet:
             print(f"Parent planet {moon.parent_planet} not found for moon {moon.name}.")
+        elif moon.name not in self.moons:
+            self.moons.add(moon)
+        else:
+            print(f"Moon {moon.name} already exists in the solar system.")
     def add_asteroid(self, asteroid):
-        if isinstance(asteroid, Asteroid) and asteroid.name not in [a.name for a in self.asteroids]:
-            self.asteroids.append(asteroid)
+        if isinstance(asteroid, Asteroid) and asteroid.name not in self.asteroids:
+            self.asteroids.add(asteroid)
+
+    def add_bodies(self, kind, columns):
+        """
+        Add many bodies of one kind at once from column arrays, e.g. a loaded catalog.
+
+        Rows whose name is already in the system or repeats an earlier row are
+        skipped, as are moons whose parent planet is not in the system. Moons
+        without any parent planet are an error (ValueError). Their
+        Cartesian states are computed from the elements in one vectorized pass
+        the next time the system is stepped.
+
+        Parameters:
+        kind (str): "planet", "moons" or "asteroids".
+        columns (dict): BodyTable column name to array (or list for object columns),
+            with distances in kilometers and angles in radians.
+
+        Returns:
+        int: The number of bodies added.
+        """
+        if kind not in self._initialized:
+            raise ValueError(f"Unknown body kind {kind!r}, expected one of {sorted(self._initialized)}")
+        table = getattr(self, kind)
+        names = list(columns["name"])
+        parents = columns.get("parent_planet") if kind == "moons" else None
+        if kind == "moons":
+            missing = [name for i, name in enumerate(names) if parents is None or parents[i] in (None, "")]
+            if missing:
+                shown = ", ".join(map(str, missing[:10])) + (", ..." if len(missing) > 10 else "")
+                raise ValueError(f"{len(missing)} moons have no parent_planet: {shown}")
+        unique = set(names)
+        if (len(unique) == len(names) and unique.isdisjoint(table.names())
+                and (parents is None or set(parents).issubset(self.planet.names()))):
+            # Common case of a clean catalog: no per-row checks needed
+            keep = range(len(names))
+        else:
+            seen = set()
+            keep = []
+            for i, name in enumerate(names):
+                if name in table or name in seen:
+                    continue
+                if parents is not None and parents[i] not in self.planet:
+                    continue
+                seen.add(name)
+                keep.append(i)
+        if len(keep) < len(names):
+            logger.warning("Skipped %d of %d %s that were duplicates or had no parent planet",
+                           len(names) - len(keep), len(names), kind)
+            keep = np.array(keep, dtype=np.int64)
+            columns = {name: ([values[i] for i in keep] if isinstance(values, list) else np.asarray(values)[keep])
+                       for name, values in columns.items()}
+        if len(keep):
+            table.extend(columns, len(keep))
+        return len(keep)
 
     def calculate_orbital_characteristics(self, dt,):
-        # Calculate the orbital characteristics of each planet
-        for i, planet in enumerate(self.planet):
-            # Use the inclination directly from the planet's attribute
-            inclination = planet.inclination
-
-            # Calculate the eccentric anomaly from the mean anomaly
-            eccentric_anomaly = planet.mean_anomaly
-            for _ in range(10):  # Iteratively solve Kepler's equation
-                eccentric_anomaly = planet.mean_anomaly + planet.eccentricity * math.sin(eccentric_anomaly)
-
-            # Calculate the true anomaly from the eccentric anomaly
-            true_anomaly = 2 * math.atan2(
-                math.sqrt(1 + planet.eccentricity) * math.sin(eccentric_anomaly / 2),
-                math.sqrt(1 - planet.eccentricity) * math.cos(eccentric_anomaly / 2)
-            )
-            # Calculate the orbital period
-            T = (2 * math.pi) * math.sqrt((planet.semi_major_axis ** 3) / (GravitationalConstants.G * self.sun.mass))
-            # Update the mean anomaly considering the time step dt
-            planet.mean_anomaly = (planet.mean_anomaly + 2 * math.pi * dt / T) % (2 * math.pi)
-
-            # Print the orbital characteristics
-            print(f"Planet {i+1}:")
-            print(f"Name: {planet.name}")
-            print(f"Mass: {planet.mass} kg")
-            print(f"Radius: {planet.radius} km")
-            print(f"Semi-major Axis: {planet.semi_major_axis} AU")
-            print(f"Eccentricity: {planet.eccentricity}")
-            print(f"Inclination: {inclination} rad")
-            print(f"Longitude of Ascending Node: {planet.longitude_of_ascending_node} rad")
-            print(f"Argument of Periapsis: {planet.argument_of_periapsis} rad")
-            print(f"Orbital Period: {T / 86400} days")
-
-    def calculate_gravitational_interactions(self, dt):
+        if not self.planet:
+            return
+        mean_anomaly = self.planet.column("mean_anomaly")
+        semi_major_axis = self.planet.column("semi_major_axis")
+
+        # Calculate the orbital period
+        periods = (2 * math.pi) * np.sqrt((semi_major_axis ** 3) / (GravitationalConstants.G * self.sun.mass))
+        # Update the mean anomaly considering the time step dt
+        mean_anomaly[:] = (mean_anomaly + 2 * math.pi * dt / periods) % (2 * math.pi)
+
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        for planet, T in zip(self.planet, periods.tolist()):
+            logger.debug("orbit name=%s mass=%s radius=%s semi_major_axis=%s eccentricity=%s inclination=%s "
+                         "longitude_of_ascending_node=%s argument_of_periapsis=%s period_days=%s",
+                         planet.name, planet.mass, planet.radius, planet.semi_major_axis, planet.eccentricity,
+                         planet.inclination, planet.longitude_of_ascending_node, planet.argument_of_periapsis,
+                         T / 86400)
+
+    def calculate_gravitational_interactions(self, dt, chunk_size=None):
         positions = {planet.name: [] for planet in self.planet}
-        # Calculate the gravitational interactions between planets
-        for i, planet1 in enumerate(self.planet):
-            force_x, force_y, force_z = 0, 0, 0
-            for j, planet2 in enumerate(self.planet):
-                if i != j:
-                    x1, y1, z1 = planet1.calculate_position(planet1.mean_anomaly)
-                    x2, y2, z2 = planet2.calculate_position(planet2.mean_anomaly)
-                    r12 = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2 + (z2 - z1) ** 2)
-                    F_g = (GravitationalConstants.G * planet1.mass * planet2.mass) / (r12 ** 2)
-                    force_x += F_g * (x2 - x1) / r12
-                    force_y += F_g * (y2 - y1) / r12
-                    force_z += F_g * (z2 - z1) / r12
-
-            # Update velocities based on the net force
-            planet1.vx += force_x / planet1.mass * dt
-            planet1.vy += force_y / planet1.mass * dt
-            planet1.vz += force_z / planet1.mass * dt
-
-            # Update positions based on the velocities
-            planet1.x += planet1.vx * dt
-            planet1.y += planet1.vy * dt
-            planet1.z += planet1.vz * dt
-
-            # Print the gravitational interaction
-            print(f"Planet {i+1} updated position: ({planet1.x}, {planet1.y}, {planet1.z})")
-            positions[planet1.name].append((planet1.x, planet1.y, planet1.z))
-        return positions
\ No newline at end of file
+        if not self.planet:
+            return positions
+        with self.instrumentation.phase("kepler"):
+            # Solve Kepler's equation for all planets at once for the positions used in the force pass
+            kepler_positions = orbital_positions(*self.planet.elements())
+        engine = GravityEngine.from_table(self.planet, chunk_size)
+        with self.instrumentation.phase("force"):
+            # Calculate the gravitational interactions between all planets in one batched pass
+            accelerations = engine.accelerations(kepler_positions)
+
+        # Update velocities based on the net force, then positions based on the velocities
+        engine.velocities += accelerations * dt
+        engine.positions += engine.velocities * dt
+        self.planet.set_state(engine.positions, engine.velocities)
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for name, (x, y, z) in zip(self.planet.names(), engine.positions.tolist()):
+            if debug:
+                logger.debug("position name=%s x=%s y=%s z=%s", name, x, y, z)
+            positions[name].append((x, y, z))
+        return positions
+
+    def _initialize_state(self):
+        # Set the Cartesian state of newly added bodies from their orbital elements.
+        # Planets and asteroids orbit the sun; moons orbit their parent planet.
+        for attr in ("planet", "asteroids", "moons"):
+            table = getattr(self, attr)
+            start = self._initialized[attr]
+            if start == len(table):
+                continue
+            rows = slice(start, len(table))
+            elements = [column[rows] for column in table.elements()]
+            elements[0] = elements[0] * KM
+            masses = table.column("mass")[rows]
+            if attr == "moons":
+                parents = [self.planet.row_of(name) for name in table.object_column("parent_planet")[rows]]
+                mu = GravitationalConstants.G * (self.planet.column("mass")[parents] + masses)
+                origin = self.planet.positions()[parents] * KM, self.planet.velocities()[parents] * KM
+            else:
+                mu = GravitationalConstants.G * (self.sun.mass + masses)
+                origin = (np.array([self.sun.x, self.sun.y, self.sun.z]) * KM,
+                          np.array([self.sun.vx, self.sun.vy, self.sun.vz]) * KM)
+            with self.instrumentation.phase("kepler"):
+                r, v = orbital_state(*elements, mu)
+            for k, name in enumerate(("x", "y", "z")):
+                table.column(name)[rows] = (origin[0] + r)[..., k] / KM
+            for k, name in enumerate(("vx", "vy", "vz")):
+                table.column(name)[rows] = (origin[1] + v)[..., k] / KM
+            self._initialized[attr] = len(table)
+            self.integrator.reset()
+
+    def _gather_state(self):
+        # Collect the sun and every body into SI arrays, sun first
+        tables = (("planet", self.planet), ("moons", self.moons), ("asteroids", self.asteroids))
+        sun_position = np.array([[self.sun.x, self.sun.y, self.sun.z]])
+        sun_velocity = np.array([[self.sun.vx, self.sun.vy, self.sun.vz]])
+        positions = np.concatenate([self._to_si(("sun", "positions"), sun_position)] +
+                                   [self._to_si((attr, "positions"), t.positions()) for attr, t in tables])
+        velocities = np.concatenate([self._to_si(("sun", "velocities"), sun_velocity)] +
+                                    [self._to_si((attr, "velocities"), t.velocities()) for attr, t in tables])
+        masses = np.concatenate([[self.sun.mass]] + [t.column("mass") for _, t in tables])
+        return positions, velocities, masses
+
+    def _to_si(self, key, values):
+        # Convert stored km values to SI, reusing the exact SI value written by _scatter_state
+        # wherever the stored value is still the one written, so stopping and continuing a
+        # run does not round its state through kilometers
+        si = values * KM
+        if key in self._exact:
+            written, exact = self._exact[key]
+            n = min(len(values), len(written))
+            si[:n] = np.where(values[:n] == written[:n], exact[:n], si[:n])
+        return si
+
+    def _scatter_state(self, positions, velocities):
+        # Write SI arrays from _gather_state back to the sun and the body tables in km,
+        # remembering the SI values for the next _gather_state
+        km_positions, km_velocities = positions / KM, velocities / KM
+        self.sun.x, self.sun.y, self.sun.z = km_positions[0].tolist()
+        self.sun.vx, self.sun.vy, self.sun.vz = km_velocities[0].tolist()
+        self._exact = {("sun", "positions"): (km_positions[:1], positions[:1]),
+                       ("sun", "velocities"): (km_velocities[:1], velocities[:1])}
+        start = 1
+        for attr, table in (("planet", self.planet), ("moons", self.moons), ("asteroids", self.asteroids)):
+            stop = start + len(table)
+            table.set_state(km_positions[start:stop], km_velocities[start:stop])
+            self._exact[attr, "positions"] = km_positions[start:stop], positions[start:stop]
+            self._exact[attr, "velocities"] = km_velocities[start:stop], velocities[start:stop]
+            start = stop
+
+    def _acceleration_function(self, masses):
+        # Build the acceleration callable for the arrays returned by _gather_state
+        phase = self.instrumentation.phase
+        # When monitoring, keep the potential energy of the last force pass along with its positions
+        monitored = self.monitor is not None
+        if not self.test_particles or len(self.asteroids) == 0:
+            def acceleration(x):
+                with phase("force"):
+                    if not monitored:
+                        return pairwise_accelerations(x, masses, self.chunk_size)
+                    a, potential = pairwise_accelerations(x, masses, self.chunk_size, potential=True)
+                    self._potential = (x, potential)
+                    return a
+            return acceleration
+
+        # Asteroids come last, so the massive bodies are a leading slice
+        n_massive = len(masses) - len(self.asteroids)
+        massive = masses[:n_massive]
+
+        def acceleration(x):
+            with phase("force"):
+                a = np.empty_like(x)
+                if monitored:
+                    a[:n_massive], potential = pairwise_accelerations(x[:n_massive], massive, self.chunk_size,
+                                                                      potential=True)
+                    self._potential = (x, potential)
+                else:
+                    a[:n_massive] = pairwise_accelerations(x[:n_massive], massive, self.chunk_size)
+                a[n_massive:] = test_particle_accelerations(x[n_massive:], x[:n_massive], massive)
+                return a
+        return acceleration
+
+    def _hierarchical_stepper(self, masses):
+        # Build the multi-rate stepper for the arrays returned by _gather_state
+        parents = np.full(len(masses), -1)
+        moon_start = 1 + len(self.planet)
+        for i, name in enumerate(self.moons.object_column("parent_planet")):
+            parents[moon_start + i] = 1 + self.planet.row_of(name)
+        n_test = len(self.asteroids) if self.test_particles else 0
+        stepper = HierarchicalStepper(masses, parents, n_test, self.steps_per_orbit, self.chunk_size,
+                                      self.instrumentation, self.integrator.composition)
+        stepper.track_potential = self.monitor is not None
+        return stepper
+
+    def _uses_hierarchy(self):
+        # Whether moons are stepped by HierarchicalStepper, which needs an integrator built from kick-drift-kick steps
+        if not (self.hierarchical and len(self.moons)):
+            return False
+        if self.integrator.composition is None:
+            if not self._hierarchy_warned:
+                logger.warning("The %s integrator cannot drive the hierarchical moon stepper; integrating the moons "
+                               "directly with %s, so the fastest moon sets the cost of each step",
+                               self.integrator.name, self.integrator.name)
+                self._hierarchy_warned = True
+            return False
+        return True
+
+    def integration_scheme(self):
+        """
+        Return the name of the scheme the next step will use.
+
+        Returns:
+        str: The integrator name, prefixed with "hierarchical/" when the moons have their own substeps.
+        """
+        return ("hierarchical/" if self._uses_hierarchy() else "") + self.integrator.name
+
+    def monitor_conservation(self, tolerance=None, **options):
+        """
+        Track the energy and angular momentum drift of every step, optionally adapting the step size.
+
+        The potential energy comes from the force pass of the step (with the
+        leapfrog integrator or with moons); other integrators end on a drift and
+        need one extra force pass per step. With a tolerance, a TimestepController
+        grows or shrinks the step to hold the relative change of energy and
+        angular momentum per step under it: the dt passed to step, advance_to or
+        snapshots is then only the first step, and later runs continue from the
+        controller's current step.
+
+        Parameters:
+        tolerance (float): The largest relative change per step, or None to only monitor.
+        options: Keyword arguments for TimestepController (dt_min, dt_max, order, safety, max_growth,
+            min_shrink); the order defaults to the integrator's.
+
+        Returns:
+        ConservationMonitor: The monitor; its last attribute holds the Drift of the latest step.
+        """
+        self.monitor = ConservationMonitor()
+        self.controller = None
+        if tolerance is not None:
+            options.setdefault("order", self.integrator.order or 2)
+            self.controller = TimestepController(tolerance, **options)
+        return self.monitor
+
+    def _potential_energy(self, positions, masses, n_massive, stepper):
+        # Potential energy of the massive bodies at the positions returned by the last step,
+        # reused from its force pass where there was one at those positions
+        if stepper is not None and stepper.potential is not None:
+            return stepper.potential
+        if self._potential is not None and self._potential[0] is positions:
+            return self._potential[1]
+        with self.instrumentation.phase("force"):
+            return pairwise_accelerations(positions[:n_massive], masses[:n_massive], self.chunk_size,
+                                          potential=True)[1]
+
+    def step(self, dt=None):
+        """
+        Advance every body by one time step with the system's integrator.
+
+        Parameters:
+        dt (float): The time step in seconds, defaults to self.dt.
+        """
+        self.advance_to(self.time + (self.dt if dt is None else dt), dt)
+
+    def advance_to(self, t, dt=None):
+        """
+        Advance every body to the given time in steps of at most dt.
+
+        The state is gathered into SI arrays once, integrated, and written back to
+        the body tables (in kilometers and kilometers per second) at the end. The
+        SI values are kept too, so consecutive calls continue exactly as one call
+        would, unless a body's stored state is changed in between.
+
+        Parameters:
+        t (float): The target time in seconds since the start of the simulation.
+        dt (float): The time step in seconds, defaults to self.dt.
+        """
+        for _ in self._integrate(t, dt):
+            pass
+
+    def snapshots(self, t, dt=None, every=1):
+        """
+        Advance every body to the given time, yielding the positions along the way.
+
+        Positions are yielded as a (N, 3) array in kilometers, ordered as
+        body_names(). The body tables are updated when the generator finishes or
+        is closed.
+
+        Parameters:
+        t (float): The target time in seconds since the start of the simulation.
+        dt (float): The time step in seconds, defaults to self.dt.
+        every (int): Yield every this many steps (the final step is always yielded).
+
+        Yields:
+        tuple: The time in seconds and the (N, 3) positions in kilometers.
+        """
+        for step, (time, positions, last) in enumerate(self._integrate(t, dt), 1):
+            if step % every == 0 or last:
+                yield time, positions / KM
+
+    def body_names(self):
+        """
+        Return the names of every body in the order used by snapshots.
+
+        Returns:
+        list: "Sun", then the planets, moons and asteroids in table order.
+        """
+        return ["Sun"] + self.planet.names() + self.moons.names() + self.asteroids.names()
+
+    def positions(self):
+        """
+        Return the current positions of every body in the order used by snapshots.
+
+        Returns:
+        numpy.ndarray: The (N, 3) positions in kilometers.
+        """
+        self._initialize_state()
+        return self._gather_state()[0] / KM
+
+    def get_state(self):
+        """
+        Return a copy of everything needed to rebuild the system and continue it bit-identically.
+
+        Returns:
+        dict: The time and options, the integrator state, the conservation monitor and
+        timestep controller states (None when not in use), the sun as an
+        (mass, radius, x, y, z, vx, vy, vz) array, for each table, its
+        (columns, rows) float array in BodyTable.FLOAT_COLUMNS order and its object columns,
+        and the exact SI positions and velocities of every body in body_names() order.
+        """
+        sun = self.sun
+        positions, velocities, _ = self._gather_state()
+        return {
+            "time": self.time,
+            "dt": self.dt,
+            "chunk_size": self.chunk_size,
+            "test_particles": self.test_particles,
+            "hierarchical": self.hierarchical,
+            "steps_per_orbit": self.steps_per_orbit,
+            "integrator": self.integrator.name,
+            "integrator_state": self.integrator.get_state(),
+            "initialized": dict(self._initialized),
+            "monitor": None if self.monitor is None else self.monitor.get_state(),
+            "controller": None if self.controller is None else self.controller.get_state(),
+            "sun": np.array([sun.mass, sun.radius, sun.x, sun.y, sun.z, sun.vx, sun.vy, sun.vz]),
+            "tables": {
+                attr: {
+                    "floats": np.array([table.column(name) for name in BodyTable.FLOAT_COLUMNS]).reshape(
+                        len(BodyTable.FLOAT_COLUMNS), len(table)),
+                    "objects": {name: table.object_column(name) for name in BodyTable.OBJECT_COLUMNS},
+                }
+                for attr, table in (("planet", self.planet), ("moons", self.moons), ("asteroids", self.asteroids))
+            },
+            "exact": {"positions": positions, "velocities": velocities},
+        }
+
+    @classmethod
+    def from_state(cls, state, instrumentation=None):
+        """
+        Rebuild a system from a state returned by get_state, e.g. one read from a checkpoint.
+
+        Parameters:
+        state (dict): The saved state.
+        instrumentation (Instrumentation): Passed to the constructor.
+
+        Returns:
+        SolarSystem: The restored system.
+        """
+        mass, radius, *coordinates = np.asarray(state["sun"]).tolist()
+        sun = Sun(mass, radius)
+        sun.x, sun.y, sun.z, sun.vx, sun.vy, sun.vz = coordinates
+        system = cls(sun, state["integrator"], state["dt"], state["chunk_size"], state["test_particles"],
+                     state["hierarchical"], state["steps_per_orbit"], instrumentation)
+        system.integrator.set_state(state["integrator_state"])
+        for attr, saved in state["tables"].items():
+            count = np.shape(saved["floats"])[1]
+            if count:
+                columns = dict(zip(BodyTable.FLOAT_COLUMNS, saved["floats"]))
+                columns.update(saved["objects"])
+                getattr(system, attr).extend(columns, count)
+        system._initialized = dict(state["initialized"])
+        system.time = state["time"]
+        # States saved before the exact SI state was kept continue from the km values
+        if state.get("exact") is not None:
+            system._scatter_state(np.asarray(state["exact"]["positions"]), np.asarray(state["exact"]["velocities"]))
+        # States saved before conservation monitoring existed have neither key
+        if state.get("monitor") is not None:
+            system.monitor = ConservationMonitor()
+            system.monitor.set_state(state["monitor"])
+        if state.get("controller") is not None:
+            system.controller = TimestepController.from_state(state["controller"])
+        return system
+
+    def _integrate(self, t, dt=None):
+        # Step the gathered SI state to time t, yielding (time, positions, last) after
+        # every step, and write the state back to the tables when done.
+        dt = self.dt if dt is None else dt
+        self._initialize_state()
+        if t <= self.time:
+            return
+        positions, velocities, masses = self._gather_state()
+        stepper = None
+        if self._uses_hierarchy():
+            stepper = self._hierarchical_stepper(masses)
+
+            def advance(positions, velocities, h):
+                return stepper.step(positions, velocities, h)
+        else:
+            acceleration = self._acceleration_function(masses)
+
+            def advance(positions, velocities, h):
+                return self.integrator.step(positions, velocities, h, acceleration)
+
+        monitor, controller = self.monitor, self.controller
+        n_massive = len(masses) - (len(self.asteroids) if self.test_particles else 0)
+        if monitor is not None and (monitor.reference is None or monitor.reference[0] != n_massive):
+            monitor.start(positions[:n_massive], velocities[:n_massive], masses[:n_massive],
+                          self._potential_energy(positions, masses, n_massive, None))
+        if controller is not None:
+            dt = controller.dt = dt if controller.dt is None else controller.dt
+
+        instrumentation = self.instrumentation
+        instrumentation.gauge("bodies", len(masses))
+        instrumentation.gauge("integrator", self.integration_scheme())
+        try:
+            while self.time < t:
+                h = min(dt, t - self.time)
+                instrumentation.begin_step()
+                with instrumentation.phase("integration"):
+                    new_positions, new_velocities = advance(positions, velocities, h)
+                if monitor is not None:
+                    drift = monitor.measure(self.time + h, h, new_positions[:n_massive], new_velocities[:n_massive],
+                                            masses[:n_massive],
+                                            self._potential_energy(new_positions, masses, n_massive, stepper))
+                    if controller is not None:
+                        accepted = controller.update(drift, h, full=h == dt)
+                        dt = controller.dt
+                        if not accepted:
+                            # Retry the step from the same state with the smaller step; only
+                            # accepted steps end a step in the instrumentation
+                            instrumentation.count("rejected_steps")
+                            continue
+                    monitor.record(drift)
+                    instrumentation.gauge("energy_drift", drift.energy_drift)
+                    instrumentation.gauge("angular_momentum_drift", drift.angular_momentum_drift)
+                    instrumentation.gauge("dt", h)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("drift time=%s dt=%s energy=%s energy_drift=%s angular_momentum_drift=%s",
+                                     drift.time, h, drift.energy, drift.energy_drift, drift.angular_momentum_drift)
+                instrumentation.end_step()
+                positions, velocities = new_positions, new_velocities
+                self.time = t if h == t - self.time else self.time + h
+                yield self.time, positions, self.time >= t
+        finally:
+            self._scatter_state(positions, velocities)
@@ -1,4 +1,6 @@
 class Sun:
     def __init__(self, mass=1.989e30, radius=696000):  # radius in kilometers
         self.mass = mass
-        self.radius = radius
\ No newline at end of file
+        self.radius = radius
+        self.x, self.y, self.z = 0.0, 0.0, 0.0  # position in kilometers
+        self.vx, self.vy, self.vz = 0.0, 0.0, 0.0  # velocity in kilometers per second
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from instrumentation import logger
+
+TEXTURE_SIZE = (50, 25)  # (width, height) every texture is resized to
+
+
+def decode_texture(texture_path, size=TEXTURE_SIZE):
+    """
+    Decode, resize and normalize a texture image.
+
+    Parameters:
+    texture_path (str): The path to the texture image file.
+    size (tuple): The (width, height) to resize to.
+
+    Returns:
+    numpy.ndarray: The float32 image array with values in [0, 1].
+    """
+    # PIL is only needed on a cache and atlas miss
+    from PIL import Image
+    with Image.open(texture_path) as img:
+        img = img.resize(size)
+        return np.asarray(img, dtype=np.float32) / 255
+
+
+class TextureManager:
+    """
+    Cache of decoded textures.
+
+    Lookups go to an in-process LRU keyed by path and size, then to an optional
+    atlas file of pre-decoded arrays, and only then to the image file itself.
+    The atlas is one memory-mapped float32 .npy file with a JSON index next to
+    it, so a warm start reads textures without touching PIL. Returned arrays are
+    shared between callers and read-only.
+
+    Parameters:
+    cache_size (int): The number of decoded textures kept in memory.
+    atlas_path (str): The atlas path without extension, or None for no atlas.
+    workers (int): The number of threads used by prefetch.
+    """
+    def __init__(self, cache_size=64, atlas_path=None, workers=4):
+        self.cache_size = cache_size
+        self.atlas_path = atlas_path
+        self.workers = workers
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._atlas = None
+        self._atlas_index = {}
+        if atlas_path and os.path.exists(atlas_path + ".npy"):
+            self._atlas = np.load(atlas_path + ".npy", mmap_mode="r")
+            with open(atlas_path + ".json") as f:
+                self._atlas_index = {self._decode_key(key): entry for key, entry in json.load(f).items()}
+
+    @staticmethod
+    def _key(texture_path, size):
+        return (os.path.normpath(texture_path), tuple(size))
+
+    @staticmethod
+    def _decode_key(text):
+        # Inverse of json.dumps(list(key)) for the atlas index
+        texture_path, size = json.loads(text)
+        return (texture_path, tuple(size))
+
+    def _remember(self, key, image):
+        image.flags.writeable = False
+        with self._lock:
+            self._cache[key] = image
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return image
+
+    def _lookup(self, key):
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+                return image
+        entry = self._atlas_index.get(key)
+        if entry is not None:
+            offset, shape = entry
+            return self._remember(key, np.array(self._atlas[offset:offset + int(np.prod(shape))]).reshape(shape))
+        return None
+
+    def get(self, texture_path, size=TEXTURE_SIZE):
+        """
+        Return a decoded texture, decoding it only on the first request.
+
+        Parameters:
+        texture_path (str): The path to the texture image file.
+        size (tuple): The (width, height) to resize to.
+
+        Returns:
+        numpy.ndarray: The normalized image array, or None if the file is not found.
+        """
+        key = self._key(texture_path, size)
+        image = self._lookup(key)
+        if image is None:
+            try:
+                image = self._remember(key, decode_texture(texture_path, size))
+            except FileNotFoundError:
+                logger.warning("Texture file %s not found", texture_path)
+                return None
+        return image
+
+    def prefetch(self, texture_paths, size=TEXTURE_SIZE):
+        """
+        Decode every texture not yet cached, in parallel.
+
+        Parameters:
+        texture_paths (list): The paths to the texture image files.
+        size (tuple): The (width, height) to resize to.
+
+        Returns:
+        dict: Path to normalized image array (None for missing files).
+        """
+        paths = list(dict.fromkeys(texture_paths))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(zip(paths, pool.map(lambda path: self.get(path, size), paths)))
+
+    def save_atlas(self, texture_paths=(), size=TEXTURE_SIZE):
+        """
+        Write every cached texture (plus the given paths) to the atlas file.
+
+        Parameters:
+        texture_paths (list): Extra texture paths to decode and include.
+        size (tuple): The (width, height) used for the extra paths.
+        """
+        if not self.atlas_path:
+            raise ValueError("TextureManager has no atlas_path")
+        self.prefetch(texture_paths, size)
+        entries = {key: self._lookup(key) for key in self._atlas_index}
+        with self._lock:
+            entries.update(self._cache)
+
+        index, offset = {}, 0
+        for key, image in entries.items():
+            index[json.dumps(list(key))] = (offset, list(image.shape))
+            offset += image.size
+        atlas = np.empty(offset, dtype=np.float32)
+        for key, image in entries.items():
+            start, shape = index[json.dumps(list(key))]
+            atlas[start:start + image.size] = image.ravel()
+
+        # Write to temporary names first so a concurrent reader never sees a partial atlas
+        np.save(self.atlas_path + ".tmp.npy", atlas)
+        with open(self.atlas_path + ".tmp.json", "w") as f:
+            json.dump(index, f)
+        os.replace(self.atlas_path + ".tmp.npy", self.atlas_path + ".npy")
+        os.replace(self.atlas_path + ".tmp.json", self.atlas_path + ".json")
+        self._atlas = np.load(self.atlas_path + ".npy", mmap_mode="r")
+        self._atlas_index = {self._decode_key(key): entry for key, entry in index.items()}
+
+
+_default_manager = None
+
+
+def default_manager():
+    """
+    Return the process-wide TextureManager, creating it on first use.
+
+    The atlas path can be set with the SOLAR_TEXTURE_ATLAS environment variable.
+
+    Returns:
+    TextureManager: The shared manager.
+    """
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = TextureManager(atlas_path=os.environ.get("SOLAR_TEXTURE_ATLAS"))
+    return _default_manager
@@ -0,0 +1,190 @@
+import json
+import numpy as np
+
+# Fixed size of the .npy header, so the final shape can be written in place when the file is closed
+HEADER_SIZE = 256
+MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def _npy_header(dtype, shape):
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": tuple(shape)})
+    header = header.encode("latin1")
+    padding = HEADER_SIZE - len(MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError(f"Shape {shape} does not fit in the .npy header")
+    return MAGIC + (HEADER_SIZE - len(MAGIC) - 2).to_bytes(2, "little") + header + b" " * padding + b"\n"
+
+
+class _NpyAppender:
+    """
+    Append rows to a .npy file along its first axis, buffering them in fixed-size chunks.
+
+    Parameters:
+    path (str): The .npy file to create.
+    row_shape (tuple): The shape of one row.
+    dtype (numpy.dtype): The element type.
+    chunk_rows (int): The number of rows buffered before each write.
+    """
+    def __init__(self, path, row_shape, dtype, chunk_rows):
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._buffer = np.empty((chunk_rows,) + self.row_shape, dtype=self.dtype)
+        self._filled = 0
+        self._file = open(path, "wb")
+        self._file.write(_npy_header(self.dtype, (0,) + self.row_shape))
+
+    def append(self, row):
+        self._buffer[self._filled] = row
+        self._filled += 1
+        if self._filled == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        if self._filled:
+            self._file.write(self._buffer[:self._filled].tobytes())
+            self.rows += self._filled
+            self._filled = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self.rows,) + self.row_shape))
+        self._file.close()
+
+
+class TrajectoryWriter:
+    """
+    Stream position snapshots to disk instead of holding trajectories in memory.
+
+    Positions go to <path>.npy laid out as [step, body, xyz], times to
+    <path>.times.npy and body names to <path>.json. Snapshots are buffered in
+    chunks of chunk_steps and appended, so memory use does not grow with the run.
+
+    Parameters:
+    path (str): The output path, without extension.
+    names (list): The body names, in the order of the snapshot rows.
+    chunk_steps (int): The number of snapshots buffered before each write.
+    dtype (numpy.dtype): The element type of the stored positions.
+    """
+    def __init__(self, path, names, chunk_steps=256, dtype=np.float64):
+        self.path = path
+        self.names = list(names)
+        self._positions = _NpyAppender(path + ".npy", (len(self.names), 3), dtype, chunk_steps)
+        self._times = _NpyAppender(path + ".times.npy", (), np.float64, chunk_steps)
+        with open(path + ".json", "w") as f:
+            json.dump({"names": self.names}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, time, positions):
+        """
+        Append one snapshot.
+
+        Parameters:
+        time (float): The simulation time in seconds.
+        positions (numpy.ndarray): The (N, 3) positions of the bodies.
+        """
+        self._positions.append(positions)
+        self._times.append(time)
+
+    def close(self):
+        """
+        Flush buffered snapshots and finalize the file headers.
+        """
+        self._positions.close()
+        self._times.close()
+
+
+class TrajectoryReader:
+    """
+    Read a trajectory written by TrajectoryWriter without loading it into memory.
+
+    Parameters:
+    path (str): The path given to TrajectoryWriter, without extension.
+    """
+    def __init__(self, path):
+        self.positions = np.load(path + ".npy", mmap_mode="r")
+        self.times = np.load(path + ".times.npy", mmap_mode="r")
+        with open(path + ".json") as f:
+            self.names = json.load(f)["names"]
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.times)
+
+    def steps(self, t_start=None, t_end=None):
+        """
+        Return the slice of steps whose times fall in [t_start, t_end].
+
+        Parameters:
+        t_start (float): The start time in seconds, or None for the beginning.
+        t_end (float): The end time in seconds, or None for the end.
+
+        Returns:
+        slice: The step range.
+        """
+        start = 0 if t_start is None else int(np.searchsorted(self.times, t_start, side="left"))
+        stop = len(self.times) if t_end is None else int(np.searchsorted(self.times, t_end, side="right"))
+        return slice(start, stop)
+
+    def body(self, name, t_start=None, t_end=None):
+        """
+        Return the positions of one body over a time range.
+
+        Parameters:
+        name (str): The body name.
+        t_start (float): The start time in seconds, or None for the beginning.
+        t_end (float): The end time in seconds, or None for the end.
+
+        Returns:
+        numpy.ndarray: The (steps, 3) positions.
+        """
+        return np.asarray(self.positions[self.steps(t_start, t_end), self._index[name]])
+
+    def time_range(self, t_start=None, t_end=None, names=None):
+        """
+        Return the positions of some or all bodies over a time range.
+
+        Parameters:
+        t_start (float): The start time in seconds, or None for the beginning.
+        t_end (float): The end time in seconds, or None for the end.
+        names (list): The bodies to select, or None for all of them.
+
+        Returns:
+        tuple: The (steps,) times and the (steps, bodies, 3) positions.
+        """
+        steps = self.steps(t_start, t_end)
+        positions = self.positions[steps]
+        if names is not None:
+            positions = positions[:, [self._index[name] for name in names]]
+        return np.asarray(self.times[steps]), np.asarray(positions)
+
+
+def write_trajectory(system, path, t, dt=None, every=1, chunk_steps=256, dtype=np.float64):
+    """
+    Run a simulation to time t and stream its positions to disk.
+
+    Parameters:
+    system (SolarSystem): The solar system to advance.
+    path (str): The output path, without extension.
+    t (float): The target time in seconds since the start of the simulation.
+    dt (float): The time step in seconds, defaults to system.dt.
+    every (int): Write every this many steps.
+    chunk_steps (int): The number of snapshots buffered before each write.
+    dtype (numpy.dtype): The element type of the stored positions.
+
+    Returns:
+    TrajectoryReader: A reader for the written trajectory.
+    """
+    with TrajectoryWriter(path, system.body_names(), chunk_steps, dtype) as writer:
+        for time, positions in system.snapshots(t, dt, every):
+            with system.instrumentation.phase("output"):
+                writer.write(time, positions)
+    return TrajectoryReader(path)
@@ -1,25 +1,20 @@
-from math import sqrt
-from PIL import Image
-import numpy as np
 
 def load_texture(texture_path):
     """
     Load and normalize a texture image.
 
+    Decoded textures are cached by the shared textures.TextureManager, so each
+    file is decoded at most once per process (or never, with a warm atlas).
+
     Parameters:
     texture_path (str): The path to the texture image file.
 
     Returns:
-    numpy.ndarray: The normalized image array or None if the file is not found.
+    numpy.ndarray: The normalized (read-only) image array or None if the file is not found.
     """
-    texture_path (Image)
-    try:
-        img = Image.open(texture_path)
-        img = img.resize((50, 25))  # Resize for consistency
-        return np.array(img) / 255  # Normalize pixel values
-    except FileNotFoundError:
-        print(f"Texture file {texture_path} not found.")
-        return None
+    # Imported here so that importing the bodies does not load the texture machinery
+    from textures import default_manager
+    return default_manager().get(texture_path)
 
 def calculate_gravitational_force(m1, m2, distance):
     """
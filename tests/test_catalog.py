@@ -0,0 +1,69 @@
+import math
+import numpy as np
+import pytest
+from catalog import normalize, read_catalog, read_csv, read_json, load_catalog
+from planet import Planet
+from solar_system import SolarSystem
+
+CSV = """name,a,e,i,om,w,ma,H
+Ceres,2.77,0.0785,10.6,80.3,73.6,95.9,3.3
+Pallas,2.77,0.2303,34.8,173.1,310.0,78.2,4.1
+"""
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_csv_columns_are_converted(tmp_path):
+    columns = read_catalog(write(tmp_path, "asteroids.csv", CSV))
+    assert columns["name"] == ["Ceres", "Pallas"]
+    np.testing.assert_allclose(columns["semi_major_axis"], [2.77 * Planet.AU, 2.77 * Planet.AU])
+    np.testing.assert_allclose(columns["inclination"], np.radians([10.6, 34.8]))
+    np.testing.assert_allclose(columns["mean_anomaly"], np.radians([95.9, 78.2]))
+    # Radii are estimated from H; masses from the radii
+    assert np.all(columns["radius"] > 0) and np.all(columns["mass"] > 0)
+
+
+def test_json_records_and_columns_agree(tmp_path):
+    records = '[{"name": "Ceres", "a": 2.77, "e": 0.0785}, {"name": "Vesta", "a": 2.36, "e": 0.089}]'
+    mapping = '{"name": ["Ceres", "Vesta"], "a": [2.77, 2.36], "e": [0.0785, 0.089]}'
+    from_records = normalize(read_json(write(tmp_path, "records.json", records)))
+    from_columns = normalize(read_json(write(tmp_path, "columns.json", mapping)))
+    for name in ("semi_major_axis", "eccentricity", "mean_anomaly"):
+        np.testing.assert_array_equal(from_records[name], from_columns[name])
+
+
+def test_m_is_not_read_as_the_mean_anomaly():
+    columns = normalize({"name": ["A"], "a": [2.5], "m": [1e15]})
+    np.testing.assert_array_equal(columns["mean_anomaly"], [0.0])
+
+
+def test_rows_without_a_bound_orbit_are_skipped(tmp_path):
+    text = CSV + "NoOrbit,,0.1,1,2,3,4,10\nComet,-5,1.2,1,2,3,4,10\n"
+    columns = read_catalog(write(tmp_path, "asteroids.csv", text))
+    assert columns["name"] == ["Ceres", "Pallas"]
+    assert len(columns["semi_major_axis"]) == len(columns["radius"]) == 2
+
+
+def test_a_catalog_without_semi_major_axes_is_rejected():
+    with pytest.raises(ValueError, match="semi_major_axis"):
+        normalize({"name": ["A"], "e": [0.1]})
+
+
+def test_short_csv_rows_report_their_line(tmp_path):
+    path = write(tmp_path, "short.csv", "name,a,e\nA,2.5,0.1\nB,,0.2\nC,2.6\n")
+    with pytest.raises(ValueError, match=r"short\.csv, line 4"):
+        read_csv(path)
+
+
+def test_load_catalog_adds_bodies(tmp_path):
+    system = SolarSystem()
+    assert load_catalog(system, write(tmp_path, "asteroids.csv", CSV)) == 2
+    assert system.asteroids.names() == ["Ceres", "Pallas"]
+    # Positions are set from the elements, about 2.6 to 3 AU from the sun
+    distance = np.linalg.norm(system.positions()[1:], axis=1) / Planet.AU
+    assert np.all((distance > 2.5) & (distance < 3.1))
+    assert math.isclose(system.asteroids[0].eccentricity, 0.0785)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_system
+from checkpoint import Checkpointer, read_checkpoint, restore, write_checkpoint
+
+DAY = 86400.0
+
+
+def state_arrays(system):
+    positions, velocities, _ = system._gather_state()
+    return positions, velocities
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_round_trip(tmp_path, compression):
+    system = synthetic_system(4, 2, 50, seed=1)
+    system.advance_to(3 * DAY)
+    path = str(tmp_path / "state.ckpt")
+    write_checkpoint(path, system.get_state(), compression)
+    restored = restore(path)
+    assert restored.time == system.time
+    assert restored.body_names() == system.body_names()
+    for attr in ("planet", "moons", "asteroids"):
+        original, copy = getattr(system, attr), getattr(restored, attr)
+        for name in ("mass", "radius", "x", "vx", "mean_anomaly"):
+            np.testing.assert_array_equal(copy.column(name), original.column(name))
+    for copy, original in zip(state_arrays(restored), state_arrays(system)):
+        np.testing.assert_array_equal(copy, original)
+
+
+def test_corrupt_checkpoint_is_rejected(tmp_path):
+    path = str(tmp_path / "state.ckpt")
+    write_checkpoint(path, synthetic_system(2, 1, 10).get_state())
+    data = bytearray(open(path, "rb").read())
+    data[-5] ^= 0xFF
+    open(path, "wb").write(bytes(data))
+    with pytest.raises(ValueError, match="checksum"):
+        read_checkpoint(path)
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "yoshida4", "rk45"])
+def test_stopping_and_continuing_matches_one_run(integrator):
+    continuous = synthetic_system(4, 2, 20, seed=2, integrator=integrator)
+    continuous.advance_to(10 * DAY, DAY)
+    stopped = synthetic_system(4, 2, 20, seed=2, integrator=integrator)
+    for day in range(1, 11):
+        stopped.advance_to(day * DAY, DAY)
+    for copy, original in zip(state_arrays(stopped), state_arrays(continuous)):
+        np.testing.assert_array_equal(copy, original)
+
+
+@pytest.mark.parametrize("tolerance", [None, 1e-8])
+def test_restart_from_checkpoint_is_bit_identical(tmp_path, tolerance):
+    path = str(tmp_path / "state.ckpt")
+    original = synthetic_system(4, 2, 20, seed=3)
+    original.monitor_conservation(tolerance)
+    with Checkpointer(original, path, every=3) as checkpointer:
+        checkpointer.advance_to(5 * DAY, DAY / 4)
+    restored = restore(path)
+    original.advance_to(10 * DAY, DAY / 4)
+    # With a controller, the restored run continues with its saved step, not the one passed in
+    restored.advance_to(10 * DAY, DAY / 4 if tolerance is None else DAY)
+    for copy, expected in zip(state_arrays(restored), state_arrays(original)):
+        np.testing.assert_array_equal(copy, expected)
+    assert restored.monitor.summary() == original.monitor.summary()
+    if tolerance is not None:
+        assert restored.controller.get_state() == original.controller.get_state()
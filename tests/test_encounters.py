@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from encounters import EncounterDetector, spatial_pairs
+
+
+def brute_force_pairs(positions, radius):
+    offset = positions[:, None, :] - positions[None, :, :]
+    distance = np.sqrt(np.sum(offset ** 2, axis=-1))
+    first, second = np.nonzero(np.triu(distance < radius, k=1))
+    return set(zip(first.tolist(), second.tolist()))
+
+
+def found_pairs(positions, radius):
+    first, second, distance = spatial_pairs(positions, radius)
+    assert np.all(first < second)
+    np.testing.assert_allclose(distance, np.linalg.norm(positions[first] - positions[second], axis=1))
+    pairs = set(zip(first.tolist(), second.tolist()))
+    assert len(pairs) == len(first)
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("offset", [0.0, -5e3, 1e12])
+def test_spatial_pairs_match_brute_force(seed, offset):
+    rng = np.random.default_rng(seed)
+    # Clusters give many close pairs; the offset moves the cells far from the origin
+    centers = rng.uniform(-100, 100, (20, 3))
+    positions = centers[rng.integers(0, 20, 600)] + rng.normal(scale=2.0, size=(600, 3)) + offset
+    for radius in (0.5, 3.0, 40.0):
+        assert found_pairs(positions, radius) == brute_force_pairs(positions, radius)
+
+
+def test_spatial_pairs_with_a_huge_spread():
+    # Cells spread over more keys than fit in an int64 take the slower exact paths
+    rng = np.random.default_rng(4)
+    positions = rng.normal(size=(300, 3)) * 1e3
+    positions[::10] += rng.uniform(-1e15, 1e15, (30, 3))
+    assert found_pairs(positions, 100.0) == brute_force_pairs(positions, 100.0)
+
+
+def test_spatial_pairs_without_pairs():
+    assert found_pairs(np.zeros((1, 3)), 1.0) == set()
+    assert found_pairs(np.array([[0.0, 0, 0], [10, 0, 0]]), 1.0) == set()
+
+
+def test_detector_with_no_targets_finds_nothing():
+    rng = np.random.default_rng(5)
+    masses = np.concatenate([[2e30], rng.uniform(1e20, 1e24, 20)])
+    radii = rng.uniform(1, 1e4, 21)
+    detector = EncounterDetector(masses, radii, central=0, targets=[])
+    first, second, distance, threshold = detector.detect(rng.normal(size=(21, 3)) * 1e8)
+    assert len(first) == len(second) == len(distance) == len(threshold) == 0
+
+
+def test_detector_finds_target_approaches():
+    masses = np.array([2e30, 1e24, 1e12, 1e12])
+    radii = np.array([7e5, 6e3, 1.0, 1.0])
+    positions = np.array([[0.0, 0, 0], [1.5e8, 0, 0], [1.5e8 + 5e4, 0, 0], [-1.5e8, 0, 0]])
+    detector = EncounterDetector(masses, radii, central=np.array([-1, 0, 0, 0]), targets=[1], distance=1e5)
+    first, second, distance, _ = detector.detect(positions)
+    assert list(zip(first.tolist(), second.tolist())) == [(1, 2)]
+    np.testing.assert_allclose(distance, [5e4])
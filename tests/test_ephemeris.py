@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from ephemeris import Ephemeris
+
+DAY = 86400.0
+NAMES = ["Inner", "Outer"]
+RADII = np.array([1e8, 4e8])
+PERIODS = np.array([10 * DAY, 60 * DAY])
+
+
+def circular(t):
+    # Two bodies on circular orbits, as (T, bodies, 3) positions
+    phase = 2 * np.pi * np.asarray(t)[:, None] / PERIODS
+    return np.stack([RADII * np.cos(phase), RADII * np.sin(phase), 0.01 * RADII * np.sin(phase)], axis=-1)
+
+
+def test_fit_is_accurate_between_samples():
+    times = np.linspace(0, 40 * DAY, 321)
+    ephemeris = Ephemeris.fit(times, circular(times), NAMES, 2 * DAY, degree=10)
+    # Midway between the samples the fit was made from
+    between = (times[1:] + times[:-1]) / 2
+    np.testing.assert_allclose(ephemeris.positions_at(between), circular(between), rtol=0, atol=1e-6 * RADII.max())
+    for t in between[::37]:
+        np.testing.assert_allclose(ephemeris.position_at("Outer", t), circular([t])[0, 1], rtol=0, atol=1e-6 * RADII.max())
+    np.testing.assert_allclose(ephemeris.positions_at(between, ["Outer"])[:, 0], circular(between)[:, 1])
+
+
+def test_partial_last_interval():
+    # 9.5 days of samples in 2-day intervals; the last one holds 1.5 days
+    times = np.linspace(0, 9.5 * DAY, 77)
+    ephemeris = Ephemeris.fit(times, circular(times), NAMES, 2 * DAY, degree=8)
+    assert ephemeris.t_end == times[-1]
+    late = np.linspace(8 * DAY, 9.5 * DAY, 50)
+    np.testing.assert_allclose(ephemeris.positions_at(late), circular(late), rtol=0, atol=1e-6 * RADII.max())
+    np.testing.assert_allclose(ephemeris.position_at("Inner", times[-1]), circular(times[-1:])[0, 0], rtol=0, atol=1e-6 * RADII.max())
+    with pytest.raises(ValueError, match="outside"):
+        ephemeris.position_at("Inner", 9.6 * DAY)
+    with pytest.raises(ValueError, match="outside"):
+        ephemeris.positions_at([9.6 * DAY])
+
+
+def test_too_few_samples_are_rejected():
+    times = np.linspace(0, 4 * DAY, 9)
+    with pytest.raises(ValueError, match="samples"):
+        Ephemeris.fit(times, circular(times), NAMES, 2 * DAY, degree=10)
+
+
+def test_save_and_load(tmp_path):
+    times = np.linspace(0, 9.5 * DAY, 77)
+    ephemeris = Ephemeris.fit(times, circular(times), NAMES, 2 * DAY, degree=8)
+    path = str(tmp_path / "ephemeris")
+    ephemeris.save(path)
+    loaded = Ephemeris.load(path)
+    assert loaded.names == NAMES and loaded.t_end == ephemeris.t_end
+    query = np.linspace(0, 9.5 * DAY, 33)
+    np.testing.assert_array_equal(loaded.positions_at(query), ephemeris.positions_at(query))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from benchmark import synthetic_system
+from GC import GravitationalConstants
+from moon import Moon
+from planet import Planet
+from solar_system import SolarSystem
+
+
+def earth_system(**options):
+    system = SolarSystem(**options)
+    system.add_planet(Planet("Earth", 5.972e24, 6371, Planet.AU, 0.0167, 0.0, -0.196, 1.796))
+    system.add_moon(Moon("Moon", 7.342e22, 1737, 384400, 0.0549, 0.0898, 2.18, 5.55, "Earth"))
+    system.add_moon(Moon("Inner", 1e18, 10, 20000, 0.01, 0.1, 1.0, 2.0, "Earth"))
+    return system
+
+
+def escaping_system(**options):
+    # Give Inner twice the escape speed from Earth, radially outward
+    system = earth_system(**options)
+    system.positions()
+    positions, velocities, masses = system._gather_state()
+    offset = positions[3] - positions[1]
+    distance = np.linalg.norm(offset)
+    escape = np.sqrt(2 * GravitationalConstants.G * (masses[1] + masses[3]) / distance)
+    velocities[3] = velocities[1] + 2 * escape * offset / distance
+    system._scatter_state(positions, velocities)
+    return system
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_synthetic_moons_stay_bound(seed):
+    system = synthetic_system(8, 2, 0, seed)
+    system.advance_to(100 * 86400, 86400)
+    positions, velocities, masses = system._gather_state()
+    parents = 1 + np.array([system.planet.row_of(name) for name in system.moons.object_column("parent_planet")])
+    moons = 1 + len(system.planet) + np.arange(len(system.moons))
+    offset, relative = positions[moons] - positions[parents], velocities[moons] - velocities[parents]
+    mu = GravitationalConstants.G * (masses[parents] + masses[moons])
+    assert np.all(2 / np.linalg.norm(offset, axis=1) - np.sum(relative ** 2, axis=1) / mu > 0)
+
+
+def test_hierarchical_matches_direct_integration():
+    hierarchical = earth_system()
+    hierarchical.advance_to(5 * 86400, 3600)
+    direct = earth_system(hierarchical=False)
+    direct.advance_to(5 * 86400, 30)
+    expected = direct.positions()
+    error = np.linalg.norm(hierarchical.positions() - expected, axis=1)
+    assert np.all(error[2:] < 5e-3 * np.linalg.norm(expected[2:] - expected[1], axis=1))
+
+
+def test_escaping_moon_matches_direct_integration():
+    hierarchical = escaping_system()
+    hierarchical.advance_to(5 * 86400, 3600)
+    direct = escaping_system(hierarchical=False)
+    direct.advance_to(5 * 86400, 10)
+    expected = direct.positions()
+    # The moon is millions of km from Earth by now, and has left the sphere where it was stepped
+    assert np.linalg.norm(expected[3] - expected[1]) > 1e6
+    assert np.linalg.norm(hierarchical.positions()[3] - expected[3]) < 1e-5 * np.linalg.norm(expected[3] - expected[1])
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "yoshida4"])
+def test_hierarchical_step_is_time_reversible(integrator):
+    system = earth_system(integrator=integrator)
+    start = system.positions()
+    system.advance_to(10 * 86400, 86400)
+    positions, velocities, _ = system._gather_state()
+    system._scatter_state(positions, -velocities)
+    system.advance_to(20 * 86400, 86400)
+    back = system.positions()
+    assert np.max(np.linalg.norm(back - start, axis=1)) < 1e-3
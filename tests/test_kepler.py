@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from GC import GravitationalConstants
+from kepler import kepler_drift, orbital_state, solve_kepler
+
+MU = GravitationalConstants.G * 1e23  # a small planet, in m^3 s^-2
+
+
+def energy(positions, velocities):
+    return 0.5 * np.sum(velocities ** 2, axis=1) - MU / np.linalg.norm(positions, axis=1)
+
+
+def unbound_states(count, seed=0):
+    # Random positions with speeds from just above escape speed to five times it
+    rng = np.random.default_rng(seed)
+    positions = rng.normal(size=(count, 3)) * rng.uniform(1e6, 1e9, (count, 1))
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    escape = np.sqrt(2 * MU / np.linalg.norm(positions, axis=1))
+    return positions, directions * (escape * rng.uniform(1.0, 5.0, count))[:, None]
+
+
+def test_solve_kepler_satisfies_keplers_equation():
+    rng = np.random.default_rng(0)
+    mean_anomaly, eccentricity = rng.uniform(0, 2 * np.pi, 1000), rng.uniform(0, 0.99, 1000)
+    E = solve_kepler(mean_anomaly, eccentricity)
+    residual = E - eccentricity * np.sin(E)
+    np.testing.assert_allclose(np.sin(residual), np.sin(mean_anomaly), atol=1e-10)
+    np.testing.assert_allclose(np.cos(residual), np.cos(mean_anomaly), atol=1e-10)
+
+
+@pytest.mark.parametrize("eccentricity", [0.0, 0.3, 0.9, 0.999])
+@pytest.mark.parametrize("orbits", [0.01, 0.3, -0.3, 2.7])
+def test_bound_drift_matches_the_elements(eccentricity, orbits):
+    rng = np.random.default_rng(1)
+    count = 200
+    a = rng.uniform(1e7, 1e9, count)
+    angles = [rng.uniform(0, np.pi, count), rng.uniform(0, 2 * np.pi, count), rng.uniform(0, 2 * np.pi, count)]
+    mean_anomaly = rng.uniform(0, 2 * np.pi, count)
+    period = 2 * np.pi * np.sqrt(a ** 3 / MU)
+    # One dt for every body, so each covers its own fraction of an orbit
+    dt = orbits * period.min()
+    r, v = orbital_state(a, eccentricity, *angles, mean_anomaly, MU)
+    expected = orbital_state(a, eccentricity, *angles, mean_anomaly + 2 * np.pi * dt / period, MU)[0]
+    drifted = kepler_drift(r, v, np.full(count, MU), dt)[0]
+    np.testing.assert_allclose(drifted, expected, rtol=0, atol=1e-8 * a.max())
+
+
+def test_unbound_drift_conserves_energy_and_angular_momentum():
+    r, v = unbound_states(500)
+    r1, v1 = kepler_drift(r, v, MU, 3 * 86400.0)
+    assert np.isfinite(r1).all() and np.isfinite(v1).all()
+    scale = MU / np.linalg.norm(r, axis=1)
+    np.testing.assert_allclose(energy(r1, v1), energy(r, v), rtol=0, atol=1e-9 * scale.max())
+    h, h1 = np.cross(r, v), np.cross(r1, v1)
+    assert np.max(np.linalg.norm(h1 - h, axis=1) / np.linalg.norm(h, axis=1)) < 1e-9
+
+
+def test_unbound_drift_composes_and_reverses():
+    r, v = unbound_states(500, seed=1)
+    dt = 3 * 86400.0
+    r1, v1 = kepler_drift(r, v, MU, dt)
+    halves = kepler_drift(*kepler_drift(r, v, MU, dt / 2), MU, dt / 2)[0]
+    assert np.max(np.linalg.norm(halves - r1, axis=1) / np.linalg.norm(r1, axis=1)) < 1e-10
+    back = kepler_drift(r1, v1, MU, -dt)[0]
+    assert np.max(np.linalg.norm(back - r, axis=1) / np.linalg.norm(r, axis=1)) < 1e-7
+
+
+def test_unbound_drift_matches_direct_integration():
+    r, v = unbound_states(10, seed=2)
+    dt, n = 86400.0, 5000
+    expected = kepler_drift(r, v, MU, dt)[0]
+
+    def acceleration(x):
+        return -MU * x / np.linalg.norm(x, axis=1)[:, None] ** 3
+
+    # Classic fourth-order Runge-Kutta with small steps as the reference
+    x, u, h = r.copy(), v.copy(), dt / n
+    for _ in range(n):
+        k1x, k1v = u, acceleration(x)
+        k2x, k2v = u + h / 2 * k1v, acceleration(x + h / 2 * k1x)
+        k3x, k3v = u + h / 2 * k2v, acceleration(x + h / 2 * k2x)
+        k4x, k4v = u + h * k3v, acceleration(x + h * k3x)
+        x = x + h / 6 * (k1x + 2 * k2x + 2 * k3x + k4x)
+        u = u + h / 6 * (k1v + 2 * k2v + 2 * k3v + k4v)
+    assert np.max(np.linalg.norm(x - expected, axis=1) / np.linalg.norm(x, axis=1)) < 1e-9
+
+
+def test_drift_is_continuous_across_the_parabolic_limit():
+    r = np.array([[4.0e8, -1.0e8, 2.0e7]] * 2)
+    direction = np.array([0.2, 0.9, -0.1]) / np.linalg.norm([0.2, 0.9, -0.1])
+    escape = np.sqrt(2 * MU / np.linalg.norm(r[0]))
+    v = np.array([direction * escape * (1 - 1e-12), direction * escape * (1 + 1e-12)])
+    drifted = kepler_drift(r, v, MU, 10 * 86400.0)[0]
+    np.testing.assert_allclose(drifted[0], drifted[1], rtol=1e-9)
+
+
+def test_mixed_bound_and_unbound_drift():
+    r_bound, v_bound = orbital_state(np.array([5e8]), 0.1, 0.2, 0.3, 0.4, 0.5, MU)
+    r_free, v_free = unbound_states(3, seed=3)
+    r, v = np.concatenate([r_bound, r_free]), np.concatenate([v_bound, v_free])
+    mixed = kepler_drift(r, v, MU, 86400.0)
+    np.testing.assert_array_equal(mixed[0][:1], kepler_drift(r_bound, v_bound, MU, 86400.0)[0])
+    np.testing.assert_array_equal(mixed[0][1:], kepler_drift(r_free, v_free, MU, 86400.0)[0])